@@ -0,0 +1,133 @@
+"""Parse cost per youtube feed of feedparser against the incremental parser, on recorded feeds or on
+synthetic feeds shaped like the ones youtube serves.
+
+python3 -m benchmarks.feed_parsing [rounds] [feed.xml ...]
+"""
+import datetime
+import random
+import string
+import sys
+import time
+
+import feedparser
+
+from rings.utils.feeds import parse_youtube_feed
+
+FEED_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns:media="http://search.yahoo.com/mrss/" xmlns="http://www.w3.org/2005/Atom">
+ <link rel="self" href="http://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"/>
+ <id>yt:channel:{channel_id}</id>
+ <yt:channelId>{channel_id}</yt:channelId>
+ <title>{name}</title>
+ <link rel="alternate" href="https://www.youtube.com/channel/{channel_id}"/>
+ <author>
+  <name>{name}</name>
+  <uri>https://www.youtube.com/channel/{channel_id}</uri>
+ </author>
+ <published>2015-03-02T17:21:09+00:00</published>
+"""
+
+FEED_ENTRY = """ <entry>
+  <id>yt:video:{video_id}</id>
+  <yt:videoId>{video_id}</yt:videoId>
+  <yt:channelId>{channel_id}</yt:channelId>
+  <title>{title}</title>
+  <link rel="alternate" href="https://www.youtube.com/watch?v={video_id}"/>
+  <author>
+   <name>{name}</name>
+   <uri>https://www.youtube.com/channel/{channel_id}</uri>
+  </author>
+  <published>{published}</published>
+  <updated>{published}</updated>
+  <media:group>
+   <media:title>{title}</media:title>
+   <media:content url="https://www.youtube.com/v/{video_id}?version=3" type="application/x-shockwave-flash" width="640" height="390"/>
+   <media:thumbnail url="https://i2.ytimg.com/vi/{video_id}/hqdefault.jpg" width="480" height="360"/>
+   <media:description>{description}</media:description>
+   <media:community>
+    <media:starRating count="{likes}" average="5.00" min="1" max="5"/>
+    <media:statistics views="{views}"/>
+   </media:community>
+  </media:group>
+ </entry>
+"""
+
+
+def make_feed(rng: random.Random, newest: datetime.datetime, entries: int = 15) -> bytes:
+    """A feed of `entries` videos, the newest published at `newest` and the others a few days apart."""
+    channel_id = "UC" + "".join(rng.choices(string.ascii_letters + string.digits, k=22))
+    name = " ".join(rng.choice(["Edain", "Mod", "Gondor", "Arnor", "Lore", "Replays"]) for _ in range(2))
+    parts = [FEED_HEADER.format(channel_id=channel_id, name=name)]
+
+    published = newest
+    for _ in range(entries):
+        description = "\n".join(
+            " ".join(rng.choices(["patch", "notes", "the", "new", "faction", "balance", "map"], k=30))
+            for _ in range(rng.randint(5, 30))
+        )
+        parts.append(
+            FEED_ENTRY.format(
+                video_id="".join(rng.choices(string.ascii_letters + string.digits, k=11)),
+                channel_id=channel_id,
+                name=name,
+                title=" ".join(rng.choices(["Edain", "4.8", "Update", "Showcase", "vs", "Mordor"], k=6)),
+                published=published.replace(microsecond=0).isoformat(),
+                description=description,
+                likes=rng.randint(0, 5000),
+                views=rng.randint(0, 500000),
+            )
+        )
+        published -= datetime.timedelta(days=rng.uniform(0.5, 10))
+
+    parts.append("</feed>\n")
+    return "".join(parts).encode()
+
+
+def legacy_parse(raw: bytes, since: datetime.datetime):
+    """What the RSS cog did before: parse everything with feedparser and convert every date."""
+    entries = feedparser.parse(raw.decode())["entries"]
+    return [
+        entry
+        for entry in entries
+        if datetime.datetime.strptime(
+            entry["published"][:-3] + entry["published"][-2:], "%Y-%m-%dT%H:%M:%S%z"
+        )
+        > since
+    ]
+
+
+def bench(name, func, feeds, rounds):
+    start = time.perf_counter()
+    found = 0
+    for _ in range(rounds):
+        for raw, since in feeds:
+            found += len(func(raw, since))
+
+    elapsed = time.perf_counter() - start
+    per_feed = elapsed / (rounds * len(feeds)) * 1_000_000
+    print(f"{name:<14} {per_feed:>10,.0f} us/feed  ({found // rounds} entries returned per round)")
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    if len(sys.argv) > 2:
+        feeds = []
+        for path in sys.argv[2:]:
+            with open(path, "rb") as file:
+                feeds.append(file.read())
+    else:
+        rng = random.Random(43)
+        feeds = [make_feed(rng, now - datetime.timedelta(hours=rng.uniform(0, 72))) for _ in range(100)]
+
+    # the usual poll, where the last check was a moment ago and at most the newest video is new
+    cases = [(raw, now - datetime.timedelta(hours=1)) for raw in feeds]
+    print(f"{len(feeds)} feeds, {sum(len(x) for x in feeds) / len(feeds) / 1024:.0f} KiB on average")
+
+    bench("feedparser", legacy_parse, cases, rounds)
+    bench("incremental", parse_youtube_feed, cases, rounds)
+
+
+if __name__ == "__main__":
+    main()
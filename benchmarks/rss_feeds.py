@@ -0,0 +1,347 @@
+"""Polling cycles of the RSS cog against a local server standing in for youtube and the twitch API, with
+subscriptions and channels stubbed so nothing leaves the machine. Feeds are synthetic unless recorded
+youtube feeds or a recorded Helix `streams` response are given, recorded feeds are replayed as they are so
+only their ETag changes when they "publish".
+
+python3 -m benchmarks.rss_feeds [--subscriptions N] [--guilds M] [--latency S] [--failure-rate R] ...
+"""
+import argparse
+import asyncio
+import collections
+import datetime
+import json
+import random
+import time
+from typing import Dict, List
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.feed_parsing import make_feed
+from rings.rss import RSS
+from rings.utils.dispatcher import Dispatcher
+
+STREAM_TEMPLATE = {
+    "game_id": "1469308723",
+    "game_name": "Software and Game Development",
+    "type": "live",
+    "viewer_count": 78,
+    "language": "en",
+    "thumbnail_url": "https://static-cdn.jtvnw.net/previews-ttv/live_user_{login}-{{width}}x{{height}}.jpg",
+    "tag_ids": [],
+    "tags": ["English"],
+    "is_mature": False,
+}
+
+
+class FeedServer:
+    """Serves youtube feeds by channel id, with conditional GETs, and the Helix `streams` route."""
+
+    def __init__(self, args, rng: random.Random, youtubers: List[str], streamers: List[str]):
+        self.args = args
+        self.rng = rng
+        self.clock = datetime.datetime.now(datetime.timezone.utc)
+        self.stats = collections.Counter()
+
+        self.recorded_feeds = []
+        for path in args.feeds or []:
+            with open(path, "rb") as file:
+                self.recorded_feeds.append(file.read())
+
+        self.stream_templates = [STREAM_TEMPLATE]
+        if args.streams:
+            with open(args.streams) as file:
+                self.stream_templates = json.load(file)["data"] or self.stream_templates
+
+        self.feeds: Dict[str, tuple] = {}
+        for index, youtuber_id in enumerate(youtubers):
+            self.feeds[youtuber_id] = (self.make_feed(index), f'"{youtuber_id}-0"')
+
+        self.streamers = streamers
+        self.live: Dict[str, dict] = {}
+
+    def make_feed(self, index: int) -> bytes:
+        if self.recorded_feeds:
+            return self.recorded_feeds[index % len(self.recorded_feeds)]
+
+        return make_feed(self.rng, self.clock - datetime.timedelta(minutes=self.rng.uniform(0, 50)))
+
+    def publish(self, cycle: int):
+        """Move the clock forward a few minutes, have some youtubers upload and some streamers go live
+        or offline."""
+        self.clock += datetime.timedelta(minutes=5)
+        for index, youtuber_id in enumerate(self.feeds):
+            if cycle and self.rng.random() < self.args.publish_rate:
+                raw = self.make_feed(index) if self.recorded_feeds else make_feed(self.rng, self.clock)
+                self.feeds[youtuber_id] = (raw, f'"{youtuber_id}-{cycle}"')
+
+        for user_id in self.streamers:
+            if user_id in self.live and self.rng.random() < self.args.live_rate:
+                del self.live[user_id]
+            elif user_id not in self.live and self.rng.random() < self.args.live_rate:
+                self.live[user_id] = self.make_stream(user_id, cycle)
+
+    def make_stream(self, user_id: str, cycle: int) -> dict:
+        login = f"streamer{user_id}"
+        stream = dict(self.rng.choice(self.stream_templates))
+        stream.update(
+            id=f"{user_id}{cycle:06}",
+            user_id=user_id,
+            user_login=login,
+            user_name=login,
+            title=" ".join(self.rng.choices(["Edain", "4.8", "ranked", "Mordor", "casting", "chill"], k=5)),
+            started_at=self.clock.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            thumbnail_url=STREAM_TEMPLATE["thumbnail_url"].format(login=login),
+        )
+        return stream
+
+    async def serve(self, route: str) -> bool:
+        """Wait out the latency, False if the request should fail."""
+        self.stats[f"{route}_requests"] += 1
+        await asyncio.sleep(self.rng.expovariate(1 / self.args.latency) if self.args.latency else 0)
+        if self.rng.random() < self.args.failure_rate:
+            self.stats[f"{route}_failures"] += 1
+            return False
+
+        return True
+
+    async def youtube(self, request: web.Request) -> web.Response:
+        if not await self.serve("youtube"):
+            return web.Response(status=500)
+
+        raw, etag = self.feeds[request.query["channel_id"]]
+        if request.headers.get("If-None-Match") == etag:
+            self.stats["youtube_not_modified"] += 1
+            return web.Response(status=304)
+
+        self.stats["youtube_bytes"] += len(raw)
+        return web.Response(body=raw, content_type="application/atom+xml", headers={"ETag": etag})
+
+    async def streams(self, request: web.Request) -> web.Response:
+        if not await self.serve("twitch"):
+            return web.json_response(
+                {"error": "Internal Server Error", "status": 500, "message": ""}, status=500
+            )
+
+        data = [self.live[x] for x in request.query.getall("user_id", []) if x in self.live]
+        body = json.dumps({"data": data, "pagination": {}})
+        self.stats["twitch_bytes"] += len(body)
+        return web.Response(text=body, content_type="application/json")
+
+    async def start(self) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_get("/feeds/videos.xml", self.youtube)
+        app.router.add_get("/helix/streams", self.streams)
+
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", self.args.port).start()
+        return runner
+
+
+class StubDatabase:
+    """The queries the RSS task makes, answered from the seeded subscriptions."""
+
+    def __init__(self, youtube: List[dict], twitch: List[dict]):
+        self.youtube = youtube
+        self.twitch = twitch
+
+    async def query(self, query, *args, **kwargs):
+        if "necrobot.Youtube" in query:
+            feeds = collections.defaultdict(list)
+            for row in self.youtube:
+                feeds[row["youtuber_id"]].append(row)
+
+            return [
+                (
+                    youtuber_id,
+                    min(x["last_update"] for x in rows),
+                    [(x["channel_id"], x["filter"]) for x in rows],
+                )
+                for youtuber_id, rows in feeds.items()
+            ]
+
+        if "necrobot.Twitch" in query:
+            return self.twitch
+
+        raise NotImplementedError(query)
+
+    async def update_yt_last_updates(self, updates):
+        updates = dict(updates)
+        for row in self.youtube:
+            row["last_update"] = updates.get(row["youtuber_id"], row["last_update"])
+
+    async def update_tw_streams(self, streams):
+        streams = {twitch_id: (stream_id, started) for twitch_id, stream_id, started in streams}
+        for row in self.twitch:
+            if row["twitch_id"] in streams:
+                row["stream_id"], row["stream_started"] = streams[row["twitch_id"]]
+
+    async def delete_rss_channels(self, channel_ids):
+        self.youtube = [x for x in self.youtube if x["channel_id"] not in channel_ids]
+        self.twitch = [x for x in self.twitch if x["channel_id"] not in channel_ids]
+
+
+class StubChannel:
+    def __init__(self, channel_id: int, stats: collections.Counter, latency: float):
+        self.id = channel_id
+        self.stats = stats
+        self.latency = latency
+
+    async def send(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.stats["sends"] += 1
+
+
+class StubBot:
+    def __init__(self, session: aiohttp.ClientSession, db: StubDatabase, channels: Dict[int, StubChannel]):
+        self.session = session
+        self.db = db
+        self.channels = channels
+        self.dispatcher = Dispatcher()
+        self.loop = asyncio.get_running_loop()
+        self.bot_footer = {"text": "benchmark"}
+        self.twitch_token = {"token": "benchmark", "expires": time.time() + 86400}
+        self.errors = collections.Counter()
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+    def dispatch(self, event: str, *args):
+        if event == "error":
+            self.errors[type(args[0]).__name__] += 1
+
+
+def seed(args, rng: random.Random):
+    """N subscriptions spread over M guilds with a few channels each. Creators are picked with a long tail
+    so that a handful of them are followed by many guilds, like on the live bot."""
+    youtubers = [f"UC{index:022}" for index in range(args.youtubers)]
+    streamers = [str(100000 + index) for index in range(args.streamers)]
+    weights = [1 / (rank + 1) for rank in range(max(args.youtubers, args.streamers))]
+    since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=1)
+
+    youtube, twitch, taken = [], [], set()
+    for _ in range(args.subscriptions):
+        guild_id = rng.randrange(args.guilds)
+        channel_id = guild_id * 10 + rng.randrange(3)
+        title_filter = rng.choice(["edain", "mordor"]) if rng.random() < 0.2 else ""
+        if rng.random() < args.twitch_share:
+            twitch_id = rng.choices(streamers, weights[: len(streamers)])[0]
+            if (guild_id, twitch_id) not in taken:
+                taken.add((guild_id, twitch_id))
+                twitch.append(
+                    {
+                        "guild_id": guild_id,
+                        "channel_id": channel_id,
+                        "twitch_id": twitch_id,
+                        "last_update": since,
+                        "filter": title_filter,
+                        "twitch_name": f"streamer{twitch_id}",
+                        "stream_id": None,
+                        "stream_started": None,
+                    }
+                )
+        else:
+            youtuber_id = rng.choices(youtubers, weights[: len(youtubers)])[0]
+            if (guild_id, youtuber_id) not in taken:
+                taken.add((guild_id, youtuber_id))
+                youtube.append(
+                    {
+                        "guild_id": guild_id,
+                        "channel_id": channel_id,
+                        "youtuber_id": youtuber_id,
+                        "last_update": since,
+                        "filter": title_filter,
+                    }
+                )
+
+    return youtubers, streamers, youtube, twitch
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    youtubers, streamers, youtube, twitch = seed(args, rng)
+    server = FeedServer(args, rng, youtubers, streamers)
+    runner = await server.start()
+
+    sends = collections.Counter()
+    channel_ids = {x["channel_id"] for x in youtube + twitch}
+    channels = {x: StubChannel(x, sends, args.send_latency) for x in channel_ids}
+
+    print(
+        f"{len(youtube):,} youtube and {len(twitch):,} twitch subscriptions in {args.guilds:,} guilds, "
+        f"{len(channels):,} channels, {args.youtubers:,} youtubers, {args.streamers:,} streamers"
+    )
+    print(
+        f"{'cycle':>5} {'poll ms':>9} {'fan-out ms':>11} {'requests':>9} {'304':>5} {'KiB':>8} {'sends':>7}"
+    )
+
+    async with aiohttp.ClientSession() as session:
+        bot = StubBot(session, StubDatabase(youtube, twitch), channels)
+        rss = RSS(bot)
+        rss.base_youtube = f"http://127.0.0.1:{args.port}/feeds/videos.xml?channel_id={{}}"
+        rss.base_twitch = f"http://127.0.0.1:{args.port}/helix/{{}}"
+
+        totals = collections.Counter()
+        for cycle in range(args.cycles):
+            server.publish(cycle)
+            # every feed is checked every cycle, the schedule would spread them out on the live bot
+            rss.youtube_schedule.check_now()
+            rss.twitch_schedule.check_now()
+            before, sent_before = server.stats.copy(), sends["sends"]
+
+            start = time.perf_counter()
+            for task in (rss.youtube_sub_task, rss.twitch_sub_task):
+                try:
+                    await task()
+                except Exception as e:
+                    bot.dispatch("error", e)
+
+            polled = time.perf_counter()
+            await asyncio.gather(*list(rss.deliveries))
+            delivered = time.perf_counter()
+
+            stats = server.stats - before
+            requests = stats["youtube_requests"] + stats["twitch_requests"]
+            kib = (stats["youtube_bytes"] + stats["twitch_bytes"]) / 1024
+            cycle_sends = sends["sends"] - sent_before
+            print(
+                f"{cycle:>5} {(polled - start) * 1000:>9,.0f} {(delivered - polled) * 1000:>11,.0f} "
+                f"{requests:>9,} {stats['youtube_not_modified']:>5,} {kib:>8,.0f} {cycle_sends:>7,}"
+            )
+
+            totals.update(poll=polled - start, fan_out=delivered - polled, requests=requests, kib=kib)
+
+        await bot.dispatcher.close()
+
+    await runner.cleanup()
+    print(
+        f"total {totals['poll'] * 1000:>9,.0f} {totals['fan_out'] * 1000:>11,.0f} {totals['requests']:>9,} "
+        f"{server.stats['youtube_not_modified']:>5,} {totals['kib']:>8,.0f} {sends['sends']:>7,}"
+    )
+    failures = server.stats["youtube_failures"] + server.stats["twitch_failures"]
+    print(f"{failures:,} failed requests, errors raised: {dict(bot.errors) or 'none'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscriptions", type=int, default=2000, help="subscriptions to seed")
+    parser.add_argument("--guilds", type=int, default=500, help="guilds they are spread over")
+    parser.add_argument("--youtubers", type=int, default=300, help="distinct youtube channels")
+    parser.add_argument("--streamers", type=int, default=250, help="distinct twitch channels")
+    parser.add_argument("--twitch-share", type=float, default=0.3, help="share of twitch subscriptions")
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="mean seconds per request")
+    parser.add_argument("--failure-rate", type=float, default=0.01, help="share of requests answered 500")
+    parser.add_argument("--send-latency", type=float, default=0.05, help="seconds per message sent")
+    parser.add_argument("--publish-rate", type=float, default=0.05, help="youtubers uploading per cycle")
+    parser.add_argument("--live-rate", type=float, default=0.1, help="streamers going on/offline per cycle")
+    parser.add_argument("--feeds", nargs="*", help="recorded youtube feeds to replay")
+    parser.add_argument("--streams", help="recorded Helix streams response to take streams from")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--seed", type=int, default=46)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Messages per second of the scam filter against the old hard-coded check on a synthetic corpus.
+
+python3 -m benchmarks.scam_filter [messages] [unique]
+"""
+import random
+import re
+import string
+import sys
+import time
+
+from rings.utils.scam import ScamFilter, ScamRule
+
+OLD_URL_PATTERN = r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*(),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+"
+
+WORDS = ["the", "edain", "mod", "patch", "when", "release", "gondor", "arnor", "lol", "gg", "nitro", "free"]
+SCAMS = [
+    "@everyone free discord nitro for 3 months https://discord-nitro.gift/claim",
+    "@everyone steam gave away nitro https://steamcommunlty.com/gift",
+    "hey @here check this https://dlscord.gg/nitro",
+]
+
+
+def legacy_is_scam(content: str) -> bool:
+    has_nitro = "nitro" in content.lower()
+    has_link = bool(re.findall(OLD_URL_PATTERN, content.lower()))
+    has_everyone_ping = "@everyone" in content.lower()
+
+    return has_nitro and has_link and has_everyone_ping
+
+
+def make_corpus(size: int, unique: int):
+    rng = random.Random(18)
+    pool = []
+    for _ in range(unique):
+        roll = rng.random()
+        if roll < 0.05:
+            pool.append(rng.choice(SCAMS))
+        elif roll < 0.25:
+            words = rng.choices(WORDS, k=rng.randint(3, 30))
+            path = "".join(rng.choices(string.ascii_lowercase, k=8))
+            pool.append(" ".join(words) + f" https://example.com/{path}")
+        else:
+            pool.append(" ".join(rng.choices(WORDS, k=rng.randint(1, 60))))
+
+    return [(rng.randint(1, 20), rng.choice(pool)) for _ in range(size)]
+
+
+def bench(name, func, corpus):
+    start = time.perf_counter()
+    flagged = sum(1 for guild_id, content in corpus if func(guild_id, content))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<22} {len(corpus) / elapsed:>12,.0f} msg/s  ({flagged} flagged)")
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    unique = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    corpus = make_corpus(size, unique)
+
+    print(f"{size:,} messages, {unique:,} unique contents, 20 guilds")
+    bench("legacy", lambda guild_id, content: legacy_is_scam(content), corpus)
+
+    uncached = ScamFilter(cache_size=0)
+    bench("filter (no cache)", uncached.is_scam, corpus)
+
+    cached = ScamFilter()
+    bench("filter (cached)", cached.is_scam, corpus)
+    print(f"{'':<22} cache hits {cached.hits:,} / misses {cached.misses:,}")
+
+    extended = ScamFilter()
+    for guild_id in range(1, 21):
+        extended.add_rule(guild_id, ScamRule("massping", min_mentions=10))
+        extended.add_rule(guild_id, ScamRule("phishing", domains=("steamcommunlty.com", "dlscord.gg")))
+    bench("filter (3 rules)", extended.is_scam, corpus)
+
+
+if __name__ == "__main__":
+    main()
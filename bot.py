@@ -6,6 +6,7 @@ import importlib
 import itertools
 import json
 import logging
+import os
 import sys
 import time
 import traceback
@@ -20,6 +21,7 @@ from typing import (
     List,
     Literal,
     Optional,
+    Set,
     Tuple,
     Union,
 )
@@ -30,29 +32,39 @@ import discord
 from discord.ext import commands
 
 from rings.db import SyncDatabase
+from rings.utils.automod import AutomodDigest
+from rings.utils.cleanup import ReferenceCleaner
 from rings.utils.config import DEBUG, token
+from rings.utils.dispatcher import Dispatcher
+from rings.utils.errors import ErrorAggregator
+from rings.utils.guilds import GuildCache
 from rings.utils.help import NecrobotHelp
+from rings.utils.images import BMPConverter
+from rings.utils.invites import InviteTracker
+from rings.utils.joins import JoinBatcher
+from rings.utils.posts import PostQueue
+from rings.utils.scam import ScamFilter
+from rings.utils.settings import Settings
+from rings.utils.snapshot import Snapshot
+from rings.utils.sync import CommandSync
+from rings.utils.starboard import StarTracker
 from rings.utils.ui import Confirm
 from rings.utils.utils import (
     NEGATIVE_CHECK,
     POSITIVE_CHECK,
     BotError,
-    BotSettings,
     Event,
     Giveaway,
-    Guild,
     Queue,
-    QueuedPosts,
-    default_settings,
     get_pre,
 )
 
 if TYPE_CHECKING:
     from rings.bridge import Bridge
     from rings.db import Database
+    from rings.events import Events
     from rings.meta import Meta
     from rings.rss import RSS
-    from rings.utils.utils import PotentialStar
 
 logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)
@@ -77,6 +89,9 @@ stream_handler.setFormatter(formatter)
 if DEBUG:
     logger.addHandler(stream_handler)
 
+SNAPSHOT_PATH = "rings/utils/data/snapshot.bin"
+LEGACY_SETTINGS_PATH = "rings/utils/data/settings.json"
+
 intents = discord.Intents.all()
 intents.emojis_and_stickers = False
 intents.integrations = False
@@ -127,7 +142,6 @@ class NecroBot(commands.Bot):
             "Bot Dev",
         ]
         self.bot_color = discord.Colour(0x277B0)
-        self.url_pattern = r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*(),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+"
         self.extension_names: List[str] = exts
 
         self.session: aiohttp.ClientSession = None
@@ -138,16 +152,43 @@ class NecroBot(commands.Bot):
         self.OWNER_ID = 241942232867799040
         self.TEST_BOT_ID = 339330190742126595
 
-        sync_db = SyncDatabase()
-        self.guild_data: Dict[int, Guild] = sync_db.load_guilds()
-
         self.cat_cache: List[str] = []
-        self.starred: List[int] = []
-        self.potential_stars: Dict[int, PotentialStar] = {}
+        self.scam_filter = ScamFilter()
+        self.bmp_pipeline = BMPConverter()
+        self.stars = StarTracker()
+        self.invite_tracker = InviteTracker()
+        self.automod_digest = AutomodDigest()
+        self.dispatcher = Dispatcher()
+        self.join_batcher = JoinBatcher(self)
+        self.reference_cleaner = ReferenceCleaner(self)
+        self.error_aggregator = ErrorAggregator(self)
+        self.command_sync = CommandSync(self)
+        self.bridge_queue = PostQueue(self)
+
+        # kept open for the guilds that have to be loaded without awaiting
+        self.sync_db = SyncDatabase()
+        settings = self.sync_db.load_settings()
+        if not settings and os.path.exists(LEGACY_SETTINGS_PATH):
+            with open(LEGACY_SETTINGS_PATH, "rb") as infile:
+                settings = json.load(infile)
+
+            self.sync_db.import_settings(settings)
+
+        self.settings = Settings(settings)
+        self.guild_data = GuildCache(
+            self.sync_db.load_guilds, lambda guild_ids: self.db.load_guilds(guild_ids)
+        )
+        self.snapshot = Snapshot.load(SNAPSHOT_PATH, self.sync_db.checksum())
+        if self.snapshot is None:
+            self.registered_members: Dict[int, Set[int]] = {}
+        else:
+            self.guild_data.update(self.snapshot.guild_data)
+            self.registered_members = self.snapshot.registered
+            self.stars.load_starred(self.snapshot.starred)
+            self.stars.restore(self.snapshot.candidates)
         self.reminders: Dict[int, asyncio.Task] = {}
         self.events: Dict[int, Event] = {}
         self.ongoing_giveaways: Dict[int, Giveaway] = {}
-        self.queued_posts: asyncio.Queue[QueuedPosts] = None
         self.twitch_token: Dict[str, Union[str, int]] = {}
 
         self.next_reminder_end_date: datetime.datetime = datetime.datetime.max.replace(
@@ -166,9 +207,6 @@ class NecroBot(commands.Bot):
 
         self.queue: DefaultDict[int, Queue] = defaultdict(factory)
 
-        with open("rings/utils/data/settings.json", "rb") as infile:
-            self.settings: BotSettings = {**default_settings(), **json.load(infile)}
-
     @property
     def bot_channel(self) -> discord.TextChannel:
         return self.get_channel(self.BOT_CHANNEL)
@@ -178,7 +216,25 @@ class NecroBot(commands.Bot):
         return self.get_channel(self.ERROR_CHANNEL)
 
     def blacklist_check(self, object_id) -> bool:
-        return object_id in self.settings["blacklist"]
+        return object_id in self.settings.blacklist
+
+    def save_snapshot(self):
+        """Save the caches for the next start, only once they have been fully loaded."""
+        if self.loaded is None or not self.loaded.is_set():
+            return
+
+        # the snapshot is only ever a shortcut, failing to write it must not get in the way of shutting down
+        try:
+            sync_db = SyncDatabase()
+            try:
+                snapshot = Snapshot.from_bot(self, sync_db.checksum(), sync_db.load_open_polls())
+            finally:
+                sync_db.close()
+
+            snapshot.save(SNAPSHOT_PATH)
+            logger.info("Saved the warm start snapshot")
+        except Exception as e:
+            logger.exception("Could not save the snapshot: %s", e)
 
     @property
     def meta(self) -> Meta:
@@ -236,7 +292,6 @@ class NecroBot(commands.Bot):
         await self.loaded.wait()
 
     async def setup_hook(self):
-        self.queued_posts = asyncio.Queue()
         self.loaded = asyncio.Event()
 
         for extension in self.extension_names:
@@ -308,26 +363,27 @@ class NecroBot(commands.Bot):
         """Something has gone wrong so we just try to send a helpful traceback to the channel. If
         the traceback is too big we just send the method/event that errored out and hope that
         the error is obvious."""
-        channel = self.error_channel
-
         if isinstance(event, Exception):
+            error = event
             error_traceback = " ".join(
                 traceback.format_exception(type(event), event, event.__traceback__, chain=True)
             )
         else:
+            error = sys.exc_info()[1]
             error_traceback = traceback.format_exc()
 
         embed = discord.Embed(
             title="Error",
-            description=f"```py\n{error_traceback}\n```",
+            description=f"```py\n{error_traceback[:4000]}\n```",
             colour=self.bot_color,
         )
-        embed.add_field(name="Event", value=event, inline=False)
+        embed.add_field(name="Event", value=str(event)[:1024], inline=False)
         embed.set_footer(**self.bot_footer)
-        try:
-            await channel.send(embed=embed)
-        except discord.HTTPException:
+
+        if error is None:
             logger.error(error_traceback)
+        else:
+            self.error_aggregator.report(error, embed)
 
     async def on_message(self, message: discord.Message):
         if self.blacklist_check(message.author.id):
@@ -344,6 +400,9 @@ class NecroBot(commands.Bot):
         ):
             return
 
+        if message.guild is not None:
+            await self.guild_data.fetch(message.guild.id)
+
         await self.meta.new_member(message.author, message.guild)
 
         if self.meta.is_scam(message):
@@ -405,6 +464,8 @@ async def disabled_check(ctx: commands.Context[NecroBot]):
     if ctx.guild is None:
         return True
 
+    # first of the global checks, the ones after it can then look the guild up without blocking
+    await ctx.bot.guild_data.fetch(ctx.guild.id)
     disabled = ctx.bot.guild_data[ctx.guild.id]["disabled"]
     if (
         ctx.command.name in disabled
@@ -541,9 +602,6 @@ async def off(ctx: commands.Context[NecroBot]):
     await asyncio.sleep(5)
     await bot.change_presence(activity=discord.Game(name="Bot shutting down...", type=0))
 
-    with open("rings/utils/data/settings.json", "w") as file:
-        json.dump(bot.settings, file)
-
     bot.meta.hourly_loop.cancel()
     rss_cog: RSS = bot.get_cog("RSS")
     rss_cog.task.cancel()
@@ -555,9 +613,19 @@ async def off(ctx: commands.Context[NecroBot]):
         reminder.cancel()
 
     bot.next_reminder_task.cancel()
+    bot.db.listener_task.cancel()
+    bot.bmp_pipeline.close()
+    await bot.dispatcher.close()
+
+    events_cog: Events = bot.get_cog("Events")
+    await events_cog.flush_stars()
+    await bot.automod_digest.flush_all()
+    await bot.reference_cleaner.flush_all()
+    bot.save_snapshot()
 
     await bot.session.close()
     await bot.pool.close()
+    bot.sync_db.close()
 
     await bot.bot_channel.send("**Bot Offline**")
     await bot.close()
@@ -580,5 +648,4 @@ if __name__ == "__main__":
     except Exception as error:
         logger.exception(str(error))
     finally:
-        with open("rings/utils/data/settings.json", "w") as outfile:
-            json.dump(bot.settings, outfile)
+        bot.save_snapshot()
@@ -0,0 +1,20 @@
+-- migrate:up
+CREATE TABLE necrobot.scamrules (
+    guild_id bigint NOT NULL,
+    name character varying(50) NOT NULL,
+    keywords character varying(100)[] DEFAULT '{}'::character varying[],
+    domains character varying(200)[] DEFAULT '{}'::character varying[],
+    require_link boolean DEFAULT false,
+    require_everyone boolean DEFAULT false,
+    min_mentions integer DEFAULT 0,
+    CONSTRAINT scamrules_min_mentions_check CHECK ((min_mentions >= 0))
+);
+
+ALTER TABLE ONLY necrobot.scamrules
+    ADD CONSTRAINT scamrules_pkey PRIMARY KEY (guild_id, name);
+
+ALTER TABLE ONLY necrobot.scamrules
+    ADD CONSTRAINT scamrules_guild_id_fkey FOREIGN KEY (guild_id) REFERENCES necrobot.guilds(guild_id) ON DELETE CASCADE;
+
+-- migrate:down
+DROP TABLE necrobot.scamrules;
@@ -0,0 +1,11 @@
+-- migrate:up
+ALTER TABLE necrobot.guilds
+    ADD COLUMN join_batch_window integer DEFAULT 2,
+    ADD COLUMN join_collapse integer DEFAULT 0,
+    ADD CONSTRAINT guilds_join_batch_window_check CHECK ((join_batch_window >= 0 AND join_batch_window <= 30)),
+    ADD CONSTRAINT guilds_join_collapse_check CHECK ((join_collapse >= 0));
+
+-- migrate:down
+ALTER TABLE necrobot.guilds
+    DROP COLUMN join_batch_window,
+    DROP COLUMN join_collapse;
@@ -0,0 +1,11 @@
+-- migrate:up
+CREATE TABLE necrobot.settings (
+    key character varying(50) NOT NULL,
+    value jsonb NOT NULL
+);
+
+ALTER TABLE ONLY necrobot.settings
+    ADD CONSTRAINT settings_pkey PRIMARY KEY (key);
+
+-- migrate:down
+DROP TABLE necrobot.settings;
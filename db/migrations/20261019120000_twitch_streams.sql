@@ -0,0 +1,9 @@
+-- migrate:up
+ALTER TABLE necrobot.twitch
+    ADD COLUMN stream_id character varying(50),
+    ADD COLUMN stream_started timestamp with time zone;
+
+-- migrate:down
+ALTER TABLE necrobot.twitch
+    DROP COLUMN stream_id,
+    DROP COLUMN stream_started;
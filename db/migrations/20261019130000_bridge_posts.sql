@@ -0,0 +1,27 @@
+-- migrate:up
+CREATE TABLE necrobot.bridgeposts (
+    id serial NOT NULL,
+    guild_id bigint,
+    channel_id bigint NOT NULL,
+    message_id bigint NOT NULL,
+    author_id bigint NOT NULL,
+    author_name character varying(200) NOT NULL,
+    approver_id bigint NOT NULL,
+    url character varying(200) NOT NULL,
+    content text NOT NULL,
+    status character varying(10) DEFAULT 'queued' NOT NULL,
+    attempts integer DEFAULT 0 NOT NULL,
+    next_attempt timestamp with time zone DEFAULT now() NOT NULL,
+    last_error text,
+    created_at timestamp with time zone DEFAULT now() NOT NULL,
+    posted_at timestamp with time zone,
+    CONSTRAINT bridgeposts_status_check CHECK (((status)::text = ANY ((ARRAY['queued', 'posting', 'posted', 'failed'])::text[])))
+);
+
+ALTER TABLE ONLY necrobot.bridgeposts
+    ADD CONSTRAINT bridgeposts_pkey PRIMARY KEY (id);
+
+CREATE INDEX bridgeposts_queued_idx ON necrobot.bridgeposts USING btree (next_attempt) WHERE ((status)::text = 'queued'::text);
+
+-- migrate:down
+DROP TABLE necrobot.bridgeposts;
@@ -142,6 +142,50 @@ CREATE SEQUENCE necrobot.banners_id_seq
 ALTER SEQUENCE necrobot.banners_id_seq OWNED BY necrobot.banners.id;
 
 
+--
+-- Name: bridgeposts; Type: TABLE; Schema: necrobot; Owner: -
+--
+
+CREATE TABLE necrobot.bridgeposts (
+    id integer NOT NULL,
+    guild_id bigint,
+    channel_id bigint NOT NULL,
+    message_id bigint NOT NULL,
+    author_id bigint NOT NULL,
+    author_name character varying(200) NOT NULL,
+    approver_id bigint NOT NULL,
+    url character varying(200) NOT NULL,
+    content text NOT NULL,
+    status character varying(10) DEFAULT 'queued'::character varying NOT NULL,
+    attempts integer DEFAULT 0 NOT NULL,
+    next_attempt timestamp with time zone DEFAULT now() NOT NULL,
+    last_error text,
+    created_at timestamp with time zone DEFAULT now() NOT NULL,
+    posted_at timestamp with time zone,
+    CONSTRAINT bridgeposts_status_check CHECK (((status)::text = ANY ((ARRAY['queued'::character varying, 'posting'::character varying, 'posted'::character varying, 'failed'::character varying])::text[])))
+);
+
+
+--
+-- Name: bridgeposts_id_seq; Type: SEQUENCE; Schema: necrobot; Owner: -
+--
+
+CREATE SEQUENCE necrobot.bridgeposts_id_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+
+--
+-- Name: bridgeposts_id_seq; Type: SEQUENCE OWNED BY; Schema: necrobot; Owner: -
+--
+
+ALTER SEQUENCE necrobot.bridgeposts_id_seq OWNED BY necrobot.bridgeposts.id;
+
+
 --
 -- Name: broadcasts; Type: TABLE; Schema: necrobot; Owner: -
 --
@@ -336,6 +380,10 @@ CREATE TABLE necrobot.guilds (
     auto_role bigint DEFAULT 0,
     auto_role_timer integer DEFAULT 0,
     pm_warning boolean DEFAULT false,
+    join_batch_window integer DEFAULT 2,
+    join_collapse integer DEFAULT 0,
+    CONSTRAINT guilds_join_batch_window_check CHECK (((join_batch_window >= 0) AND (join_batch_window <= 30))),
+    CONSTRAINT guilds_join_collapse_check CHECK ((join_collapse >= 0)),
     CONSTRAINT guilds_starboard_limit_check CHECK ((starboard_limit > 0))
 );
 
@@ -657,6 +705,22 @@ CREATE TABLE necrobot.rolledcharacters (
 );
 
 
+--
+-- Name: scamrules; Type: TABLE; Schema: necrobot; Owner: -
+--
+
+CREATE TABLE necrobot.scamrules (
+    guild_id bigint NOT NULL,
+    name character varying(50) NOT NULL,
+    keywords character varying(100)[] DEFAULT '{}'::character varying[],
+    domains character varying(200)[] DEFAULT '{}'::character varying[],
+    require_link boolean DEFAULT false,
+    require_everyone boolean DEFAULT false,
+    min_mentions integer DEFAULT 0,
+    CONSTRAINT scamrules_min_mentions_check CHECK ((min_mentions >= 0))
+);
+
+
 --
 -- Name: selfroles; Type: TABLE; Schema: necrobot; Owner: -
 --
@@ -667,6 +731,16 @@ CREATE TABLE necrobot.selfroles (
 );
 
 
+--
+-- Name: settings; Type: TABLE; Schema: necrobot; Owner: -
+--
+
+CREATE TABLE necrobot.settings (
+    key character varying(50) NOT NULL,
+    value jsonb NOT NULL
+);
+
+
 --
 -- Name: starred; Type: TABLE; Schema: necrobot; Owner: -
 --
@@ -705,7 +779,9 @@ CREATE TABLE necrobot.twitch (
     twitch_id character varying(50) NOT NULL,
     last_update timestamp with time zone DEFAULT now() NOT NULL,
     filter character varying(200),
-    twitch_name character varying(200)
+    twitch_name character varying(200),
+    stream_id character varying(50),
+    stream_started timestamp with time zone
 );
 
 
@@ -799,6 +875,13 @@ CREATE TABLE public.schema_migrations (
 ALTER TABLE ONLY necrobot.banners ALTER COLUMN id SET DEFAULT nextval('necrobot.banners_id_seq'::regclass);
 
 
+--
+-- Name: bridgeposts id; Type: DEFAULT; Schema: necrobot; Owner: -
+--
+
+ALTER TABLE ONLY necrobot.bridgeposts ALTER COLUMN id SET DEFAULT nextval('necrobot.bridgeposts_id_seq'::regclass);
+
+
 --
 -- Name: broadcasts broadcast_id; Type: DEFAULT; Schema: necrobot; Owner: -
 --
@@ -895,6 +978,14 @@ ALTER TABLE ONLY necrobot.banners
     ADD CONSTRAINT banners_pkey PRIMARY KEY (id);
 
 
+--
+-- Name: bridgeposts bridgeposts_pkey; Type: CONSTRAINT; Schema: necrobot; Owner: -
+--
+
+ALTER TABLE ONLY necrobot.bridgeposts
+    ADD CONSTRAINT bridgeposts_pkey PRIMARY KEY (id);
+
+
 --
 -- Name: broadcasts broadcasts_pkey; Type: CONSTRAINT; Schema: necrobot; Owner: -
 --
@@ -1127,6 +1218,14 @@ ALTER TABLE ONLY necrobot.rolledcharacters
     ADD CONSTRAINT rolledcharacters_pkey PRIMARY KEY (guild_id, user_id, char_id);
 
 
+--
+-- Name: scamrules scamrules_pkey; Type: CONSTRAINT; Schema: necrobot; Owner: -
+--
+
+ALTER TABLE ONLY necrobot.scamrules
+    ADD CONSTRAINT scamrules_pkey PRIMARY KEY (guild_id, name);
+
+
 --
 -- Name: selfroles selfroles_pkey; Type: CONSTRAINT; Schema: necrobot; Owner: -
 --
@@ -1135,6 +1234,14 @@ ALTER TABLE ONLY necrobot.selfroles
     ADD CONSTRAINT selfroles_pkey PRIMARY KEY (guild_id, id);
 
 
+--
+-- Name: settings settings_pkey; Type: CONSTRAINT; Schema: necrobot; Owner: -
+--
+
+ALTER TABLE ONLY necrobot.settings
+    ADD CONSTRAINT settings_pkey PRIMARY KEY (key);
+
+
 --
 -- Name: starred starred_pkey; Type: CONSTRAINT; Schema: necrobot; Owner: -
 --
@@ -1199,6 +1306,13 @@ ALTER TABLE ONLY public.schema_migrations
     ADD CONSTRAINT schema_migrations_pkey PRIMARY KEY (version);
 
 
+--
+-- Name: bridgeposts_queued_idx; Type: INDEX; Schema: necrobot; Owner: -
+--
+
+CREATE INDEX bridgeposts_queued_idx ON necrobot.bridgeposts USING btree (next_attempt) WHERE ((status)::text = 'queued'::text);
+
+
 --
 -- Name: aliases aliases_guild_id_fkey; Type: FK CONSTRAINT; Schema: necrobot; Owner: -
 --
@@ -1543,6 +1657,14 @@ ALTER TABLE ONLY necrobot.rolledcharacters
     ADD CONSTRAINT rolledcharacters_user_id_fkey FOREIGN KEY (user_id) REFERENCES necrobot.users(user_id) ON DELETE CASCADE;
 
 
+--
+-- Name: scamrules scamrules_guild_id_fkey; Type: FK CONSTRAINT; Schema: necrobot; Owner: -
+--
+
+ALTER TABLE ONLY necrobot.scamrules
+    ADD CONSTRAINT scamrules_guild_id_fkey FOREIGN KEY (guild_id) REFERENCES necrobot.guilds(guild_id) ON DELETE CASCADE;
+
+
 --
 -- Name: selfroles selfroles_guild_id_fkey; Type: FK CONSTRAINT; Schema: necrobot; Owner: -
 --
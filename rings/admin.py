@@ -25,7 +25,7 @@ from rings.utils.converters import (
     WritableChannelConverter,
 )
 from rings.utils.ui import Confirm, Paginator
-from rings.utils.utils import NEGATIVE_CHECK, POSITIVE_CHECK, BotError
+from rings.utils.utils import NEGATIVE_CHECK, POSITIVE_CHECK, BotError, format_dt
 
 if TYPE_CHECKING:
     from bot import NecroBot
@@ -35,6 +35,7 @@ class Admin(commands.Cog):
     """The admin cog is used by the bot admins to manage its various aspects. This cog does not contain any useful commands \
         if you are not a Bot Admin.
     """
+
     def __init__(self, bot: NecroBot):
         self.bot = bot
         self.gates: Dict[int, discord.TextChannel] = {}
@@ -287,7 +288,7 @@ class Admin(commands.Cog):
         command: commands.Command = self.bot.get_command(command)
         if command.enabled:
             command.enabled = False
-            self.bot.settings["disabled"].append(command.name)
+            await self.bot.db.add_setting_item("disabled", command.name)
             await ctx.send(f"{POSITIVE_CHECK} | Disabled **{command.name}**")
         else:
             raise BotError(f"Command **{command.name}** already disabled")
@@ -304,7 +305,7 @@ class Admin(commands.Cog):
             raise BotError(f"Command **{command.name}** already enabled")
 
         command.enabled = True
-        self.bot.settings["disabled"].remove(command.name)
+        await self.bot.db.remove_setting_item("disabled", command.name)
         await ctx.send(f"{POSITIVE_CHECK} | Enabled **{command.name}**")
 
     @admin.command(name="badges", aliases=["badge"])
@@ -351,11 +352,11 @@ class Admin(commands.Cog):
         if not isinstance(object_id, int):
             object_id = object_id.id
 
-        if object_id in self.bot.settings["blacklist"]:
-            self.bot.settings["blacklist"].remove(object_id)
+        if self.bot.blacklist_check(object_id):
+            await self.bot.db.remove_setting_item("blacklist", object_id)
             await ctx.send(f"{POSITIVE_CHECK} | Pardoned")
         else:
-            self.bot.settings["blacklist"].append(object_id)
+            await self.bot.db.add_setting_item("blacklist", object_id)
             await ctx.send(f"{POSITIVE_CHECK} | Blacklisted")
 
     @commands.command()
@@ -573,6 +574,91 @@ class Admin(commands.Cog):
         del self.gates[ctx.channel.id]
         del self.gates[channel.id]
 
+    @commands.command()
+    @commands.is_owner()
+    async def errors(self, ctx: commands.Context[NecroBot], fingerprint: str = None):
+        """See the most recent distinct errors the bot ran into or the full traceback of one of them.
+
+        {usage}
+
+        __Examples__
+        `{pre}errors` - list the most recent errors
+        `{pre}errors 1a2b3c4d` - see the traceback of the error with that fingerprint
+        """
+        aggregator = self.bot.error_aggregator
+
+        if fingerprint is not None:
+            record = aggregator.records.get(fingerprint)
+            if record is None:
+                raise BotError("No recent error with that fingerprint")
+
+            embed = discord.Embed(
+                title=f"{record.name} `{record.fingerprint}`",
+                description=f"```py\n{record.traceback[-4000:]}\n```",
+                colour=self.bot.bot_color,
+            )
+            embed.add_field(name="Occurrences", value=record.count)
+            embed.add_field(
+                name="Seen",
+                value=f"First {format_dt(datetime.datetime.fromtimestamp(record.first_seen), style='R')}\n"
+                f"Last {format_dt(datetime.datetime.fromtimestamp(record.last_seen), style='R')}",
+            )
+            embed.set_footer(**self.bot.bot_footer)
+            return await ctx.send(embed=embed)
+
+        records = aggregator.recent(20)
+        if not records:
+            return await ctx.send(f"{POSITIVE_CHECK} | No errors recorded since the last restart")
+
+        description = "\n".join(
+            f"`{record.fingerprint}` **{record.name}** x{record.count} - "
+            f"{format_dt(datetime.datetime.fromtimestamp(record.last_seen), style='R')}: {record.message[:80]}"
+            for record in records
+        )
+        embed = discord.Embed(
+            title="Recent Errors", description=description[:4096], colour=self.bot.bot_color
+        )
+        embed.set_footer(**self.bot.bot_footer)
+
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.is_owner()
+    async def metrics(self, ctx: commands.Context[NecroBot]):
+        """Get the runtime metrics of the bot's background pipelines and caches.
+
+        {usage}
+        """
+        scam_filter = self.bot.scam_filter
+
+        embed = discord.Embed(title="Metrics", colour=self.bot.bot_color)
+        embed.add_field(name="BMP Conversion", value=self.bot.bmp_pipeline.summary(), inline=False)
+        embed.add_field(
+            name="Scam Filter",
+            value=f"Cache hits/misses: {scam_filter.hits:,} / {scam_filter.misses:,}",
+            inline=False,
+        )
+        embed.add_field(name="Starboard", value=self.bot.stars.summary(), inline=False)
+        embed.add_field(name="Invite Tracking", value=self.bot.invite_tracker.summary(), inline=False)
+        embed.add_field(name="Automod Digest", value=self.bot.automod_digest.summary(), inline=False)
+        embed.add_field(name="Dispatcher", value=self.bot.dispatcher.summary(), inline=False)
+        embed.add_field(name="Join Batching", value=self.bot.join_batcher.summary(), inline=False)
+        embed.add_field(name="Reference Cleanup", value=self.bot.reference_cleaner.summary(), inline=False)
+        embed.add_field(name="Errors", value=self.bot.error_aggregator.summary(), inline=False)
+        embed.add_field(name="Guild Cache", value=self.bot.guild_data.summary(), inline=False)
+        embed.add_field(name="Bridge Posts", value=self.bot.bridge_queue.summary(), inline=False)
+        bridge_cog = self.bot.get_cog("Bridge")
+        if bridge_cog is not None:
+            embed.add_field(name="Forum Client", value=bridge_cog.forum.summary(), inline=False)
+        rss_cog = self.bot.get_cog("RSS")
+        if rss_cog is not None:
+            embed.add_field(name="YouTube Feeds", value=rss_cog.youtube_schedule.summary(), inline=False)
+            embed.add_field(name="Twitch Feeds", value=rss_cog.twitch_schedule.summary(), inline=False)
+            embed.add_field(name="Feed Delivery", value=rss_cog.delivery_summary(), inline=False)
+        embed.set_footer(**self.bot.bot_footer)
+
+        await ctx.send(embed=embed)
+
     @commands.command()
     @commands.is_owner()
     async def pull(self, ctx: commands.Context[NecroBot]):
@@ -663,50 +749,40 @@ class Admin(commands.Cog):
         self,
         ctx: commands.Context[NecroBot],
         guilds: commands.Greedy[discord.Object],
-        spec: Optional[Literal["~", "*", "^"]] = None,
+        spec: Optional[Literal["~", "~!", "*", "^", "!"]] = None,
     ) -> None:
-        """Command to sync slash commands and context menus. See more \
-        here: https://about.abstractumbra.dev/discord.py/2023/01/29/sync-command-example.html
+        """Command to sync slash commands and context menus. Only the scopes whose commands changed since \
+        their last sync are sent to Discord. See more here: https://about.abstractumbra.dev/discord.py/2023/01/29/sync-command-example.html
         
         {{usage}}
 
         __Examples__
-        `{pre}sync` - This takes all global commands within the CommandTree and sends them to Discord.
+        `{pre}sync` - This syncs the global commands and the commands of every guild, skipping the ones that haven't changed.
         `{pre}sync ~` - This will sync all guild commands for the current context's guild.
+        `{pre}sync ~!` - This syncs the guild commands of the current context's guild, even if they haven't changed.
         `{pre}sync *` - This command copies all global commands to the current guild and syncs.
         `{pre}sync ^` - This command will remove all guild commands from the CommandTree and syncs, which effectively removes all commands from the guild.
+        `{pre}sync !` - This syncs every scope, even the ones that haven't changed.
         `{pre}sync 123 456 789` - This command will sync the 3 guild ids we passed: 123, 456 and 789. Only their guilds and guild-bound commands.
+        `{pre}sync 123 456 789 !` - Same as above, even if their commands haven't changed.
 
         """
+        command_sync = self.bot.command_sync
+
+        if guilds:
+            results = await command_sync.sync(guilds, force=spec == "!")
+        elif spec in ("~", "~!"):
+            results = await command_sync.sync([ctx.guild], force=spec == "~!")
+        elif spec == "*":
+            ctx.bot.tree.copy_global_to(guild=ctx.guild)
+            results = await command_sync.sync([ctx.guild])
+        elif spec == "^":
+            ctx.bot.tree.clear_commands(guild=ctx.guild)
+            results = await command_sync.sync([ctx.guild])
+        else:
+            results = await command_sync.sync(force=spec == "!")
 
-        if not guilds:
-            if spec == "~":
-                synced = await ctx.bot.tree.sync(guild=ctx.guild)
-            elif spec == "*":
-                ctx.bot.tree.copy_global_to(guild=ctx.guild)
-                synced = await ctx.bot.tree.sync(guild=ctx.guild)
-            elif spec == "^":
-                ctx.bot.tree.clear_commands(guild=ctx.guild)
-                await ctx.bot.tree.sync(guild=ctx.guild)
-                synced = []
-            else:
-                synced = await ctx.bot.tree.sync()
-
-            await ctx.send(
-                f"Synced {len(synced)} commands {'globally' if spec is None else 'to the current guild.'}"
-            )
-            return
-
-        ret = 0
-        for guild in guilds:
-            try:
-                await ctx.bot.tree.sync(guild=guild)
-            except discord.HTTPException:
-                pass
-            else:
-                ret += 1
-
-        await ctx.send(f"Synced the tree to {ret}/{len(guilds)}.")
+        await ctx.send(command_sync.report(results)[:2000])
 
     #######################################################################
     ## Events
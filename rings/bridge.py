@@ -3,19 +3,20 @@ from __future__ import annotations
 import asyncio
 import logging
 import traceback
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, List, Optional
 
+import asyncpg
 import discord
-from bs4 import BeautifulSoup
 from discord.ext import commands
-from robobrowser.forms.form import Form
 
 from rings.utils.config import MU_Password, MU_Username
-from rings.utils.ui import BaseView
-from rings.utils.utils import NEGATIVE_CHECK, POSITIVE_CHECK, QueuedPosts, testing_or
+from rings.utils.forum import ForumClient
+from rings.utils.ui import BaseView, Paginator
+from rings.utils.utils import NEGATIVE_CHECK, POSITIVE_CHECK, BotError, testing_or
 
 if TYPE_CHECKING:
     from bot import NecroBot
+    from rings.utils.posts import PostQueue
 
 logger = logging.getLogger()
 
@@ -103,6 +104,7 @@ bug_mapping = {
 }
 
 TEST_CHANNEL = 722040731946057789
+MU_URL = "https://modding-union.com/index.php"
 
 
 class BridgeView(BaseView):
@@ -135,14 +137,9 @@ class BridgeView(BaseView):
         await self.message.add_reaction("\N{GEAR}")
         await self.message.add_reaction("\N{SLEEPING SYMBOL}")
 
-        post = {
-            "approver": interaction.user.id,
-            "url": bug_mapping[self.thread_select.values[0]]["url"],
-            "message": self.message,
-            "content": self.content,
-        }
-
-        await interaction.client.queued_posts.put(post)
+        await interaction.client.bridge_queue.add(
+            self.message, interaction.user.id, bug_mapping[self.thread_select.values[0]]["url"], self.content
+        )
         await interaction.response.edit_message(content=f"{POSITIVE_CHECK} | Post queued", view=None)
 
 
@@ -164,7 +161,7 @@ class Bridge(commands.Cog):
 
     def __init__(self, bot: NecroBot):
         self.bot = bot
-        self.cookies = False
+        self.forum = ForumClient(MU_URL, MU_Username, MU_Password)
 
     #######################################################################
     ## Cog Functions
@@ -174,85 +171,146 @@ class Bridge(commands.Cog):
 
     async def cog_unload(self):
         self.task.cancel()
+        await self.forum.close()
 
     #######################################################################
     ## Functions
     #######################################################################
 
+    async def get_message(self, job: asyncpg.Record) -> Optional[discord.Message]:
+        """The message a job was made from, None if it was deleted in the meantime."""
+        channel = self.bot.get_channel(job["channel_id"])
+        if channel is None:
+            return None
+
+        try:
+            return await channel.fetch_message(job["message_id"])
+        except discord.NotFound:
+            return None
+
     async def post_task(self):
         await self.bot.wait_until_loaded()
+        queue = self.bot.bridge_queue
 
+        recovered = False
+        delay = 1
         while True:
-            post = await self.bot.queued_posts.get()
             try:
-                await post["message"].remove_reaction("\N{SLEEPING SYMBOL}", post["message"].guild.me)
-                await self.mu_poster(post)
-                await asyncio.sleep(120)
-            except Exception as e:
-                error_traceback = " ".join(
-                    traceback.format_exception(type(e), e, e.__traceback__, chain=True)
-                )
-                logger.error(error_traceback)
+                if not recovered:
+                    await queue.recover()
+                    recovered = True
 
-                await post["message"].channel.send(f"{NEGATIVE_CHECK} | Error while sending: {e}")
-                await post["message"].remove_reaction("\N{GEAR}", post["message"].guild.me)
-
-    async def get_form(self, url, form_name):
-        async with self.bot.session.get(url) as resp:
-            soup = BeautifulSoup(await resp.read(), "html.parser")
-
-        form = soup.find("form", {"name": form_name})
-        if form is not None:
-            return Form(form)
+                await self.post_next(queue)
+            except Exception as e:
+                # most likely the database being unreachable, wait for it rather than stop posting for good.
+                # Nothing is being posted at this point, a job still marked as posting was interrupted
+                self.bot.dispatch("error", e)
+                recovered = False
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 300)
+            else:
+                delay = 1
 
-    async def submit_form(self, form: Form, submit=None, **kwargs):
-        method = form.method.upper()
+    async def post_next(self, queue: PostQueue):
+        job = await queue.next()
+        if not await queue.claim(job):
+            return
 
-        url = form.action
-        payload = form.serialize(submit=submit)
-        serialized = payload.to_requests(method)
-        kwargs.update(serialized)
+        message = None
+        try:
+            message = await self.get_message(job)
+            if message is not None:
+                try:
+                    await message.remove_reaction("\N{SLEEPING SYMBOL}", message.guild.me)
+                except discord.HTTPException:
+                    pass
+
+            await self.mu_poster(job)
+        except Exception as e:
+            error_traceback = " ".join(traceback.format_exception(type(e), e, e.__traceback__, chain=True))
+            logger.error(error_traceback)
+
+            if await queue.retry(job, e):
+                return
+
+            if message is not None:
+                try:
+                    await message.channel.send(f"{NEGATIVE_CHECK} | Error while sending: {e}")
+                    await message.remove_reaction("\N{GEAR}", message.guild.me)
+                except discord.HTTPException as e:
+                    self.bot.dispatch("error", e)
 
-        return await self.bot.session.request(method, url, **kwargs)
+            return
 
-    async def new_cookies(self):
-        url = "https://modding-union.com/index.php?action=login"
-        form = await self.get_form(url, "frmLogin")
+        # the report is on the forum, whatever goes wrong from here on must not post it again. Should
+        # recording it fail, the job stays marked as posting and is given up on rather than sent again
+        await queue.done(job)
+        if message is not None:
+            try:
+                await message.delete()
+            except discord.HTTPException as e:
+                self.bot.dispatch("error", e)
 
-        form["user"].value = MU_Username
-        form["passwrd"].value = MU_Password
-        form["cookielength"].value = "-1"
+    async def mu_poster(self, job: asyncpg.Record):
+        content = f"{job['content']} \n[hr]\n {job['author_name']} (<@{job['author_id']}>)"
 
-        await self.submit_form(form)
-        self.cookies = True
+        if job["channel_id"] == TEST_CHANNEL:
+            form = await self.forum.get_form(job["url"])
+            payload = form.payload("post", message=content)
+            await self.bot.bot_channel.send(f"Payload sent. {payload}")  # dud debug test
+        else:
+            await self.forum.post(job["url"], content)  # actual submit
 
-    async def mu_poster(self, pending: QueuedPosts, retry=0):
-        if pending is None:
-            return
+    #######################################################################
+    ## Commands
+    #######################################################################
 
-        if not self.cookies:
-            await self.new_cookies()
+    @commands.group(invoke_without_command=True)
+    @commands.is_owner()
+    async def posts(self, ctx: commands.Context[NecroBot]):
+        """List the bug reports waiting to be posted on the forum and the ones that could not be posted.
+
+        {usage}
+        """
+        jobs = await self.bot.bridge_queue.jobs()
+        if not jobs:
+            raise BotError("No bug reports waiting")
+
+        def embed_maker(view: Paginator, entries: List[asyncpg.Record]):
+            embed = discord.Embed(
+                title=f"Bug Reports ({view.page_string})",
+                description=self.bot.bridge_queue.summary(),
+                colour=self.bot.bot_color,
+            )
+            for job in entries:
+                state = (
+                    f"due {discord.utils.format_dt(job['next_attempt'], 'R')}"
+                    if job["status"] == "queued"
+                    else job["status"]
+                )
+                error = f"\nLast error: {job['last_error'][:200]}" if job["last_error"] else ""
+                embed.add_field(
+                    name=f"#{job['id']} - {state} ({job['attempts']} attempts)",
+                    value=f"By {job['author_name']} in <#{job['channel_id']}>: {job['content'][:100]}{error}",
+                    inline=False,
+                )
 
-        form = await self.get_form(pending["url"], "postmodify")
-        if form is None:
-            await self.new_cookies()
-            if retry < 3:
-                await self.mu_poster(pending, retry + 1)
-            else:
-                raise ValueError(f"Retried three times, unable to get form for {pending['message'].id}")
+            embed.set_footer(**self.bot.bot_footer)
+            return embed
 
-        content = pending["content"]
-        author = pending["message"].author
-        form["message"].value = f"{content} \n[hr]\n {author} ({author.mention})"
+        await Paginator(5, jobs, ctx.author, embed_maker=embed_maker).start(ctx)
 
-        del form.fields["preview"]
+    @posts.command(name="retry")
+    @commands.is_owner()
+    async def posts_retry(self, ctx: commands.Context[NecroBot], job_id: int):
+        """Queue a bug report that could not be posted again.
 
-        if pending["message"].channel.id == TEST_CHANNEL:
-            await self.bot.bot_channel.send(f"Payload sent. {form.serialize().data}")  # dud debug test
-        else:
-            await self.submit_form(form)  # actual submit
+        {usage}
+        """
+        if await self.bot.bridge_queue.requeue(job_id) is None:
+            raise BotError("No failed bug report with that id")
 
-        await pending["message"].delete()
+        await ctx.send(f"{POSITIVE_CHECK} | Bug report **#{job_id}** queued again")
 
 
 async def setup(bot: NecroBot):
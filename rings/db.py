@@ -1,24 +1,44 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, List
+import asyncio
+import datetime
+import functools
+import json
+import logging
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
 
 import asyncpg
 import discord
 import psycopg2
 from discord.ext import commands
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import Json, RealDictCursor
 
 from rings.utils.config import dbpass, dbusername
-from rings.utils.utils import DatabaseError
+from rings.utils.scam import ScamRule
+from rings.utils.utils import DatabaseError, Guild
 
 if TYPE_CHECKING:
     from bot import NecroBot
 
+logger = logging.getLogger()
+
+GUILD_CHANNEL = "necrobot_guild"
+SETTINGS_CHANNEL = "necrobot_settings"
+
 
 class Database(commands.Cog):
     def __init__(self, bot: NecroBot):
         self.bot = bot
 
+        # server pids of our own connections, to tell our notifications apart from other processes'
+        self.pids: Set[int] = set()
+        self.listener_task: Optional[asyncio.Task] = None
+
+    async def cog_unload(self):
+        if self.listener_task is not None:
+            self.listener_task.cancel()
+
     def math_builder(self, arg, pos, update, add):
         if update is not None:
             return f"${pos}"
@@ -35,7 +55,83 @@ class Database(commands.Cog):
         return f"AND guild_id = ${pos}"
 
     async def create_pool(self) -> asyncpg.pool.Pool:
-        self.bot.pool = await asyncpg.create_pool(database="postgres", user=dbusername, password=dbpass)
+        self.bot.pool = await asyncpg.create_pool(
+            database="postgres", user=dbusername, password=dbpass, init=self.register_conn
+        )
+
+    async def register_conn(self, conn: asyncpg.Connection):
+        self.pids.add(conn.get_server_pid())
+
+    async def notify_guild(self, guild_id, *fields, cn=None):
+        """Let other processes know that fields of a guild changed, "*" for every field."""
+        await self.query(
+            "SELECT pg_notify($1, $2 || ':' || field) FROM unnest($3::text[]) AS field",
+            GUILD_CHANNEL,
+            str(guild_id),
+            fields,
+            cn=cn,
+        )
+
+    def on_guild_notification(self, conn: asyncpg.Connection, pid: int, channel: str, payload: str):
+        if pid in self.pids:
+            return
+
+        guild_id, field = payload.split(":", 1)
+        guild_id = int(guild_id)
+        if not self.bot.guild_data.is_loaded(guild_id):
+            return
+
+        fields = None if field == "*" else [field]
+        self.bot.loop.create_task(self.bot.guild_data.refresh([guild_id], fields))
+
+    async def notify_setting(self, key: str, cn=None):
+        """Let other processes know that a bot wide setting changed."""
+        await self.query("SELECT pg_notify($1, $2)", SETTINGS_CHANNEL, key, cn=cn)
+
+    def on_setting_notification(self, conn: asyncpg.Connection, pid: int, channel: str, payload: str):
+        if pid in self.pids:
+            return
+
+        self.bot.loop.create_task(self.reload_settings([payload]))
+
+    async def reload_settings(self, keys: Optional[List[str]] = None):
+        """Read the given settings, every setting by default, back from the database after they were
+        changed elsewhere."""
+        rows = await self.query(
+            "SELECT key, value FROM necrobot.Settings WHERE $1::text[] IS NULL OR key = ANY($1)", keys
+        )
+        for row in rows:
+            self.bot.settings.apply(row["key"], json.loads(row["value"]))
+
+    async def listen(self):
+        """Apply the guild and setting changes other processes make, on a connection of its own since a
+        pooled one can't be kept listening. Reconnects if the connection drops or anything else fails."""
+        while not self.bot.is_closed():
+            try:
+                conn = await asyncpg.connect(database="postgres", user=dbusername, password=dbpass)
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.warning("Could not connect the change listener: %s", e)
+                await asyncio.sleep(30)
+                continue
+
+            lost = asyncio.Event()
+            conn.add_termination_listener(lambda _: lost.set())
+            try:
+                await conn.add_listener(GUILD_CHANNEL, self.on_guild_notification)
+                await conn.add_listener(SETTINGS_CHANNEL, self.on_setting_notification)
+
+                # changes made while nothing was listening were missed
+                await self.bot.guild_data.refresh(list(self.bot.guild_data))
+                await self.reload_settings()
+                await lost.wait()
+                logger.warning("Change listener connection lost, reconnecting")
+            except Exception:
+                # a failed refresh must not leave the process deaf to other processes for good
+                logger.exception("Change listener failed, restarting it")
+                conn.terminate()
+                await asyncio.sleep(30)
+            finally:
+                conn.terminate()
 
     async def get_conn(self) -> asyncpg.Connection:
         if self.bot.pool is None:
@@ -130,6 +226,73 @@ class Database(commands.Cog):
             user_id,
             guild_id,
         )
+        self.bot.registered_members.get(guild_id, set()).discard(user_id)
+
+    async def register_members(self, guild: discord.Guild, members: List[discord.Member]):
+        """Reset and register a batch of members that just joined the guild, the bulk counterpart of
+        deleting their permissions and calling Meta.new_member on each of them."""
+        ids = [member.id for member in members]
+        conn = await self.get_conn()
+
+        async with conn.transaction():
+            await self.query(
+                "DELETE FROM necrobot.Permissions WHERE guild_id = $1 AND user_id = ANY($2)",
+                guild.id,
+                ids,
+                cn=conn,
+            )
+            await self.query(
+                "INSERT INTO necrobot.Users(user_id) SELECT unnest($1::bigint[]) ON CONFLICT (user_id) DO NOTHING",
+                ids,
+                cn=conn,
+            )
+
+            # bot wide permission levels carry over to every server
+            global_levels = dict(
+                await self.query(
+                    """SELECT user_id, MAX(level) FROM necrobot.Permissions
+                    WHERE user_id = ANY($1) AND level >= 6 GROUP BY user_id""",
+                    ids,
+                    cn=conn,
+                )
+            )
+
+            levels = []
+            for member in members:
+                if member.id in global_levels:
+                    levels.append(global_levels[member.id])
+                elif member.id == guild.owner_id:
+                    levels.append(5)
+                elif member.guild_permissions.administrator:
+                    levels.append(4)
+                else:
+                    levels.append(0)
+
+            await self.query(
+                "INSERT INTO necrobot.Permissions SELECT $1, unnest($2::bigint[]), unnest($3::int[])",
+                guild.id,
+                ids,
+                levels,
+                cn=conn,
+            )
+            # the rows Meta.new_member creates for each member on its own
+            await self.query(
+                """INSERT INTO necrobot.LeaderboardPoints SELECT unnest($1::bigint[]), $2, 0
+                ON CONFLICT (user_id, guild_id) DO NOTHING""",
+                ids,
+                guild.id,
+                cn=conn,
+            )
+            await self.query(
+                """INSERT INTO necrobot.Flowers(guild_id, user_id) SELECT $1, unnest($2::bigint[])
+                ON CONFLICT DO NOTHING""",
+                guild.id,
+                ids,
+                cn=conn,
+            )
+
+        await self.bot.pool.release(conn)
+        self.bot.registered_members.setdefault(guild.id, set()).update(ids)
 
     async def get_title(self, user_id):
         return await self.query(
@@ -154,6 +317,7 @@ class Database(commands.Cog):
         )
 
         self.bot.guild_data[guild_id]["pm-warning"] = setting
+        await self.notify_guild(guild_id, "pm-warning")
 
     async def insert_warning(self, user_id, issuer_id, guild_id, message):
         return await self.query(
@@ -184,6 +348,7 @@ class Database(commands.Cog):
             many=True,
         )
         self.bot.guild_data[guild_id]["disabled"].extend(commands)
+        await self.notify_guild(guild_id, "disabled")
 
     async def delete_disabled(self, guild_id, *commands):
         await self.query(
@@ -194,6 +359,7 @@ class Database(commands.Cog):
         self.bot.guild_data[guild_id]["disabled"] = [
             x for x in self.bot.guild_data[guild_id]["disabled"] if x not in commands
         ]
+        await self.notify_guild(guild_id, "disabled")
 
     async def get_badges(self, user_id, *, badge=None, spot=None):
         if badge is None and spot is None:
@@ -288,12 +454,26 @@ class Database(commands.Cog):
             starred.jump_url,
         )
 
-    async def update_stars(self, message_id, user_id, increment):
+    async def get_starred_ids(self) -> List[int]:
+        rows = await self.query("SELECT message_id FROM necrobot.Starred")
+        return [row[0] for row in rows]
+
+    async def update_stars(self, changes: List[Tuple[int, int, int]]):
+        """Apply a batch of (message_id, user_id, increment) star changes in a single statement,
+        ignoring the stars users gave to their own messages."""
+        message_ids, user_ids, increments = zip(*changes)
         await self.query(
-            "UPDATE necrobot.Starred SET stars = stars + $3 WHERE message_id = $1 AND user_id != $2",
-            message_id,
-            user_id,
-            increment,
+            """UPDATE necrobot.Starred AS s SET stars = s.stars + d.increment
+            FROM (
+                SELECT c.message_id, SUM(c.increment) AS increment
+                FROM unnest($1::bigint[], $2::bigint[], $3::int[]) AS c(message_id, user_id, increment)
+                JOIN necrobot.Starred AS st ON st.message_id = c.message_id AND st.user_id != c.user_id
+                GROUP BY c.message_id
+            ) AS d
+            WHERE s.message_id = d.message_id""",
+            list(message_ids),
+            list(user_ids),
+            list(increments),
         )
 
     async def update_prefix(self, guild_id, prefix):
@@ -303,6 +483,7 @@ class Database(commands.Cog):
             guild_id,
         )
         self.bot.guild_data[guild_id]["prefix"] = prefix
+        await self.notify_guild(guild_id, "prefix")
 
     async def update_starboard_channel(self, guild_id, channel_id=0):
         await self.query(
@@ -311,6 +492,7 @@ class Database(commands.Cog):
             channel_id if channel_id else 0,
         )
         self.bot.guild_data[guild_id]["starboard-channel"] = channel_id
+        await self.notify_guild(guild_id, "starboard-channel")
 
     async def update_starboard_limit(self, guild_id, limit=1):
         await self.query(
@@ -319,6 +501,18 @@ class Database(commands.Cog):
             limit,
         )
         self.bot.guild_data[guild_id]["starboard-limit"] = limit
+        await self.notify_guild(guild_id, "starboard-limit")
+
+    async def update_join_batching(self, guild_id, window=2, collapse=0):
+        await self.query(
+            "UPDATE necrobot.Guilds SET join_batch_window = $2, join_collapse = $3 WHERE guild_id = $1",
+            guild_id,
+            window,
+            collapse,
+        )
+        self.bot.guild_data[guild_id]["join-window"] = window
+        self.bot.guild_data[guild_id]["join-collapse"] = collapse
+        await self.notify_guild(guild_id, "join-window", "join-collapse")
 
     async def update_greeting_channel(self, guild_id, channel_id=0):
         await self.query(
@@ -327,6 +521,7 @@ class Database(commands.Cog):
             channel_id if channel_id else 0,
         )
         self.bot.guild_data[guild_id]["welcome-channel"] = channel_id
+        await self.notify_guild(guild_id, "welcome-channel")
 
     async def update_welcome_message(self, guild_id, message):
         await self.query(
@@ -335,6 +530,7 @@ class Database(commands.Cog):
             guild_id,
         )
         self.bot.guild_data[guild_id]["welcome"] = message
+        await self.notify_guild(guild_id, "welcome")
 
     async def update_farewell_message(self, guild_id, message):
         await self.query(
@@ -344,6 +540,7 @@ class Database(commands.Cog):
         )
 
         self.bot.guild_data[guild_id]["goodbye"] = message
+        await self.notify_guild(guild_id, "goodbye")
 
     async def update_automod_channel(self, guild_id, channel_id=0):
         self.bot.guild_data[guild_id]["automod"] = channel_id
@@ -352,6 +549,7 @@ class Database(commands.Cog):
             guild_id,
             channel_id if channel_id else 0,
         )
+        await self.notify_guild(guild_id, "automod")
 
     async def insert_automod_ignore(self, guild_id, *objects_id):
         if not objects_id:
@@ -364,6 +562,7 @@ class Database(commands.Cog):
         )
 
         self.bot.guild_data[guild_id]["ignore-automod"].extend(objects_id)
+        await self.notify_guild(guild_id, "ignore-automod")
 
     async def delete_automod_ignore(self, guild_id, *objects_id):
         if not objects_id:
@@ -378,6 +577,7 @@ class Database(commands.Cog):
         self.bot.guild_data[guild_id]["ignore-automod"] = [
             x for x in self.bot.guild_data[guild_id]["ignore-automod"] if x not in objects_id
         ]
+        await self.notify_guild(guild_id, "ignore-automod")
 
     async def insert_command_ignore(self, guild_id, *objects_id):
         if not objects_id:
@@ -390,6 +590,7 @@ class Database(commands.Cog):
         )
 
         self.bot.guild_data[guild_id]["ignore-command"].extend(objects_id)
+        await self.notify_guild(guild_id, "ignore-command")
 
     async def delete_command_ignore(self, guild_id, *objects_id):
         if not objects_id:
@@ -404,6 +605,82 @@ class Database(commands.Cog):
         self.bot.guild_data[guild_id]["ignore-command"] = [
             x for x in self.bot.guild_data[guild_id]["ignore-command"] if x not in objects_id
         ]
+        await self.notify_guild(guild_id, "ignore-command")
+
+    async def delete_references(self, guild_id, channels_id: List[int], roles_id: List[int]):
+        """Remove every reference to the given deleted channels and roles of a guild in one transaction."""
+        objects_id = [*channels_id, *roles_id]
+        conn = await self.get_conn()
+
+        async with conn.transaction():
+            await self.query(
+                """UPDATE necrobot.Guilds SET
+                    starboard_channel = CASE WHEN starboard_channel = ANY($2) THEN 0 ELSE starboard_channel END,
+                    welcome_channel = CASE WHEN welcome_channel = ANY($2) THEN 0 ELSE welcome_channel END,
+                    automod_channel = CASE WHEN automod_channel = ANY($2) THEN 0 ELSE automod_channel END,
+                    mute = CASE WHEN mute = ANY($3) THEN 0 ELSE mute END,
+                    auto_role_timer = CASE WHEN auto_role = ANY($3) THEN 0 ELSE auto_role_timer END,
+                    auto_role = CASE WHEN auto_role = ANY($3) THEN 0 ELSE auto_role END
+                WHERE guild_id = $1""",
+                guild_id,
+                channels_id,
+                roles_id,
+                cn=conn,
+            )
+            for table in ("IgnoreAutomod", "IgnoreCommand"):
+                await self.query(
+                    f"DELETE FROM necrobot.{table} WHERE guild_id = $1 AND id = ANY($2)",
+                    guild_id,
+                    objects_id,
+                    cn=conn,
+                )
+
+            if channels_id:
+                for table in ("Youtube", "Twitch", "Broadcasts"):
+                    await self.query(
+                        f"DELETE FROM necrobot.{table} WHERE guild_id = $1 AND channel_id = ANY($2)",
+                        guild_id,
+                        channels_id,
+                        cn=conn,
+                    )
+
+            if roles_id:
+                await self.query(
+                    "DELETE FROM necrobot.SelfRoles WHERE guild_id = $1 AND id = ANY($2)",
+                    guild_id,
+                    roles_id,
+                    cn=conn,
+                )
+                await self.query(
+                    "DELETE FROM necrobot.PermissionRoles WHERE guild_id = $1 AND role_id = ANY($2)",
+                    guild_id,
+                    roles_id,
+                    cn=conn,
+                )
+
+            # delivered once the transaction commits
+            await self.notify_guild(guild_id, "*", cn=conn)
+
+        await self.bot.pool.release(conn)
+
+        # only touch the cache once the transaction went through, without yielding in between
+        guild = self.bot.guild_data[guild_id]
+        for key in ("starboard-channel", "welcome-channel", "automod"):
+            if guild[key] in channels_id:
+                guild[key] = 0
+
+        if guild["mute"] in roles_id:
+            guild["mute"] = 0
+
+        if guild["auto-role"] in roles_id:
+            guild["auto-role"] = 0
+            guild["auto-role-timer"] = 0
+
+        guild["ignore-automod"] = [x for x in guild["ignore-automod"] if x not in objects_id]
+        guild["ignore-command"] = [x for x in guild["ignore-command"] if x not in objects_id]
+        guild["self-roles"] = [x for x in guild["self-roles"] if x not in roles_id]
+        for role_id in roles_id:
+            guild["permission-roles"].pop(role_id, None)
 
     async def update_mute_role(self, guild_id, role_id=0):
         await self.query(
@@ -413,6 +690,7 @@ class Database(commands.Cog):
         )
 
         self.bot.guild_data[guild_id]["mute"] = role_id
+        await self.notify_guild(guild_id, "mute")
 
     async def update_auto_role(self, guild_id, role_id=0, timer=0):
         await self.query(
@@ -424,6 +702,7 @@ class Database(commands.Cog):
 
         self.bot.guild_data[guild_id]["auto-role"] = role_id
         self.bot.guild_data[guild_id]["auto-role-timer"] = timer
+        await self.notify_guild(guild_id, "auto-role", "auto-role-timer")
 
     async def insert_self_roles(self, guild_id, *roles_id):
         if not roles_id:
@@ -438,6 +717,7 @@ class Database(commands.Cog):
         self.bot.guild_data[guild_id]["self-roles"].extend(
             [x for x in roles_id if x not in self.bot.guild_data[guild_id]["self-roles"]]
         )
+        await self.notify_guild(guild_id, "self-roles")
 
     async def delete_self_roles(self, guild_id, *roles_id):
         if not roles_id:
@@ -452,6 +732,94 @@ class Database(commands.Cog):
         self.bot.guild_data[guild_id]["self-roles"] = [
             x for x in self.bot.guild_data[guild_id]["self-roles"] if x not in roles_id
         ]
+        await self.notify_guild(guild_id, "self-roles")
+
+    async def insert_permission_role(self, guild_id, level, role_id):
+        await self.query(
+            "INSERT INTO necrobot.PermissionRoles VALUES($1, $2, $3)",
+            guild_id,
+            level,
+            role_id,
+        )
+
+        self.bot.guild_data[guild_id]["permission-roles"][role_id] = level
+        await self.notify_guild(guild_id, "permission-roles")
+
+    async def delete_permission_level(self, guild_id, level):
+        role_id = await self.query(
+            "DELETE FROM necrobot.PermissionRoles WHERE guild_id = $1 AND level = $2 RETURNING role_id",
+            guild_id,
+            level,
+            fetchval=True,
+        )
+
+        self.bot.guild_data[guild_id]["permission-roles"].pop(role_id, None)
+        await self.notify_guild(guild_id, "permission-roles")
+        return role_id
+
+    async def delete_permission_roles(self, guild_id, *roles_id):
+        if not roles_id:
+            return
+
+        await self.query(
+            "DELETE FROM necrobot.PermissionRoles WHERE guild_id = $1 AND role_id = ANY($2);",
+            guild_id,
+            roles_id,
+        )
+
+        bindings = self.bot.guild_data[guild_id]["permission-roles"]
+        for role_id in roles_id:
+            bindings.pop(role_id, None)
+        await self.notify_guild(guild_id, "permission-roles")
+
+    async def get_scam_rules(self, guild_id=None):
+        if guild_id is not None:
+            rows = await self.query("SELECT * FROM necrobot.ScamRules WHERE guild_id = $1", guild_id)
+        else:
+            rows = await self.query("SELECT * FROM necrobot.ScamRules")
+
+        rules = defaultdict(list)
+        for row in rows:
+            rules[row["guild_id"]].append(
+                ScamRule(
+                    row["name"],
+                    keywords=tuple(row["keywords"]),
+                    domains=tuple(row["domains"]),
+                    require_link=row["require_link"],
+                    require_everyone=row["require_everyone"],
+                    min_mentions=row["min_mentions"],
+                )
+            )
+
+        return rules
+
+    async def upsert_scam_rule(self, guild_id, rule: ScamRule):
+        await self.query(
+            """INSERT INTO necrobot.ScamRules AS sr VALUES ($1, $2, $3, $4, $5, $6, $7)
+            ON CONFLICT (guild_id, name)
+            DO UPDATE SET keywords = $3, domains = $4, require_link = $5, require_everyone = $6, min_mentions = $7
+            WHERE sr.guild_id = $1 AND sr.name = $2""",
+            guild_id,
+            rule.name,
+            list(rule.keywords),
+            list(rule.domains),
+            rule.require_link,
+            rule.require_everyone,
+            rule.min_mentions,
+        )
+
+        self.bot.scam_filter.add_rule(guild_id, rule)
+
+    async def delete_scam_rule(self, guild_id, name):
+        deleted = await self.query(
+            "DELETE FROM necrobot.ScamRules WHERE guild_id = $1 AND name = $2 RETURNING name",
+            guild_id,
+            name,
+            fetchval=True,
+        )
+
+        self.bot.scam_filter.remove_rule(guild_id, name)
+        return deleted
 
     async def insert_invite(self, invite: discord.Invite):
         await self.query(
@@ -463,57 +831,56 @@ class Database(commands.Cog):
             invite.inviter.id if invite.inviter else 000,
         )
 
+        self.bot.invite_tracker.add(invite)
+
     async def delete_invite(self, invite: discord.Invite):
         await self.query("DELETE FROM necrobot.Invites WHERE id=$1", invite.id)
 
-    async def update_invites(self, guild: discord.Guild):
-        try:
-            invites: List[discord.Invite] = sorted(await guild.invites(), key=lambda x: x.created_at)
-        except discord.Forbidden:
-            return
+        self.bot.invite_tracker.remove(invite)
 
-        return_invite = None
-        for invite in invites:
-            changed = await self.query(
-                "UPDATE necrobot.Invites SET uses = $2 WHERE id = $1 AND uses < $2 RETURNING url",
-                invite.id,
-                invite.uses,
-            )
+    async def upsert_invites(self, guild_id, invites: List[discord.Invite]):
+        await self.query(
+            """INSERT INTO necrobot.Invites AS inv
+            SELECT i.id, $1, i.url, i.uses, i.inviter
+            FROM unnest($2::varchar[], $3::varchar[], $4::int[], $5::bigint[]) AS i(id, url, uses, inviter)
+            ON CONFLICT (id) DO UPDATE SET uses = EXCLUDED.uses""",
+            guild_id,
+            [invite.id for invite in invites],
+            [invite.url for invite in invites],
+            [invite.uses for invite in invites],
+            [invite.inviter.id if invite.inviter else 000 for invite in invites],
+        )
 
-            if changed and return_invite is None:
-                return_invite = invite
+    async def update_invites(self, guild: discord.Guild, count: int = 1) -> List[discord.Invite]:
+        tracker = self.bot.invite_tracker
+        if guild.id not in tracker:
+            rows = await self.query("SELECT id, uses FROM necrobot.Invites WHERE guild_id = $1", guild.id)
+            tracker.load(guild.id, [(row["id"], row["uses"]) for row in rows])
 
-        return return_invite
+        try:
+            return await tracker.resolve(
+                guild.id, guild.invites, functools.partial(self.upsert_invites, guild.id), count
+            )
+        except discord.Forbidden:
+            return []
 
     async def sync_invites(self, guild: discord.Guild):
         try:
-            invites: List[discord.Invite] = sorted(await guild.invites(), key=lambda x: x.created_at)
+            invites: List[discord.Invite] = await guild.invites()
         except discord.Forbidden:
             return
 
-        # insert
-        # update
-        for invite in invites:
-            await self.query(
-                """
-                    INSERT INTO necrobot.Invites as inv VALUES($1, $2, $3, $4, $5)
-                    ON CONFLICT (id)
-                    DO UPDATE SET uses = $4 WHERE inv.id = $1""",
-                invite.id,
-                guild.id,
-                invite.url,
-                invite.uses,
-                invite.inviter.id if invite.inviter else 000,
-                fetchval=True,
-            )
+        if invites:
+            await self.upsert_invites(guild.id, invites)
 
-        # delete
         await self.query(
             "DELETE FROM necrobot.Invites WHERE NOT(id = ANY($1)) AND guild_id = $2",
             [x.id for x in invites],
             guild.id,
         )
 
+        self.bot.invite_tracker.load(guild.id, [(invite.id, invite.uses) for invite in invites])
+
     async def get_reminders(self, user_id=None):
         if user_id is None:
             return await self.query("SELECT * FROM necrobot.Reminders")
@@ -646,12 +1013,36 @@ class Database(commands.Cog):
             fetchval=True,
         )
 
-    async def update_tw_rss(self, guild_id=None):
-        return await self.query(
-            "UPDATE necrobot.Twitch SET last_update = NOW() RETURNING last_update",
-            fetchval=True,
+    async def update_yt_last_updates(self, updates: List[Tuple[str, datetime.datetime]]):
+        if not updates:
+            return
+
+        await self.query(
+            """UPDATE necrobot.Youtube AS yt SET last_update = u.last_update
+            FROM unnest($1::varchar[], $2::timestamptz[]) AS u(youtuber_id, last_update)
+            WHERE yt.youtuber_id = u.youtuber_id""",
+            [x[0] for x in updates],
+            [x[1] for x in updates],
         )
 
+    async def update_tw_streams(self, streams: List[Tuple[str, str, datetime.datetime]]):
+        """Record the last announced stream of each (twitch_id, stream_id, started_at)."""
+        if not streams:
+            return
+
+        await self.query(
+            """UPDATE necrobot.Twitch AS tw SET stream_id = u.stream_id, stream_started = u.stream_started
+            FROM unnest($1::varchar[], $2::varchar[], $3::timestamptz[]) AS u(twitch_id, stream_id, stream_started)
+            WHERE tw.twitch_id = u.twitch_id""",
+            [x[0] for x in streams],
+            [x[1] for x in streams],
+            [x[2] for x in streams],
+        )
+
+    async def delete_rss_channels(self, channel_ids: List[int]):
+        await self.query("DELETE FROM necrobot.Youtube WHERE channel_id = ANY($1)", channel_ids)
+        await self.query("DELETE FROM necrobot.Twitch WHERE channel_id = ANY($1)", channel_ids)
+
     async def delete_yt_rss_channel(self, guild_id, *, channel_id=None, youtuber_name=None):
         if channel_id is not None:
             return await self.query(
@@ -686,6 +1077,65 @@ class Database(commands.Cog):
 
         return await self.query("DELETE FROM necrobot.Twitch WHERE guild_id = $1", guild_id)
 
+    async def load_guilds(self, guild_ids: List[int]) -> Dict[int, Guild]:
+        rows = await self.query(GUILD_QUERY.format("$1"), guild_ids)
+        return {row["guild_id"]: guild_from_row(row) for row in rows}
+
+    async def get_guild_ids(self) -> List[int]:
+        return [row[0] for row in await self.query("SELECT guild_id FROM necrobot.Guilds")]
+
+    async def set_setting(self, key: str, value):
+        new = await self.query(
+            """INSERT INTO necrobot.Settings VALUES ($1, $2::jsonb)
+            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value RETURNING value""",
+            key,
+            json.dumps(value),
+            fetchval=True,
+        )
+        self.bot.settings.apply(key, json.loads(new))
+        await self.notify_setting(key)
+
+    async def add_setting_item(self, key: str, item):
+        """Add an item to a list setting, in place so that concurrent writers don't lose each other's items."""
+        new = await self.query(
+            """INSERT INTO necrobot.Settings VALUES ($1, jsonb_build_array($2::jsonb))
+            ON CONFLICT (key) DO UPDATE SET value = CASE
+                WHEN Settings.value @> jsonb_build_array($2::jsonb) THEN Settings.value
+                ELSE Settings.value || jsonb_build_array($2::jsonb)
+            END RETURNING value""",
+            key,
+            json.dumps(item),
+            fetchval=True,
+        )
+        self.bot.settings.apply(key, json.loads(new))
+        await self.notify_setting(key)
+
+    async def remove_setting_item(self, key: str, item):
+        new = await self.query(
+            """UPDATE necrobot.Settings SET value = COALESCE(
+                (SELECT jsonb_agg(x) FROM jsonb_array_elements(value) x WHERE x <> $2::jsonb), '[]'::jsonb
+            ) WHERE key = $1 RETURNING value""",
+            key,
+            json.dumps(item),
+            fetchval=True,
+        )
+        if new is not None:
+            self.bot.settings.apply(key, json.loads(new))
+            await self.notify_setting(key)
+
+    async def set_setting_entry(self, key: str, entry, value):
+        """Set a single entry of a mapping setting, leaving the others untouched."""
+        new = await self.query(
+            """INSERT INTO necrobot.Settings VALUES ($1, jsonb_build_object($2::text, $3::jsonb))
+            ON CONFLICT (key) DO UPDATE SET value = Settings.value || EXCLUDED.value RETURNING value""",
+            key,
+            str(entry),
+            json.dumps(value),
+            fetchval=True,
+        )
+        self.bot.settings.apply(key, json.loads(new))
+        await self.notify_setting(key)
+
     async def query(self, query, *args, fetchval=False, many=False, cn=None, **kwargs):
         if cn is None:
             conn = await self.get_conn()
@@ -709,6 +1159,57 @@ class Database(commands.Cog):
         return result
 
 
+GUILD_QUERY = """
+SELECT g.*,
+    ARRAY(SELECT command FROM necrobot.Disabled WHERE guild_id = g.guild_id) as disabled,
+    ARRAY(SELECT id FROM necrobot.IgnoreAutomod WHERE guild_id = g.guild_id) as ignore_automod,
+    ARRAY(SELECT id FROM necrobot.IgnoreCommand WHERE guild_id = g.guild_id) as ignore_command,
+    ARRAY(SELECT id FROM necrobot.SelfRoles WHERE guild_id = g.guild_id) as self_roles,
+    ARRAY(SELECT role_id FROM necrobot.PermissionRoles WHERE guild_id = g.guild_id ORDER BY level) as permission_roles,
+    ARRAY(SELECT level FROM necrobot.PermissionRoles WHERE guild_id = g.guild_id ORDER BY level) as permission_levels
+FROM necrobot.Guilds g WHERE g.guild_id = ANY({})
+"""
+
+
+def guild_from_row(g) -> Guild:
+    return {
+        "mute": g["mute"],
+        "automod": g["automod_channel"],
+        "welcome-channel": g["welcome_channel"],
+        "welcome": g["welcome_message"],
+        "goodbye": g["goodbye_message"],
+        "prefix": g["prefix"],
+        "starboard-channel": g["starboard_channel"],
+        "starboard-limit": g["starboard_limit"],
+        "auto-role": g["auto_role"],
+        "auto-role-timer": g["auto_role_timer"],
+        "pm-warning": g["pm_warning"],
+        "join-window": g["join_batch_window"],
+        "join-collapse": g["join_collapse"],
+        "ignore-command": list(g["ignore_command"]),
+        "ignore-automod": list(g["ignore_automod"]),
+        "disabled": list(g["disabled"]),
+        "self-roles": list(g["self_roles"]),
+        "mutes": [],
+        "permission-roles": dict(zip(g["permission_roles"], g["permission_levels"])),
+    }
+
+
+CHECKSUM_QUERY = """
+SELECT md5(concat_ws('|',
+    (SELECT string_agg(g::text, ',' ORDER BY g.guild_id) FROM necrobot.Guilds g),
+    (SELECT coalesce(string_agg(p::text, ',' ORDER BY p.guild_id, p.user_id), '') FROM necrobot.Permissions p),
+    (SELECT coalesce(string_agg(d::text, ',' ORDER BY d.guild_id, d.command), '') FROM necrobot.Disabled d),
+    (SELECT coalesce(string_agg(i::text, ',' ORDER BY i.guild_id, i.id), '') FROM necrobot.IgnoreAutomod i),
+    (SELECT coalesce(string_agg(i::text, ',' ORDER BY i.guild_id, i.id), '') FROM necrobot.IgnoreCommand i),
+    (SELECT coalesce(string_agg(s::text, ',' ORDER BY s.guild_id, s.id), '') FROM necrobot.SelfRoles s),
+    (SELECT string_agg(concat(guild_id, ':', role_id, ':', level), ',' ORDER BY role_id) FROM necrobot.PermissionRoles),
+    (SELECT concat(count(*), ':', max(message_id)) FROM necrobot.Starred),
+    (SELECT string_agg(message_id::text, ',' ORDER BY message_id) FROM necrobot.PollsV2 WHERE open = true)
+)) as checksum
+"""
+
+
 class SyncDatabase:
     def __init__(self):
         self.conn = psycopg2.connect(
@@ -717,55 +1218,48 @@ class SyncDatabase:
             password=dbpass,
             cursor_factory=RealDictCursor,
         )
+        # the connection can stay open for the bot's lifetime, it must not sit in an open transaction
+        self.conn.autocommit = True
         self.cur = self.conn.cursor()
 
-    def load_guilds(self):
-        guilds = {}
-
-        self.cur.execute("SELECT * FROM necrobot.Guilds;")
-        for g in self.cur.fetchall():
-            guilds[g["guild_id"]] = {
-                "mute": g["mute"],
-                "automod": g["automod_channel"],
-                "welcome-channel": g["welcome_channel"],
-                "welcome": g["welcome_message"],
-                "goodbye": g["goodbye_message"],
-                "prefix": g["prefix"],
-                "starboard-channel": g["starboard_channel"],
-                "starboard-limit": g["starboard_limit"],
-                "auto-role": g["auto_role"],
-                "auto-role-timer": g["auto_role_timer"],
-                "pm-warning": g["pm_warning"],
-                "ignore-command": [],
-                "ignore-automod": [],
-                "disabled": [],
-                "self-roles": [],
-                "mutes": [],
-            }
+    def load_guilds(self, guild_ids: List[int]) -> Dict[int, Guild]:
+        self.cur.execute(GUILD_QUERY.format("%s"), (guild_ids,))
+        return {row["guild_id"]: guild_from_row(row) for row in self.cur.fetchall()}
 
-        self.cur.execute(
-            "SELECT guild_id, array_agg(command) as commands FROM necrobot.Disabled GROUP BY guild_id;"
-        )
-        for g in self.cur.fetchall():
-            guilds[g["guild_id"]]["disabled"] = g["commands"]
+    def load_settings(self) -> dict:
+        self.cur.execute("SELECT key, value FROM necrobot.Settings;")
+        return {row["key"]: row["value"] for row in self.cur.fetchall()}
 
-        self.cur.execute(
-            "SELECT guild_id, array_agg(id) as ids FROM necrobot.IgnoreAutomod GROUP BY guild_id;"
-        )
-        for g in self.cur.fetchall():
-            guilds[g["guild_id"]]["ignore-automod"] = g["ids"]
+    def import_settings(self, settings: dict):
+        """Import the settings of the old settings.json file, leaving any setting already stored alone."""
+        for key, value in settings.items():
+            self.cur.execute(
+                "INSERT INTO necrobot.Settings VALUES (%s, %s) ON CONFLICT (key) DO NOTHING;",
+                (key, Json(value)),
+            )
+
+        self.conn.commit()
 
+    def load_open_polls(self) -> List[dict]:
         self.cur.execute(
-            "SELECT guild_id, array_agg(id) as ids FROM necrobot.IgnoreCommand GROUP BY guild_id;"
+            """SELECT p.message_id, p.title, p.message, p.max_votes,
+                json_agg(json_build_array(po.id, po.message)) as options
+            FROM necrobot.PollsV2 as p
+            JOIN necrobot.PollOptions as po ON p.message_id = po.poll_id
+            WHERE p.open = true
+            GROUP BY p.message_id"""
         )
-        for g in self.cur.fetchall():
-            guilds[g["guild_id"]]["ignore-command"] = g["ids"]
+        return [dict(poll) for poll in self.cur.fetchall()]
 
-        self.cur.execute("SELECT guild_id, array_agg(id) as roles FROM necrobot.SelfRoles GROUP BY guild_id;")
-        for g in self.cur.fetchall():
-            guilds[g["guild_id"]]["self-roles"] = g["roles"]
+    def checksum(self) -> str:
+        """A cheap fingerprint of everything the warm start snapshot caches, any change made to the
+        database while the bot was offline invalidates the snapshot."""
+        self.cur.execute(CHECKSUM_QUERY)
+        return self.cur.fetchone()["checksum"]
 
-        return guilds
+    def close(self):
+        self.cur.close()
+        self.conn.close()
 
 
 async def setup(bot: NecroBot):
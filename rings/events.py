@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 import asyncio
+import collections
 import logging
 import traceback
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, List
 
 import discord
 from discord.ext import commands
@@ -18,34 +19,44 @@ logger = logging.getLogger()
 
 
 class Events(commands.Cog):
+    STAR_FLUSH_INTERVAL = 60
+
     def __init__(self, bot: NecroBot):
         self.bot = bot
 
+    async def cog_load(self):
+        self.star_flush_task = self.bot.loop.create_task(self.flush_stars_task())
+
+    async def cog_unload(self):
+        self.star_flush_task.cancel()
+
     #######################################################################
     ## Functions
     #######################################################################
 
     async def starred_reaction_handler(self, payload: discord.RawReactionActionEvent):
-        await self.bot.db.update_stars(payload.message_id, payload.user_id, 1)
+        stars = self.bot.stars
+        if stars.is_starred(payload.message_id):
+            return stars.record(payload.message_id, payload.user_id, 1)
+
+        if payload.guild_id is None or await self.bot.guild_data.fetch(payload.guild_id) is None:
+            return
 
         if not self.is_starrable(payload.guild_id, payload.channel_id, payload.message_id):
             return
 
-        if not payload.message_id in self.bot.potential_stars:
+        candidate = stars.get(payload.message_id)
+        if candidate is None:
             message = self.bot.get_message(payload.message_id)
             if message is None:
                 return
 
-            self.bot.potential_stars[payload.message_id] = {
-                "message": message,
-                "count": 0,
-            }
+            candidate = stars.add(message)
 
-        message = self.bot.potential_stars[payload.message_id]
-        if message["message"].author.id != payload.user_id:
-            message["count"] += 1
+        if candidate.author_id != payload.user_id:
+            candidate.count += 1
 
-        if message["count"] == self.bot.guild_data[payload.guild_id]["starboard-limit"]:
+        if candidate.count == self.bot.guild_data[payload.guild_id]["starboard-limit"]:
             channel = self.bot.get_channel(payload.channel_id)
             starboard = self.bot.get_channel(self.bot.guild_data[payload.guild_id]["starboard-channel"])
             if channel.is_nsfw() and not starboard.is_nsfw():
@@ -54,8 +65,119 @@ class Events(commands.Cog):
                     delete_after=30,
                 )
 
-            del self.bot.potential_stars[payload.message_id]
-            await self.bot.meta.star_message(message["message"])
+            stars.discard(payload.message_id)
+            message = self.bot.get_message(payload.message_id)
+            if message is None:
+                try:
+                    message = await channel.fetch_message(payload.message_id)
+                except discord.NotFound:
+                    return
+
+            await self.bot.meta.star_message(message)
+
+    def welcome_members(self, guild: discord.Guild, members: List[discord.Member]):
+        channel = self.bot.get_channel(self.bot.guild_data[guild.id]["welcome-channel"])
+        template = self.bot.guild_data[guild.id]["welcome"]
+        collapse = self.bot.guild_data[guild.id]["join-collapse"]
+
+        messages = []
+        for member in members:
+            if self.bot.blacklist_check(member.id):
+                messages.append(
+                    f":eight_pointed_black_star: | {member.mention}. **You are not welcome here, disturber of the peace**"
+                )
+            else:
+                messages.append(
+                    template.format(**build_format_dict(member=member, guild=guild, channel=channel))
+                )
+
+        if not collapse or len(members) < collapse:
+            for message in messages:
+                self.bot.dispatcher.send(channel, content=message, allowed_mentions=discord.AllowedMentions())
+            return
+
+        # one message for the whole wave, split along the welcomes if it gets too long
+        chunk = ""
+        for message in messages:
+            if chunk and len(chunk) + len(message) + 1 > 2000:
+                self.bot.dispatcher.send(channel, content=chunk, allowed_mentions=discord.AllowedMentions())
+                chunk = ""
+
+            chunk = f"{chunk}\n{message}" if chunk else message[:2000]
+
+        self.bot.dispatcher.send(channel, content=chunk, allowed_mentions=discord.AllowedMentions())
+
+    def log_joins(
+        self, channel: discord.TextChannel, members: List[discord.Member], invites: List[discord.Invite]
+    ):
+        # the invite counts only say how many times each invite was used over the batch, not by whom, so
+        # a join is only tied to an invite when it's the only one in its batch
+        invite = invites[0] if len(members) == 1 and invites else None
+        for member in members:
+            if invite is not None:
+                embed = discord.Embed(
+                    title="Member Joined",
+                    description=f"{member.mention} has joined the server using {invite.url}",
+                    colour=self.bot.bot_color,
+                )
+                embed.add_field(
+                    name="Invite",
+                    value=invite.inviter if invite.inviter is not None else "User Left",
+                )
+                source = f"with {invite.url}"
+            elif len(members) == 1:
+                embed = discord.Embed(
+                    title="Member Joined",
+                    description=f"{member.mention} has joined the server through Discovery.",
+                    colour=self.bot.bot_color,
+                )
+                source = "with Discovery"
+            else:
+                embed = discord.Embed(
+                    title="Member Joined",
+                    description=f"{member.mention} has joined the server along with {len(members) - 1} others.",
+                    colour=self.bot.bot_color,
+                )
+                source = f"in a batch of {len(members)}"
+
+            embed.set_footer(**self.bot.bot_footer)
+            self.bot.automod_digest.add(
+                channel,
+                embed,
+                f"[{discord.utils.utcnow():%H:%M:%S}] Joined: {member} ({member.id}) {source}",
+            )
+
+        if len(members) == 1:
+            return
+
+        uses = collections.Counter(invite.url for invite in invites)
+        inviters = {invite.url: invite.inviter for invite in invites}
+        lines = [
+            f"{url} ({inviters[url] if inviters[url] is not None else 'User Left'}): {count} use(s)"
+            for url, count in uses.most_common()
+        ]
+        if len(members) > len(invites):
+            lines.append(f"Discovery or unknown invites: {len(members) - len(invites)} join(s)")
+
+        embed = discord.Embed(
+            title="Invites Used",
+            description="\n".join(lines)[:4000],
+            colour=self.bot.bot_color,
+        )
+        embed.set_footer(**self.bot.bot_footer)
+        self.bot.automod_digest.add(
+            channel,
+            embed,
+            f"[{discord.utils.utcnow():%H:%M:%S}] Invites used by {len(members)} joins: " + ", ".join(lines),
+        )
+
+    async def remove_auto_role(self, members: List[discord.Member], role: discord.Role, timer: int):
+        await asyncio.sleep(timer)
+        for member in members:
+            try:
+                await member.remove_roles(role)
+            except discord.HTTPException:
+                pass
 
     def is_starrable(self, guild_id, channel_id, message_id):
         if self.bot.guild_data[guild_id]["starboard-channel"] in [0, channel_id]:
@@ -64,11 +186,31 @@ class Events(commands.Cog):
         if channel_id in self.bot.guild_data[guild_id]["ignore-automod"]:
             return False
 
-        if message_id in self.bot.starred:
+        if self.bot.stars.is_starred(message_id):
             return False
 
         return True
 
+    async def flush_stars(self):
+        changes = self.bot.stars.pop_pending()
+        if not changes:
+            return
+
+        try:
+            await self.bot.db.update_stars(changes)
+        except DatabaseError:
+            self.bot.stars.restore_pending(changes)
+            raise
+
+    async def flush_stars_task(self):
+        await self.bot.wait_until_loaded()
+        while not self.bot.is_closed():
+            await asyncio.sleep(self.STAR_FLUSH_INTERVAL)
+            try:
+                await self.flush_stars()
+            except Exception as e:
+                self.bot.dispatch("error", e)
+
     #######################################################################
     ## Events
     #######################################################################
@@ -107,7 +249,7 @@ class Events(commands.Cog):
             msg = f"I need {', '.join(error.missing_perms)} to be able to run this command"
         elif isinstance(error, (DatabaseError, FightError)):
             msg = str(error)
-            await self.bot.error_channel.send(embed=error.embed(self.bot))
+            self.bot.error_aggregator.report(error, error.embed(self.bot))
         elif isinstance(error, commands.CommandNotFound):
             return
         elif isinstance(error, commands.MaxConcurrencyReached):
@@ -140,10 +282,7 @@ class Events(commands.Cog):
             embed.add_field(name="Location", value=f"**Guild:** {guild}\n**Channel:** {channel}")
             embed.add_field(name="Message", value=ctx.message.content[:1024], inline=False)
 
-            try:
-                await self.bot.error_channel.send(embed=embed)
-            except discord.HTTPException:
-                logger.error(error_traceback)
+            self.bot.error_aggregator.report(error, embed)
 
             thing = ctx.guild or ctx.author
             if thing.id != 311630847969198082:
@@ -160,8 +299,9 @@ class Events(commands.Cog):
         if self.bot.blacklist_check(guild.id):
             return await guild.leave()
 
+        await self.bot.guild_data.fetch(guild.id)
         await self.bot.meta.new_guild(guild.id)
-        await self.bot.db.update_invites(guild)
+        await self.bot.db.sync_invites(guild)
 
         for member in guild.members:
             await self.bot.meta.new_member(member, guild)
@@ -174,43 +314,11 @@ class Events(commands.Cog):
 
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
-        guild_id = channel.guild.id
-        guild = self.bot.guild_data[guild_id]
-
-        if channel.id == guild["starboard-channel"]:
-            await self.bot.db.update_starboard_channel(guild_id)
-
-        if channel.id == guild["welcome-channel"]:
-            await self.bot.db.update_greeting_channel(guild_id)
-
-        await self.bot.db.delete_automod_ignore(guild_id, channel.id)
-        await self.bot.db.delete_command_ignore(guild_id, channel.id)
-        await self.bot.db.delete_yt_rss_channel(guild_id, channel_id=channel.id)
-        await self.bot.db.delete_tw_rss_channel(guild_id, channel_id=channel.id)
-
-        await self.bot.db.query("DELETE FROM necrobot.Broadcasts WHERE channel_id = $1", channel.id)
+        self.bot.reference_cleaner.channel_deleted(channel.guild.id, channel.id)
 
     @commands.Cog.listener()
     async def on_guild_role_delete(self, role: discord.Role):
-        guild_id = role.guild.id
-        guild = self.bot.guild_data[guild_id]
-
-        if role.id == guild["mute"]:
-            await self.bot.db.update_mute_role(guild_id)
-
-        if role.id in guild["self-roles"]:
-            await self.bot.db.delete_self_roles(role.id)
-
-        if role.id == guild["auto-role"]:
-            await self.bot.db.update_auto_role(role.id)
-
-        if role.id in guild["ignore-automod"]:
-            await self.bot.db.delete_automod_ignore(guild_id, role.id)
-
-        if role.id in guild["ignore-command"]:
-            await self.bot.db.delete_command_ignore(guild_id, role.id)
-
-        await self.bot.db.query("DELETE FROM necrobot.PermissionRoles WHERE role_id=$1", role.id)
+        self.bot.reference_cleaner.role_deleted(role.guild.id, role.id)
 
     @commands.Cog.listener()
     async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
@@ -257,6 +365,7 @@ class Events(commands.Cog):
         if message.guild is None or message.author.bot:
             return
 
+        await self.bot.guild_data.fetch(message.guild.id)
         if self.bot.has_automod(message):
             if not message.content:
                 message.content = "\U0000200b"
@@ -281,16 +390,20 @@ class Events(commands.Cog):
                 inline=False,
             )
             channel = self.bot.get_channel(self.bot.guild_data[message.guild.id]["automod"])
-            try:
-                await channel.send(embed=embed)
-            except discord.Forbidden:
-                pass
+            if channel is not None:
+                self.bot.automod_digest.add(
+                    channel,
+                    embed,
+                    f"[{discord.utils.utcnow():%H:%M:%S}] Deleted in #{message.channel} by {message.author} "
+                    f"({message.author.id}): {message.content}",
+                )
 
     @commands.Cog.listener()
     async def on_message_edit(self, before: discord.Message, after: discord.Message):
         if before.guild is None or before.author.bot or before.content == after.content:
             return
 
+        await self.bot.guild_data.fetch(before.guild.id)
         if self.bot.has_automod(after):
             embed = discord.Embed(
                 title="Message Edited",
@@ -310,165 +423,110 @@ class Events(commands.Cog):
             embed.set_footer(**self.bot.bot_footer)
             embed.add_field(
                 name="Before",
-                value=before.content if len(before.content) < 1024 else before.content[1020:] + "...",
+                value=before.content if len(before.content) < 1024 else before.content[:1020] + "...",
                 inline=False,
             )
             embed.add_field(
                 name="After",
-                value=after.content if len(after.content) < 1024 else after.content[1020:] + "...",
+                value=after.content if len(after.content) < 1024 else after.content[:1020] + "...",
                 inline=False,
             )
             channel = self.bot.get_channel(self.bot.guild_data[before.guild.id]["automod"])
-            try:
-                await channel.send(embed=embed)
-            except discord.Forbidden:
-                pass
+            if channel is not None:
+                self.bot.automod_digest.add(
+                    channel,
+                    embed,
+                    f"[{discord.utils.utcnow():%H:%M:%S}] Edited in #{before.channel} by {before.author} "
+                    f"({before.author.id}): {before.content!r} -> {after.content!r}",
+                )
 
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Member, after: discord.Member):
-        if len(before.roles) == len(after.roles):
+        await self.bot.guild_data.fetch(after.guild.id)
+        bindings = self.bot.guild_data[after.guild.id]["permission-roles"]
+        if not bindings:
             return
 
-        # we have less roles than before
-        if len(before.roles) > len(after.roles):
-            # get the role that was removed
-            role = [x for x in before.roles if x.id not in [x.id for x in after.roles]][0]
-
-            # get all permision bindings that the member had before one was removed
-            before_bindings = await self.bot.db.query(
-                "SELECT level, role_id FROM necrobot.PermissionRoles WHERE role_id = ANY($1)",
-                [x.id for x in before.roles],
-            )
-
-            # make sure that the role that was removed is a binding
-            if not role.id in [x["role_id"] for x in before_bindings]:
-                return
+        before_roles = {role.id for role in before.roles}
+        after_roles = {role.id for role in after.roles}
+        if before_roles == after_roles:
+            return
 
-            after_bindings = [x for x in before_bindings if x["role_id"] != role.id]
-            # check if they have any other bindings
-            if not after_bindings:
-                level = 0
-            else:
-                level = max(after_bindings, key=lambda x: x["level"])["level"]
-
-            # update accordingly
-            return await self.bot.db.query(
-                "UPDATE necrobot.Permissions SET level=$3 WHERE user_id = $1 AND guild_id = $2 AND level <= 4",
-                after.id,
-                after.guild.id,
-                level,
-            )
+        # only the bound roles that were added or removed can change the level
+        if not (before_roles ^ after_roles) & bindings.keys():
+            return
 
-        # we have more roles than before
-        if len(after.roles) > len(before.roles):
-            # get the role that was added
-            role = [x for x in after.roles if x.id not in [x.id for x in before.roles]][0]
+        before_level = max((bindings[role_id] for role_id in before_roles & bindings.keys()), default=0)
+        after_level = max((bindings[role_id] for role_id in after_roles & bindings.keys()), default=0)
+        if before_level == after_level:
+            return
 
-            # does it have a binding?
-            level = await self.bot.db.query(
-                "SELECT level FROM necrobot.PermissionRoles WHERE role_id = $1", role.id
-            )
-            if not level:
-                return
+        # a higher binding only ever raises the level, a lower one resets anything that isn't owner level
+        if after_level > before_level:
+            condition = "level < $3"
+        else:
+            condition = "level <= 4"
 
-            # update binding
-            return await self.bot.db.query(
-                "UPDATE necrobot.Permissions SET level=$1 WHERE guild_id = $2 AND user_id = $3 AND level < $1",
-                level[0]["level"],
-                after.guild.id,
-                after.id,
-            )
+        await self.bot.db.query(
+            f"UPDATE necrobot.Permissions SET level=$3 WHERE user_id = $1 AND guild_id = $2 AND {condition}",
+            after.id,
+            after.guild.id,
+            after_level,
+        )
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
-        await self.bot.db.delete_permission(member.id, member.guild.id)
-        await self.bot.db.delete_automod_ignore(member.guild.id, member.id)
-
-        await self.bot.meta.new_member(member, member.guild)
-
-        if member.bot:
-            return
-
-        if self.bot.has_welcome(member):
-            channel = self.bot.get_channel(self.bot.guild_data[member.guild.id]["welcome-channel"])
-            message = self.bot.guild_data[member.guild.id]["welcome"]
-            if self.bot.blacklist_check(member.id):
-                await channel.send(
-                    f":eight_pointed_black_star: | {member.mention}. **You are not welcome here, disturber of the peace**"
-                )
-            else:
-                message = message.format(
-                    **build_format_dict(member=member, guild=member.guild, channel=channel)
-                )
-                try:
-                    await channel.send(message, allowed_mentions=discord.AllowedMentions())
-                except discord.Forbidden:
-                    pass
+        await self.bot.guild_data.fetch(member.guild.id)
+        self.bot.join_batcher.add(member)
 
-        invite = await self.bot.db.update_invites(member.guild)
+    @commands.Cog.listener()
+    async def on_member_join_batch(self, guild: discord.Guild, members: List[discord.Member]):
+        guild_data = await self.bot.guild_data.fetch(guild.id)
 
-        if self.bot.guild_data[member.guild.id]["automod"]:
-            channel = member.guild.get_channel(self.bot.guild_data[member.guild.id]["automod"])
-            if invite:
-                embed = discord.Embed(
-                    title="Member Joined",
-                    description=f"{member.mention} has joined the server using {invite.url}",
-                    colour=self.bot.bot_color,
-                )
-                embed.add_field(
-                    name="Invite",
-                    value=invite.inviter if invite.inviter is not None else "User Left",
-                )
-                embed.set_footer(**self.bot.bot_footer)
+        await self.bot.db.register_members(guild, members)
+        await self.bot.db.delete_automod_ignore(guild.id, *[member.id for member in members])
 
-                try:
-                    await channel.send(embed=embed)
-                except discord.Forbidden:
-                    pass
+        members = [member for member in members if not member.bot]
+        if not members:
+            return
 
-            else:
-                embed = discord.Embed(
-                    title="Member Joined",
-                    description=f"{member.mention} has joined the server through Discovery.",
-                    colour=self.bot.bot_color,
-                )
-                embed.set_footer(**self.bot.bot_footer)
+        if self.bot.has_welcome(members[0]):
+            self.welcome_members(guild, members)
 
-                try:
-                    await channel.send(embed=embed)
-                except discord.Forbidden:
-                    pass
+        invites = await self.bot.db.update_invites(guild, len(members))
 
-        if self.bot.guild_data[member.guild.id]["auto-role"]:
-            role = discord.utils.get(member.guild.roles, id=self.bot.guild_data[member.guild.id]["auto-role"])
-            await member.add_roles(role)
+        channel = guild.get_channel(guild_data["automod"]) if guild_data["automod"] else None
+        if channel is not None:
+            self.log_joins(channel, members, invites)
 
-            if self.bot.guild_data[member.guild.id]["auto-role-timer"] > 0:
-                await asyncio.sleep(self.bot.guild_data[member.guild.id]["auto-role-timer"])
+        role = guild.get_role(guild_data["auto-role"]) if guild_data["auto-role"] else None
+        if role is not None:
+            for member in members:
                 try:
-                    await member.remove_roles(role)
+                    await member.add_roles(role)
                 except discord.HTTPException:
                     pass
 
+            if guild_data["auto-role-timer"] > 0:
+                self.bot.loop.create_task(self.remove_auto_role(members, role, guild_data["auto-role-timer"]))
+
     @commands.Cog.listener()
     async def on_member_remove(self, member):
         await self.bot.db.delete_permission(member.id, member.guild.id)
         # await self.bot.db.delete_automod_ignore(member.guild.id, member.id)
 
+        await self.bot.guild_data.fetch(member.guild.id)
         if self.bot.has_goodbye(member):
             channel = self.bot.get_channel(self.bot.guild_data[member.guild.id]["welcome-channel"])
             message = self.bot.guild_data[member.guild.id]["goodbye"]
 
-            if member.id in self.bot.settings["blacklist"]:
-                await channel.send(":eight_pointed_black_star: | **...**")
+            if self.bot.blacklist_check(member.id):
+                self.bot.dispatcher.send(channel, content=":eight_pointed_black_star: | **...**")
             else:
                 message = message.format(
                     **build_format_dict(member=member, guild=member.guild, channel=channel)
                 )
-                try:
-                    await channel.send(message, allowed_mentions=discord.AllowedMentions())
-                except discord.Forbidden:
-                    pass
+                self.bot.dispatcher.send(channel, content=message, allowed_mentions=discord.AllowedMentions())
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
@@ -480,33 +538,26 @@ class Events(commands.Cog):
 
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
-        if payload.user_id in self.bot.settings["blacklist"] or payload.guild_id is None:
+        if self.bot.blacklist_check(payload.user_id) or payload.guild_id is None:
             return
 
         if payload.emoji.name == "\N{WHITE MEDIUM STAR}":
-            if payload.message_id in self.bot.potential_stars:
-                message = self.bot.potential_stars[payload.message_id]
-
-                if not message["message"].author.id == payload.user_id:
-                    message["count"] -= 1
+            if self.bot.stars.is_starred(payload.message_id):
+                return self.bot.stars.record(payload.message_id, payload.user_id, -1)
 
-            await self.bot.db.update_stars(payload.message_id, payload.user_id, -1)
-
-    @commands.Cog.listener()
-    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
-        if payload.message_id in self.bot.potential_stars:
-            message: discord.Message = self.bot.potential_stars[payload.message_id]["message"]
-            message._update(payload.data)
+            candidate = self.bot.stars.get(payload.message_id)
+            if candidate is not None and candidate.author_id != payload.user_id:
+                candidate.count -= 1
 
     @commands.Cog.listener()
     async def on_raw_reaction_clear(self, payload: discord.RawReactionClearEvent):
-        if payload.message_id in self.bot.potential_stars:
-            self.bot.potential_stars[payload.message_id]["count"] = 0
+        candidate = self.bot.stars.get(payload.message_id)
+        if candidate is not None:
+            candidate.count = 0
 
     @commands.Cog.listener()
     async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
-        if payload.message_id in self.bot.potential_stars:
-            del self.bot.potential_stars[payload.message_id]
+        self.bot.stars.discard(payload.message_id)
 
 
 async def setup(bot: NecroBot):
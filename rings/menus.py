@@ -1,12 +1,9 @@
 from __future__ import annotations
-import io
 
 import typing
 import discord
 
-from PIL import Image
-
-from rings.utils.utils import NEGATIVE_CHECK, POSITIVE_CHECK
+from rings.utils.utils import NEGATIVE_CHECK, POSITIVE_CHECK, BotError
 
 if typing.TYPE_CHECKING:
     from bot import NecroBot
@@ -16,6 +13,7 @@ if typing.TYPE_CHECKING:
 @discord.app_commands.default_permissions(administrator=True)
 @discord.app_commands.guild_only()
 async def starboard_force(interaction: discord.Interaction[NecroBot], message: discord.Message):
+    await interaction.client.guild_data.fetch(interaction.guild.id)
     if not interaction.client.guild_data[interaction.guild.id]["starboard-channel"]:
         return await interaction.response.send_message(
             f"{NEGATIVE_CHECK} | Please set a starboard first", ephemeral=True
@@ -69,16 +67,12 @@ async def convert_bmp(interaction: discord.Interaction[NecroBot], message: disco
         )
 
     await interaction.response.defer()
-    converted = []
-    for index, img in enumerate(to_convert):
-        f = io.BytesIO()
-        await img.save(f)
-
-        with Image.open(f) as im:
-            output_buffer = io.BytesIO()
-            im.save(output_buffer, "png")
-            output_buffer.seek(0)
-            converted.append(discord.File(filename=f"converted{index}.png", fp=output_buffer))
+    try:
+        converted = await interaction.client.bmp_pipeline.convert(
+            interaction.guild_id, to_convert, session=interaction.client.session
+        )
+    except BotError as e:
+        return await interaction.followup.send(f"{NEGATIVE_CHECK} | {e}", ephemeral=True)
 
     await interaction.followup.send(
         f"{POSITIVE_CHECK} | {interaction.user.mention}, I converted the images like you asked",
@@ -2,33 +2,35 @@ from __future__ import annotations
 
 import asyncio
 import datetime
-import io
 import logging
-import re
 import time
 from typing import TYPE_CHECKING, Optional, Union
 
 import aiohttp
 import discord
 from discord.ext import commands
-from PIL import Image
 
 from rings.misc.ui import MatchupView
 from rings.utils.config import twitch_id, twitch_secret
 from rings.utils.converters import time_converter
 from rings.utils.ui import PollView
+from rings.utils.utils import NEGATIVE_CHECK, BotError
 
 if TYPE_CHECKING:
     from bot import NecroBot
 
 logger = logging.getLogger()
 
+# the largest guilds are kept loaded at all times
+PINNED_GUILDS = 50
+
 
 class Meta(commands.Cog):
     def __init__(self, bot: NecroBot):
         self.bot = bot
         self.bot.counter = datetime.datetime.now(datetime.timezone.utc).hour
         self.hourly_loop = None
+        self.token_refresh: Optional[asyncio.Future] = None
 
         self.tasks_hourly = [
             self.rotate_status,
@@ -60,23 +62,21 @@ class Meta(commands.Cog):
     #######################################################################
 
     async def bmp_converter(self, message: discord.Message):
-        attachment = message.attachments[0]
-        f = io.BytesIO()
-        await attachment.save(f)
-
-        with Image.open(f) as im:
-            output_buffer = io.BytesIO()
-            im.save(output_buffer, "png")
-            output_buffer.seek(0)
-            ifile = discord.File(filename="converted.png", fp=output_buffer)
+        guild_id = message.guild.id if message.guild is not None else None
+        try:
+            files = await self.bot.bmp_pipeline.convert(
+                guild_id, message.attachments[:1], session=self.bot.session
+            )
+        except BotError as e:
+            return await message.channel.send(f"{NEGATIVE_CHECK} | {e}", delete_after=30)
 
         await message.channel.send(
             content="This feature has been moved to a context menu and will soon be removed. Right click a message and select App > Convert .bmp attachement",
-            file=ifile,
+            files=files,
         )
 
     async def new_guild(self, guild_id):
-        if guild_id not in self.bot.guild_data:
+        if await self.bot.guild_data.fetch(guild_id) is None:
             welcome_message = "Welcome {member} to {server}!"
             goodbye_message = "Leaving so soon? We'll miss you, {member}!"
 
@@ -97,6 +97,9 @@ class Meta(commands.Cog):
                 "self-roles": [],
                 "pm-warning": False,
                 "mutes": [],
+                "permission-roles": {},
+                "join-window": 2,
+                "join-collapse": 0,
             }
 
             await self.bot.db.query(
@@ -114,21 +117,27 @@ class Meta(commands.Cog):
         )
 
     async def delete_guild(self, guild_id):
-        if guild_id not in self.bot.guild_data:
-            return
-
-        del self.bot.guild_data[guild_id]
+        self.bot.guild_data.forget(guild_id)
+        self.bot.registered_members.pop(guild_id, None)
+        self.bot.invite_tracker.forget(guild_id)
         await self.bot.db.query("DELETE FROM necrobot.Guilds WHERE guild_id = $1", guild_id)
+        await self.bot.db.notify_guild(guild_id, "*")
 
     async def new_member(
         self, user: Union[discord.Member, discord.User], guild: Optional[discord.Guild] = None
     ):
+        # users registered without a guild are kept under 0
+        registered = self.bot.registered_members.setdefault(guild.id if guild is not None else 0, set())
+        if user.id in registered:
+            return
+
         await self.bot.db.query(
             "INSERT INTO necrobot.Users(user_id) VALUES ($1) ON CONFLICT (user_id) DO NOTHING",
             user.id,
         )
 
         if guild is None:
+            registered.add(user.id)
             return
 
         if isinstance(user, discord.User):
@@ -157,6 +166,7 @@ class Meta(commands.Cog):
             guild.id,
             user.id,
         )
+        registered.add(user.id)
 
     async def star_message(self, message: discord.Message):
         if self.bot.blacklist_check(message.author.id):
@@ -191,8 +201,8 @@ class Meta(commands.Cog):
 
         msg = await starboard.send(content=f"In {message.channel.mention}", embed=embed)
 
-        if message.id not in self.bot.starred:
-            self.bot.starred.append(message.id)
+        if not self.bot.stars.is_starred(message.id):
+            self.bot.stars.mark_starred(message.id)
             await self.bot.db.add_star(message, msg, self.bot.guild_data[message.guild.id]["starboard-limit"])
 
     async def hourly(self):
@@ -206,7 +216,7 @@ class Meta(commands.Cog):
             if self.bot.counter >= 24:
                 logger.info("Doing daily tasks")
                 self.bot.counter = 0
-                self.bot.settings["day"] += 1
+                await self.bot.db.set_setting("day", self.bot.settings.day + 1)
                 for task in self.tasks_daily:
                     try:
                         logger.debug("Daily task: %s", task)
@@ -214,7 +224,7 @@ class Meta(commands.Cog):
                     except Exception as e:
                         self.bot.dispatch("error", e)
 
-            logger.info("It is day hour %s of day %s", self.bot.counter, self.bot.settings["day"])
+            logger.info("It is day hour %s of day %s", self.bot.counter, self.bot.settings.day)
             for task in self.tasks_hourly:
                 try:
                     logger.debug("Hourly task: %s", task.__name__)
@@ -226,30 +236,12 @@ class Meta(commands.Cog):
             logger.info("Hourly loop done")
 
     async def clear_potential_star(self):
-        ids = list(self.bot.potential_stars.keys())
-        ids.sort()
-
-        for message_id in ids:
-            limit = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=7)
-            timestamp = discord.utils.snowflake_time(message_id)
-
-            if timestamp < limit:
-                del self.bot.potential_stars[message_id]
-            else:
-                break
+        expired = self.bot.stars.expire()
+        logger.debug("Expired %s potential stars", expired)
 
     async def clear_temporary_invites(self):
         for guild in self.bot.guilds:
-            try:
-                ids = [x.id for x in await guild.invites()]
-            except discord.Forbidden:
-                return
-
-            await self.bot.db.query(
-                "DELETE FROM necrobot.Invites WHERE guild_id = $1 AND id != ANY ($2)",
-                guild.id,
-                ids,
-            )
+            await self.bot.db.sync_invites(guild)
 
     async def rotate_status(self):
         status = next(self.bot.statuses)
@@ -258,13 +250,8 @@ class Meta(commands.Cog):
         )
 
     def is_scam(self, message: discord.Message) -> bool:
-        has_nitro = "nitro" in message.content.lower()
-        # has_nitro_link = any(("nitro" in x.lower() or "gift" in x.lower()) for x in re.findall(self.bot.url_pattern, message.content))
-        has_link = bool(re.findall(self.bot.url_pattern, message.content.lower()))
-        # has_embed = bool(message.embeds)
-        has_everyone_ping = "@everyone" in message.content.lower()
-
-        return has_nitro and has_link and has_everyone_ping
+        guild_id = message.guild.id if message.guild is not None else None
+        return self.bot.scam_filter.is_scam(guild_id, message.content)
 
     async def restrain_scammer(self, scam_msg: discord.Message):
         if scam_msg.guild is None:
@@ -295,6 +282,13 @@ class Meta(commands.Cog):
             await automod.send(embed=embed)
 
     async def refresh_token(self):
+        """Get a new twitch token, callers that ask while a refresh is running wait for that one."""
+        if self.token_refresh is None or self.token_refresh.done():
+            self.token_refresh = asyncio.ensure_future(self._refresh_token())
+
+        await asyncio.shield(self.token_refresh)
+
+    async def _refresh_token(self):
         async with self.bot.session.post(
             "https://id.twitch.tv/oauth2/token",
             params={
@@ -314,9 +308,22 @@ class Meta(commands.Cog):
     async def load_cache(self):
         await self.bot.wait_until_ready()
         await self.bot.db.create_pool()
+        self.bot.db.listener_task = self.bot.loop.create_task(self.bot.db.listen())
         self.bot.session = aiohttp.ClientSession(loop=self.bot.loop)
 
+        snapshot, self.bot.snapshot = self.bot.snapshot, None
+        if snapshot is None:
+            logger.info("Cold start, loading every cache from the database")
+        else:
+            logger.info(
+                "Warm start from the snapshot taken at %s", datetime.datetime.fromtimestamp(snapshot.created)
+            )
+
         msg = await self.bot.bot_channel.send("**Initiating Bot**")
+        await self.bot.guild_data.fetch_many([guild.id for guild in self.bot.guilds])
+        largest = sorted(self.bot.guilds, key=lambda guild: guild.member_count or 0, reverse=True)
+        self.bot.guild_data.pin([guild.id for guild in largest[:PINNED_GUILDS]])
+
         for guild in self.bot.guilds:
             logger.info("Loading guild %s (%s)", guild.name, guild.id)
             await self.new_guild(guild.id)
@@ -325,8 +332,18 @@ class Meta(commands.Cog):
             for member in guild.members:
                 await self.new_member(member, guild)
 
-        for guild in [x for x in self.bot.guild_data if self.bot.get_guild(x) is None]:
-            await self.delete_guild(guild)
+        for guild_id in await self.bot.db.get_guild_ids():
+            if self.bot.get_guild(guild_id) is None:
+                await self.delete_guild(guild_id)
+
+        for guild_id, rules in (await self.bot.db.get_scam_rules()).items():
+            self.bot.scam_filter.set_rules(guild_id, rules)
+
+        if snapshot is None:
+            self.bot.stars.load_starred(await self.bot.db.get_starred_ids())
+
+        for scope, result in await self.bot.command_sync.sync():
+            logger.info("Application commands for %s: %s", scope, "unchanged" if result is None else result)
 
         await msg.edit(content="All servers checked")
 
@@ -364,21 +381,25 @@ class Meta(commands.Cog):
 
         await self.refresh_token()
 
-        for command_name in self.bot.settings["disabled"]:
+        for command_name in self.bot.settings.disabled:
             command = self.bot.get_command(command_name)
             if command is not None:
                 logger.info("Disabling %s", command.name)
                 command.enabled = False
 
-        polls = await self.bot.db.query(
-            """
-                SELECT p.*, array_agg((po.id, po.message)) as options 
-                FROM necrobot.PollsV2 as p 
-                JOIN necrobot.PollOptions as po ON p.message_id = po.poll_id
-                WHERE p.open = true
-                GROUP BY p.message_id
-            """
-        )
+        if snapshot is None:
+            polls = await self.bot.db.query(
+                """
+                    SELECT p.*, array_agg((po.id, po.message)) as options 
+                    FROM necrobot.PollsV2 as p 
+                    JOIN necrobot.PollOptions as po ON p.message_id = po.poll_id
+                    WHERE p.open = true
+                    GROUP BY p.message_id
+                """
+            )
+        else:
+            polls = snapshot.polls
+
         for poll in polls:
             logger.info("Recovering poll %s", poll["message_id"])
             self.bot.add_view(
@@ -393,7 +414,7 @@ class Meta(commands.Cog):
                 message_id=poll["message_id"],
             )
 
-        for guild_id, message_id in self.bot.settings["matchup_views"].items():
+        for guild_id, message_id in self.bot.settings.matchup_views.items():
             logger.info("Recovering matchup view %s for guild %s", message_id, guild_id)
             self.bot.add_view(MatchupView(), message_id=message_id)
 
@@ -450,11 +471,10 @@ class Meta(commands.Cog):
             guild.id,
             members,
         )
+        self.bot.registered_members.get(guild.id, set()).intersection_update(members)
 
-        await self.bot.db.query(
-            "DELETE FROM necrobot.PermissionRoles WHERE guild_id = $1 AND NOT(role_id = any($2))",
-            guild.id,
-            roles,
+        await self.bot.db.delete_permission_roles(
+            guild.id, *[role for role in g["permission-roles"] if role not in roles]
         )
 
     async def reminder_task(self, reminder_id, sleep, message, channel_id, user_id):
@@ -534,16 +554,20 @@ class Meta(commands.Cog):
         user = self.bot.get_user(reminder["user_id"])
         if channel is not None and user is not None:
             if reminder["reminder"] is None or reminder["reminder"] == "":
-                await channel.send(
-                    f":alarm_clock: | {user.mention}, you asked to be reminded (ID: {reminder['id']})!"
+                self.bot.dispatcher.send(
+                    channel,
+                    content=f":alarm_clock: | {user.mention}, you asked to be reminded (ID: {reminder['id']})!",
+                    max_age=None,
                 )
             else:
-                await channel.send(
-                    f":alarm_clock: | {user.mention} reminder (ID: {reminder['id']}): **{reminder['reminder']}**"
+                self.bot.dispatcher.send(
+                    channel,
+                    content=f":alarm_clock: | {user.mention} reminder (ID: {reminder['id']}): **{reminder['reminder']}**",
+                    max_age=None,
                 )
 
     async def broadcast(self):
-        total_hours = (self.bot.settings["day"] * 24) + self.bot.counter
+        total_hours = (self.bot.settings.day * 24) + self.bot.counter
 
         broadcasts = await self.bot.db.query(
             "SELECT * FROM necrobot.Broadcasts WHERE MOD(($1 - start_time), interval) = 0 AND enabled=True",
@@ -551,14 +575,13 @@ class Meta(commands.Cog):
         )
 
         for broadcast in broadcasts:
-            try:
-                await self.bot.get_channel(broadcast[2]).send(
-                    broadcast[5], allowed_mentions=discord.AllowedMentions()
-                )
-            except discord.Forbidden:
-                pass
-            except Exception as e:
-                await self.bot.error_channel.send(f"Broadcast error with guild {broadcast[1]}\n{e}")
+            # a broadcast that can't go out within the hour is superseded by the next one
+            self.bot.dispatcher.send(
+                self.bot.get_channel(broadcast[2]),
+                content=broadcast[5],
+                allowed_mentions=discord.AllowedMentions(),
+                max_age=3600,
+            )
 
 
 async def setup(bot: NecroBot):
@@ -342,7 +342,7 @@ class Misc(commands.Cog):
             "Use this message to register victories and losses for factions in 1v1 games you have played. Select a winner, a loser and then click confirm.",
             view=MatchupView(),
         )
-        self.bot.settings["matchup_views"][ctx.guild.id] = msg.id
+        await self.bot.db.set_setting_entry("matchup_views", ctx.guild.id, msg.id)
 
     @matchups.command(name="delete")
     @guild_only(496617962334060545)
@@ -678,17 +678,22 @@ class Moderation(commands.Cog):
             self.bot.guild_data[guild.id]["mutes"].remove(user.id)
 
     @commands.Cog.listener()
-    async def on_member_join(self, member: discord.Member):
-        role = discord.utils.get(member.guild.roles, id=self.bot.guild_data[member.guild.id]["mute"])
+    async def on_member_join_batch(self, guild: discord.Guild, members: List[discord.Member]):
+        mutes = self.bot.guild_data[guild.id]["mutes"]
+        evaders = [member for member in members if member.id in mutes]
+        if not evaders:
+            return
+
+        role = guild.get_role(self.bot.guild_data[guild.id]["mute"])
         if role is None:
             return
 
-        if member.id in self.bot.guild_data[member.guild.id]["mutes"]:
+        automod = guild.get_channel(self.bot.guild_data[guild.id]["automod"])
+        for member in evaders:
             await member.add_roles(role)
-            self.bot.guild_data[member.guild.id]["mutes"].remove(member.id)
+            mutes.remove(member.id)
 
-            automod = self.bot.guild_data[member.guild.id]["automod"]
-            if automod:
+            if automod is not None:
                 embed = discord.Embed(
                     title="Mute Evasion Countered",
                     description=f"User **{member}** has rejoined the server and has resumed their mute.",
@@ -696,7 +701,7 @@ class Moderation(commands.Cog):
                 )
                 embed.set_footer(**self.bot.bot_footer)
 
-                await member.guild.get_channel(automod).send(embed=embed)
+                self.bot.dispatcher.send(automod, embed=embed)
 
 
 async def setup(bot: NecroBot):
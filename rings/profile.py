@@ -428,7 +428,7 @@ class Profile(commands.Cog):
 
             return embed
 
-        await Paginator(1, self.bot.settings["shop"], ctx.author, embed_maker=embed_maker).start(ctx)
+        await Paginator(1, self.bot.settings.shop, ctx.author, embed_maker=embed_maker).start(ctx)
 
     @badge_shop.command(name="generate")
     @has_perms(6)
@@ -488,7 +488,7 @@ class Profile(commands.Cog):
             msg = await ctx.send(file=file)
             urls.append(msg.attachments[0].url)
 
-        self.bot.settings["shop"] = urls
+        await self.bot.db.set_setting("shop", urls)
         await ctx.send(f"{POSITIVE_CHECK} | Done generating and updating")
 
     @commands.group(invoke_without_command=True, aliases=["star"])
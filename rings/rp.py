@@ -223,14 +223,13 @@ class RP(commands.Cog):
         )
 
         for subscriber in subscribers:
-            try:
-                member = message.channel.guild.get_member(subscriber["user_id"])
-                if member is not None and message.channel.permissions_for(member).read_messages:
-                    await member.send(
-                        f"A message was sent to one of your subscribed channels! See here: {message.jump_url}"
-                    )
-            except discord.Forbidden:
-                pass
+            member = message.channel.guild.get_member(subscriber["user_id"])
+            if member is not None and message.channel.permissions_for(member).read_messages:
+                self.bot.dispatcher.send(
+                    member,
+                    content=f"A message was sent to one of your subscribed channels! See here: {message.jump_url}",
+                    max_age=300,
+                )
 
 
 async def setup(bot: NecroBot):
@@ -1,31 +1,39 @@
 from __future__ import annotations
 
 import asyncio
+import concurrent.futures
 import datetime
+import logging
 import random
 import re
 import time
 from collections import defaultdict
 from time import mktime
-from typing import TYPE_CHECKING, Annotated, Dict, List
+from typing import TYPE_CHECKING, Annotated, Dict, List, Optional, Set, Tuple
 
 import discord
-import feedparser
 from bs4 import BeautifulSoup
 from discord.ext import commands
 
 from rings.utils.checks import has_perms
 from rings.utils.config import twitch_id
 from rings.utils.converters import WritableChannelConverter
+from rings.utils.feeds import (
+    FeedEntry,
+    FeedScheduler,
+    group_by_filter,
+    matching_channels,
+    parse_youtube_feed,
+)
 from rings.utils.ui import Paginator
 from rings.utils.utils import POSITIVE_CHECK, BotError
 
 if TYPE_CHECKING:
     from bot import NecroBot
 
+logger = logging.getLogger()
 
-def convert(t):
-    return datetime.datetime.strptime(t[:-3] + t[-2:], "%Y-%m-%dT%H:%M:%S%z")
+FEED_CONCURRENCY = 10
 
 
 class RSS(commands.Cog):
@@ -34,14 +42,39 @@ class RSS(commands.Cog):
     def __init__(self, bot: NecroBot):
         self.bot = bot
         self.base_youtube = "https://www.youtube.com/feeds/videos.xml?channel_id={}"
+        self.base_twitch = "https://api.twitch.tv/helix/{}"
         self.task = None
 
+        self.feed_semaphore = asyncio.Semaphore(FEED_CONCURRENCY)
+        self.parser = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="feeds")
+        self.feed_wakeup = asyncio.Event()
+        self.youtube_schedule = FeedScheduler(wakeup=self.feed_wakeup)
+        # streams are short lived, a stream that is missed is missed for good
+        self.twitch_schedule = FeedScheduler(max_interval=1800, wakeup=self.feed_wakeup)
+        # ETag and Last-Modified of the last fetch of each youtuber's feed
+        self.feed_validators: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        # id and start of the last stream announced for each twitch channel, streams that didn't start
+        # after it aren't announced
+        self.twitch_streams: Dict[str, Tuple[Optional[str], datetime.datetime]] = {}
+
+        self.deliveries: Set[asyncio.Task] = set()
+        self.delivery_stats: Dict[str, float] = {
+            "entries": 0,
+            "sent": 0,
+            "pruned": 0,
+            "time": 0.0,
+            "max_time": 0.0,
+        }
+
     #######################################################################
     ## Cog Functions
     #######################################################################
 
     async def cog_unload(self):
         self.task.cancel()
+        for task in list(self.deliveries):
+            task.cancel()
+        self.parser.shutdown(wait=False)
 
     async def cog_load(self):
         self.task = self.bot.loop.create_task(self.rss_task())
@@ -50,6 +83,34 @@ class RSS(commands.Cog):
     ## Functions
     #######################################################################
 
+    async def fetch_youtube_feed(
+        self, youtuber_id: str, since: datetime.datetime
+    ) -> Optional[Tuple[List[FeedEntry], Tuple[Optional[str], Optional[str]]]]:
+        """Fetch the feed of a youtuber and parse its entries newer than `since` along with the newest
+        older one. None if the feed hasn't changed since the last time it was fetched. The ETag and
+        Last-Modified of the response are returned with the entries rather than kept right away, they
+        are only kept once the entries have been recorded."""
+        headers = {}
+        etag, last_modified = self.feed_validators.get(youtuber_id, (None, None))
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+
+        async with self.feed_semaphore:
+            async with self.bot.session.get(self.base_youtube.format(youtuber_id), headers=headers) as resp:
+                if resp.status == 304:
+                    return None
+
+                resp.raise_for_status()
+                validators = (resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+                raw = await resp.read()
+
+        entries = await asyncio.get_running_loop().run_in_executor(
+            self.parser, parse_youtube_feed, raw, since
+        )
+        return entries, validators
+
     async def youtube_sub_task(self):
         feeds = await self.bot.db.query(
             """
@@ -59,77 +120,118 @@ class RSS(commands.Cog):
         """
         )
 
-        to_send = []
-        for feed in feeds:
-            async with self.bot.session.get(self.base_youtube.format(feed[0])) as resp:
-                parsed_feed = feedparser.parse(await resp.text())["entries"]
+        self.youtube_schedule.sync(feed[0] for feed in feeds)
+        due = set(self.youtube_schedule.pop_due())
+        feeds = [feed for feed in feeds if feed[0] in due]
 
-            if not parsed_feed:
-                continue
+        results = await asyncio.gather(
+            *[self.fetch_youtube_feed(feed[0], feed[1]) for feed in feeds], return_exceptions=True
+        )
 
-            date = convert(parsed_feed[0]["published"])
-            if date <= feed[1]:
+        to_send = []
+        updates = []
+        validators = {}
+        for feed, result in zip(feeds, results):
+            if isinstance(result, BaseException):
+                logger.warning("Could not check the feed of %s: %s", feed[0], result)
+                self.youtube_schedule.failed(feed[0])
                 continue
 
-            parsed_feed.reverse()
+            if result is None:
+                self.youtube_schedule.checked(feed[0], False)
+                continue
 
-            d = {"channels": feed[2], "entries": []}
-            for entry in parsed_feed:
-                published = convert(entry["published"])
-                if published > feed[1]:
-                    d["entries"].append(entry)
+            entries, validators[feed[0]] = result
+            new = [entry for entry in entries if entry.published > feed[1]]
+            self.youtube_schedule.checked(
+                feed[0], bool(new), [entry.published.timestamp() for entry in entries]
+            )
+            if not new:
+                continue
 
-            to_send.append(d)
+            new.reverse()
+            to_send.append({"channels": group_by_filter(feed[2]), "entries": new})
+            updates.append((feed[0], new[-1].published))
 
-            await self.bot.db.query(
-                "UPDATE necrobot.Youtube SET last_update=$1 WHERE youtuber_id=$2",
-                date,
-                feed[0],
-            )
+        await self.bot.db.update_yt_last_updates(updates)
+        # a feed is only answered with 304 once its entries are recorded, or they would never be seen
+        self.feed_validators.update(validators)
 
         for feed in to_send:
             for entry in feed["entries"]:
-                description = entry["summary"].splitlines()
                 embed = discord.Embed(
-                    title=entry["title"],
-                    description=description[0] if description else "No description",
-                    url=entry["link"],
+                    title=entry.title,
+                    description=entry.description or "No description",
+                    url=entry.link,
                 )
-                embed.set_author(
-                    name=entry["author_detail"]["name"],
-                    url=entry["author_detail"]["href"],
-                )
-                embed.set_thumbnail(url=entry["media_thumbnail"][0]["url"])
+                embed.set_author(name=entry.author, url=entry.author_url)
+                embed.set_thumbnail(url=entry.thumbnail)
                 embed.set_footer(**self.bot.bot_footer)
 
-                for channel_id, title_filter in feed["channels"]:
-                    if title_filter in entry["title"].lower():
-                        try:
-                            await self.bot.get_channel(channel_id).send(embed=embed)
-                        except discord.Forbidden:
-                            pass
+                self.deliver(matching_channels(feed["channels"], entry.title), embed=embed, max_age=None)
+
+    def twitch_stream_state(self, rows) -> Tuple[Optional[str], datetime.datetime]:
+        """The last announced stream of a twitch channel according to its subscriptions, for channels
+        that haven't been seen yet the time the first subscription was made."""
+        announced = [row for row in rows if row["stream_id"] is not None]
+        if announced:
+            row = max(announced, key=lambda x: x["stream_started"])
+            return row["stream_id"], row["stream_started"]
+
+        return None, min(row["last_update"] for row in rows)
 
     async def twitch_sub_task(self):
         entries = await self.bot.db.query("SELECT * FROM necrobot.Twitch")
-        if not entries:
-            return
-
-        last_time = min([x["last_update"] for x in entries])
 
         feeds = defaultdict(list)
         for entry in entries:
-            feeds[entry["twitch_id"]].append((entry["channel_id"], entry["filter"]))
+            feeds[entry["twitch_id"]].append(entry)
+
+        channels = {
+            streamer_id: group_by_filter((x["channel_id"], x["filter"]) for x in rows)
+            for streamer_id, rows in feeds.items()
+        }
 
-        streams = await self.get_twitch_streams(list(feeds.keys()))
-        time_limit = await self.bot.db.update_tw_rss()
+        self.twitch_schedule.sync(feeds.keys())
+        for streamer_id in set(self.twitch_streams).difference(feeds):
+            del self.twitch_streams[streamer_id]
 
+        due = [streamer_id for streamer_id in self.twitch_schedule.pop_due() if streamer_id in feeds]
+        if not due:
+            return
+
+        for streamer_id in due:
+            if streamer_id not in self.twitch_streams:
+                self.twitch_streams[streamer_id] = self.twitch_stream_state(feeds[streamer_id])
+
+        try:
+            streams = await self.get_twitch_streams(due)
+        except Exception:
+            for streamer_id in due:
+                self.twitch_schedule.failed(streamer_id)
+            raise
+
+        live = {}
         for stream in streams:
-            if (
-                datetime.datetime.strptime(stream["started_at"].replace("Z", "+00:00"), "%Y-%m-%dT%H:%M:%S%z")
-                <= last_time
-            ):
+            started_at = datetime.datetime.fromisoformat(stream["started_at"].replace("Z", "+00:00"))
+            live[str(stream["user_id"])] = (stream, started_at)
+
+        announced = []
+        for streamer_id in due:
+            if streamer_id not in live:
+                self.twitch_schedule.checked(streamer_id, False)
+                continue
+
+            stream, started_at = live[streamer_id]
+            last_id, last_started = self.twitch_streams[streamer_id]
+            new = stream["id"] != last_id and started_at > last_started
+            self.twitch_schedule.checked(streamer_id, new, [started_at.timestamp()])
+            if not new:
                 continue
 
+            self.twitch_streams[streamer_id] = (stream["id"], started_at)
+            announced.append((streamer_id, stream["id"], started_at))
+
             embed = discord.Embed(
                 title="Streamer Live",
                 description=f"**{stream['user_name']}** has started streaming. Join here: [{stream['title'] if stream['title'] else 'Link'}](https://www.twitch.tv/{stream['user_name']}).",
@@ -137,12 +239,54 @@ class RSS(commands.Cog):
             embed.set_thumbnail(url=stream["thumbnail_url"].format(width=1280, height=720))
             embed.set_footer(**self.bot.bot_footer)
 
-            for channel, title_filter in feeds[str(stream["user_id"])]:
-                if title_filter in stream["title"].lower():
-                    try:
-                        await self.bot.get_channel(channel).send(embed=embed)
-                    except discord.Forbidden:
-                        pass
+            self.deliver(matching_channels(channels[streamer_id], stream["title"]), embed=embed)
+
+        await self.bot.db.update_tw_streams(announced)
+
+    def deliver(self, channel_ids: List[int], **kwargs):
+        """Send an entry to the channels subscribed to it in the background."""
+        if not channel_ids:
+            return
+
+        task = self.bot.loop.create_task(self._deliver(channel_ids, **kwargs))
+        self.deliveries.add(task)
+        task.add_done_callback(self.deliveries.discard)
+
+    async def _deliver(self, channel_ids: List[int], **kwargs):
+        start = time.monotonic()
+        outcomes = await self.bot.dispatcher.fan_out(
+            [self.bot.get_channel(channel_id) for channel_id in channel_ids], **kwargs
+        )
+        elapsed = time.monotonic() - start
+
+        self.delivery_stats["entries"] += 1
+        self.delivery_stats["sent"] += len(outcomes["sent"])
+        self.delivery_stats["time"] += elapsed
+        self.delivery_stats["max_time"] = max(self.delivery_stats["max_time"], elapsed)
+        logger.debug(
+            "Delivered an entry to %s/%s channels in %.2fs", len(outcomes["sent"]), len(channel_ids), elapsed
+        )
+
+        # the channel was deleted or we can't post in it anymore
+        gone = outcomes["gone"]
+        if gone:
+            try:
+                await self.bot.db.delete_rss_channels(gone)
+            except Exception as e:
+                self.bot.dispatch("error", e)
+                return
+
+            self.delivery_stats["pruned"] += len(gone)
+            logger.info("Removed the feeds of %s channels that can't be posted in", len(gone))
+
+    def delivery_summary(self) -> str:
+        entries = self.delivery_stats["entries"]
+        average = self.delivery_stats["time"] / entries if entries else 0
+        return (
+            f"Entries: {entries:,} ({self.delivery_stats['sent']:,} messages, {len(self.deliveries):,} in progress)\n"
+            f"Fan-out: {average:.2f}s average, {self.delivery_stats['max_time']:.2f}s max\n"
+            f"Pruned channels: {self.delivery_stats['pruned']:,}"
+        )
 
     async def rss_task(self):
         await self.bot.wait_until_loaded()
@@ -154,8 +298,14 @@ class RSS(commands.Cog):
                 return
             except Exception as e:
                 self.bot.dispatch("error", e)
-            finally:
-                await asyncio.sleep(600)
+
+            delay = min(self.youtube_schedule.delay(), self.twitch_schedule.delay())
+            try:
+                await asyncio.wait_for(self.feed_wakeup.wait(), timeout=max(delay, 1))
+            except asyncio.TimeoutError:
+                pass
+
+            self.feed_wakeup.clear()
 
     #######################################################################
     ## Commands
@@ -249,6 +399,21 @@ class RSS(commands.Cog):
 
         await ctx.send(f"{POSITIVE_CHECK} | Deleted channel **{'**, **'.join([x[0] for x in deleted])}**")
 
+    @youtube.command(name="check")
+    @has_perms(3)
+    async def youtube_check(self, ctx: commands.Context[NecroBot]):
+        """Check every youtube channel this server is subscribed to for new videos right away, instead of \
+        waiting for their next scheduled check.
+
+        {usage}
+        """
+        feeds = await self.bot.db.get_yt_rss(ctx.guild.id)
+        if not feeds:
+            raise BotError("This server is not subscribed to any youtube channel")
+
+        self.youtube_schedule.check_now([feed["youtuber_id"] for feed in feeds])
+        await ctx.send(f"{POSITIVE_CHECK} | Checking **{len(feeds)}** channel(s) for new videos")
+
     @youtube.command(name="filters")
     @has_perms(3)
     async def youtube_filters(
@@ -289,7 +454,7 @@ class RSS(commands.Cog):
         }
 
         async with self.bot.session.get(
-            f"https://api.twitch.tv/helix/{route}", headers=headers, params=payload
+            self.base_twitch.format(route), headers=headers, params=payload
         ) as resp:
             return await resp.json()
 
@@ -306,11 +471,15 @@ class RSS(commands.Cog):
         n = 100
         chunks = [user_ids[i : i + n] for i in range(0, len(user_ids), n)]
 
+        async def get_chunk(chunk):
+            async with self.feed_semaphore:
+                payload = [("first", n)] + [("user_id", x) for x in chunk]
+                resp = await self.twitch_request("streams", payload)
+                return resp["data"]
+
         streams = []
-        for chunk in chunks:
-            payload = [("first", n)] + [("user_id", x) for x in chunk]
-            resp = await self.twitch_request("streams", payload)
-            streams.extend(resp["data"])
+        for data in await asyncio.gather(*[get_chunk(chunk) for chunk in chunks]):
+            streams.extend(data)
 
         return streams
 
@@ -382,6 +551,21 @@ class RSS(commands.Cog):
 
         await ctx.send(f"{POSITIVE_CHECK} | Deleted channel **{'**, **'.join([x[0] for x in deleted])}**")
 
+    @twitch.command(name="check")
+    @has_perms(3)
+    async def twitch_check(self, ctx: commands.Context[NecroBot]):
+        """Check every twitch channel this server is subscribed to for live streams right away, instead of \
+        waiting for their next scheduled check.
+
+        {usage}
+        """
+        feeds = await self.bot.db.get_tw_rss(ctx.guild.id)
+        if not feeds:
+            raise BotError("This server is not subscribed to any twitch channel")
+
+        self.twitch_schedule.check_now([feed["twitch_id"] for feed in feeds])
+        await ctx.send(f"{POSITIVE_CHECK} | Checking **{len(feeds)}** channel(s) for live streams")
+
     @twitch.command(name="filters")
     @has_perms(3)
     async def twitch_filters(self, ctx: commands.Context[NecroBot], twitch_name: str, *, filters: str = ""):
@@ -10,10 +10,12 @@ from rings.utils.converters import (
     MemberConverter,
     RangeConverter,
     RoleConverter,
+    ScamRuleFlags,
     TimeConverter,
     WritableChannelConverter,
     transform_mentions,
 )
+from rings.utils.scam import ScamRule
 from rings.utils.ui import (
     Confirm,
     EmbedDefaultConverter,
@@ -23,7 +25,7 @@ from rings.utils.ui import (
     Paginator,
     PollEditorView,
 )
-from rings.utils.utils import POSITIVE_CHECK, BotError, DatabaseError, build_format_dict, check_channel
+from rings.utils.utils import POSITIVE_CHECK, BotError, build_format_dict, check_channel
 
 if TYPE_CHECKING:
     from bot import NecroBot
@@ -106,22 +108,14 @@ class Server(commands.Cog):
         return l
 
     async def update_binding(self, role):
-        roles = await self.bot.db.query(
-            "SELECT * FROM necrobot.PermissionRoles WHERE guild_id=$1", role.guild.id
-        )
+        bindings = self.bot.guild_data[role.guild.id]["permission-roles"]
 
         counter = 0
         for member in role.members:
-            try:
-                level = max(
-                    [
-                        x["level"]
-                        for x in roles
-                        if x["role_id"] != role.id and x["role_id"] in [x.id for x in member.roles]
-                    ]
-                )
-            except ValueError:
-                level = 0
+            level = max(
+                (bindings[x.id] for x in member.roles if x.id != role.id and x.id in bindings),
+                default=0,
+            )
 
             updated = await self.bot.db.query(
                 "UPDATE necrobot.Permissions SET level=$1 WHERE user_id=$2 AND guild_id=$3 AND level <= 4 RETURNING user_id",
@@ -258,16 +252,13 @@ class Server(commands.Cog):
 
         # show information
         if level is None:
-            roles = await self.bot.db.query(
-                "SELECT * FROM necrobot.PermissionRoles WHERE guild_id=$1", ctx.guild.id
-            )
-
-            if not roles:
+            bindings = self.bot.guild_data[ctx.guild.id]["permission-roles"]
+            if not bindings:
                 raise BotError("No bindings on this server")
 
             string = ""
-            for r in roles:
-                string += f"- {ctx.guild.get_role(r[2]).mention}: {self.bot.perms_name[r[1]]} ({r[1]})\n"
+            for role_id, bound_level in sorted(bindings.items(), key=lambda x: x[1]):
+                string += f"- {ctx.guild.get_role(role_id).mention}: {self.bot.perms_name[bound_level]} ({bound_level})\n"
 
             embed = discord.Embed(
                 title="Roles tied to permissions",
@@ -280,12 +271,7 @@ class Server(commands.Cog):
 
         # remove binding
         if role is None:
-            role_id = await self.bot.db.query(
-                "DELETE FROM necrobot.PermissionRoles WHERE guild_id = $1 AND level = $2 RETURNING role_id",
-                ctx.guild.id,
-                level,
-                fetchval=True,
-            )
+            role_id = await self.bot.db.delete_permission_level(ctx.guild.id, level)
 
             if role_id:
                 role = ctx.guild.get_role(role_id)
@@ -301,7 +287,7 @@ class Server(commands.Cog):
                 if not view.value:
                     return
 
-                counter = await self.update_bindings(role)
+                counter = await self.update_binding(role)
                 return await view.message.edit(
                     content=f"{POSITIVE_CHECK} | Permissions of **{counter}** member(s) updated"
                 )
@@ -309,18 +295,16 @@ class Server(commands.Cog):
             raise BotError("No role set for that permission level")
 
         # add binding
-        try:
-            await self.bot.db.query(
-                "INSERT INTO necrobot.PermissionRoles VALUES($1, $2, $3)",
-                ctx.guild.id,
-                level,
-                role.id,
-                fetchval=True,
-            )
-        except DatabaseError as e:
+        bindings = self.bot.guild_data[ctx.guild.id]["permission-roles"]
+        if level in bindings.values():
             raise BotError(
                 "A binding already exists for that permission level, remove it before setting a new one"
-            ) from e
+            )
+
+        if role.id in bindings:
+            raise BotError(f"This role is already bound to permission level {bindings[role.id]}")
+
+        await self.bot.db.insert_permission_role(ctx.guild.id, level, role.id)
 
         if not role.members:
             return await ctx.send(f"{POSITIVE_CHECK} | Permission binding created!")
@@ -480,6 +464,65 @@ class Server(commands.Cog):
                 f"Automod channel is currently set to {channel.mention if channel else 'Disabled'}. Use `automod channel disable` to disable"
             )
 
+    @automod.group(name="scam", invoke_without_command=True)
+    @has_perms(4)
+    async def automod_scam(self, ctx: commands.Context[NecroBot]):
+        """List the rules used by the scam filter on this server. A message that triggers any of the rules is \
+        deleted and its author is muted while awaiting moderation review. Custom rules with the same name as a \
+        default rule replace it.
+
+        {usage}
+
+        __Example__
+        `{pre}automod scam` - list all the scam rules active on the server
+        """
+        rules = self.bot.scam_filter.get_rules(ctx.guild.id)
+
+        def embed_maker(view: Paginator, entries: List[ScamRule]):
+            embed = discord.Embed(
+                title=f"Scam Filter Rules ({view.page_string})",
+                colour=self.bot.bot_color,
+                description="\n".join(f"- **{rule.name}**: {rule.describe()}" for rule in entries),
+            )
+            embed.set_footer(**self.bot.bot_footer)
+            return embed
+
+        await Paginator(10, rules, ctx.author, embed_maker=embed_maker).start(ctx)
+
+    @automod_scam.command(name="add")
+    @has_perms(4)
+    async def automod_scam_add(self, ctx: commands.Context[NecroBot], name: str, *, flags: ScamRuleFlags):
+        """Create or replace a scam filter rule. Every condition given must be met for the rule to trigger. \
+        Keywords and domains are comma separated lists, a rule triggers if any of them are present.
+
+        {usage}
+
+        __Examples__
+        `{pre}automod scam add nitro keywords=nitro,gift link=yes everyone=yes` - trigger on messages that \
+        mention nitro or gift, contain a link and ping everyone
+        `{pre}automod scam add massping mentions=10` - trigger on messages that mention 10 or more users or roles
+        `{pre}automod scam add phishing domains=discrod.gift,steamcommunlty.com` - trigger on links to these domains
+        """
+        rule = flags.to_rule(name)
+        await self.bot.db.upsert_scam_rule(ctx.guild.id, rule)
+        await ctx.send(f"{POSITIVE_CHECK} | Rule **{rule.name}** will trigger on: {rule.describe()}")
+
+    @automod_scam.command(name="delete")
+    @has_perms(4)
+    async def automod_scam_delete(self, ctx: commands.Context[NecroBot], name: str):
+        """Delete a custom scam filter rule. Default rules cannot be deleted but can be replaced.
+
+        {usage}
+
+        __Example__
+        `{pre}automod scam delete massping` - delete the rule called massping
+        """
+        deleted = await self.bot.db.delete_scam_rule(ctx.guild.id, name.lower())
+        if not deleted:
+            raise BotError("No custom rule with that name")
+
+        await ctx.send(f"{POSITIVE_CHECK} | Rule **{deleted}** deleted")
+
     @commands.command()
     @has_perms(4)
     async def ignore(
@@ -601,6 +644,11 @@ class Server(commands.Cog):
             else "Disabled",
         )
         embed.add_field(name="Starboard Limit", value=server["starboard-limit"])
+        embed.add_field(name="Join Window", value=f"{server['join-window']}s")
+        embed.add_field(
+            name="Merged Welcomes",
+            value=f"From {server['join-collapse']} members" if server["join-collapse"] else "Disabled",
+        )
 
         embed.set_footer(**self.bot.bot_footer)
 
@@ -706,6 +754,31 @@ class Server(commands.Cog):
 
         await self.channel_set(ctx, channel)
 
+    @welcome.command(name="batch")
+    @has_perms(4)
+    async def welcome_batch(
+        self,
+        ctx: commands.Context[NecroBot],
+        window: RangeConverter(0, 30) = 2,
+        collapse: RangeConverter(0, 100) = 0,
+    ):
+        """Sets how joins are grouped during a join wave. Members joining within [window] seconds of each other \
+        are processed together and once [collapse] or more of them join in the same window their welcome messages \
+        are merged into a single message. A window of 0 processes every join on its own and a collapse of 0 never \
+        merges welcome messages.
+
+        {usage}
+
+        __Example__
+        `{pre}welcome batch 5 10` - group joins over 5 seconds and merge the welcomes of 10 or more members
+        `{pre}welcome batch 0` - process every join on its own
+        `{pre}welcome batch` - reset to the default of a 2 second window without merging"""
+        await self.bot.db.update_join_batching(ctx.guild.id, window, collapse)
+        merged = f"merged from **{collapse}** members" if collapse else "not merged"
+        await ctx.send(
+            f"{POSITIVE_CHECK} | Joins will be grouped over **{window}** second(s) and welcome messages {merged}."
+        )
+
     @farewell.command(name="channel")
     @has_perms(4)
     async def farewell_channel(
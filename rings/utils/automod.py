@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+from typing import Dict, List, Tuple
+
+import discord
+
+logger = logging.getLogger()
+
+# discord caps both the number of embeds in a message and their combined length
+MAX_EMBEDS = 10
+MAX_EMBED_CHARACTERS = 6000
+
+
+class AutomodDigest:
+    """Buffers automod log embeds per automod channel for a short window and posts them together, so
+    a raid or a purge doesn't turn into one API call per message. Entries are packed into as few
+    messages as possible and past `summary_threshold` entries the whole window is posted as a single
+    summary with a plain text log attached."""
+
+    def __init__(self, *, window: float = 3.0, summary_threshold: int = 30):
+        self.window = window
+        self.summary_threshold = summary_threshold
+
+        self.buffers: Dict[int, List[Tuple[discord.Embed, str]]] = {}
+        self.channels: Dict[int, discord.abc.Messageable] = {}
+        self.tasks: Dict[int, asyncio.Task] = {}
+
+        self.stats = {"events": 0, "messages": 0, "summaries": 0}
+
+    def add(self, channel: discord.abc.Messageable, embed: discord.Embed, line: str):
+        """Queue an embed for the channel along with the line that represents it in a summary."""
+        self.stats["events"] += 1
+        self.buffers.setdefault(channel.id, []).append((embed, line))
+        self.channels[channel.id] = channel
+
+        if channel.id not in self.tasks:
+            self.tasks[channel.id] = asyncio.create_task(self._flush_later(channel.id))
+
+    async def _flush_later(self, channel_id: int):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            del self.tasks[channel_id]
+
+        await self.flush(channel_id)
+
+    @staticmethod
+    def pack(embeds: List[discord.Embed]) -> List[List[discord.Embed]]:
+        batches = [[]]
+        size = 0
+        for embed in embeds:
+            length = len(embed)
+            if len(batches[-1]) == MAX_EMBEDS or (batches[-1] and size + length > MAX_EMBED_CHARACTERS):
+                batches.append([])
+                size = 0
+
+            batches[-1].append(embed)
+            size += length
+
+        return batches
+
+    def summarise(self, entries: List[Tuple[discord.Embed, str]]) -> Tuple[discord.Embed, discord.File]:
+        counts: Dict[str, int] = {}
+        for embed, _ in entries:
+            counts[embed.title] = counts.get(embed.title, 0) + 1
+
+        embed = discord.Embed(
+            title="Automod Digest",
+            description=f"{len(entries)} events in the last {self.window:.0f} seconds, full log attached.",
+            colour=entries[0][0].colour,
+        )
+        for title, count in counts.items():
+            embed.add_field(name=title, value=str(count))
+
+        log = "\n".join(line for _, line in entries)
+        return embed, discord.File(io.BytesIO(log.encode("utf-8")), filename="automod.txt")
+
+    async def flush(self, channel_id: int):
+        entries = self.buffers.pop(channel_id, [])
+        channel = self.channels.pop(channel_id, None)
+        if not entries or channel is None:
+            return
+
+        try:
+            if len(entries) > self.summary_threshold:
+                embed, file = self.summarise(entries)
+                embed.set_footer(text=entries[0][0].footer.text, icon_url=entries[0][0].footer.icon_url)
+                await channel.send(embed=embed, file=file)
+                self.stats["messages"] += 1
+                self.stats["summaries"] += 1
+                return
+
+            for batch in self.pack([embed for embed, _ in entries]):
+                await channel.send(embeds=batch)
+                self.stats["messages"] += 1
+        except discord.Forbidden:
+            pass
+        except discord.HTTPException as e:
+            logger.warning("Could not post automod digest in %s: %s", channel_id, e)
+
+    async def flush_all(self):
+        for task in self.tasks.values():
+            task.cancel()
+
+        await asyncio.gather(*[self.flush(channel_id) for channel_id in list(self.buffers)])
+
+    def summary(self) -> str:
+        events = self.stats["events"]
+        saved = events - self.stats["messages"] - sum(len(x) for x in self.buffers.values())
+        return (
+            f"Events: {events:,} in {self.stats['messages']:,} messages "
+            f"({self.stats['summaries']:,} summaries)\n"
+            f"API calls saved: {max(saved, 0):,}"
+        )
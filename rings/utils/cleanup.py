@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Dict, Set, Tuple
+
+if TYPE_CHECKING:
+    from bot import NecroBot
+
+
+class ReferenceCleaner:
+    """Removes every reference to deleted channels and roles from the database. Deletions in the same
+    guild that arrive within `window` seconds of each other, such as a whole category being deleted,
+    are cleaned up together in a single transaction."""
+
+    def __init__(self, bot: NecroBot, *, window: float = 1.0):
+        self.bot = bot
+        self.window = window
+
+        self.pending: Dict[int, Tuple[Set[int], Set[int]]] = {}
+        self.tasks: Dict[int, asyncio.Task] = {}
+
+        self.deleted = 0
+        self.transactions = 0
+
+    def _add(self, guild_id: int) -> Tuple[Set[int], Set[int]]:
+        self.deleted += 1
+        if guild_id not in self.tasks:
+            self.tasks[guild_id] = asyncio.create_task(self._flush_later(guild_id))
+
+        return self.pending.setdefault(guild_id, (set(), set()))
+
+    def channel_deleted(self, guild_id: int, channel_id: int):
+        self._add(guild_id)[0].add(channel_id)
+
+    def role_deleted(self, guild_id: int, role_id: int):
+        self._add(guild_id)[1].add(role_id)
+
+    async def _flush_later(self, guild_id: int):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            del self.tasks[guild_id]
+
+        try:
+            await self.flush(guild_id)
+        except Exception as e:
+            self.bot.dispatch("error", e)
+
+    async def flush(self, guild_id: int):
+        channels, roles = self.pending.pop(guild_id, (set(), set()))
+        if not channels and not roles:
+            return
+
+        # the guild might have been left in the meantime, its rows are already gone then
+        if await self.bot.guild_data.fetch(guild_id) is None:
+            return
+
+        self.transactions += 1
+        await self.bot.db.delete_references(guild_id, list(channels), list(roles))
+
+    async def flush_all(self):
+        for task in self.tasks.values():
+            task.cancel()
+
+        await asyncio.gather(*[self.flush(guild_id) for guild_id in list(self.pending)])
+
+    def summary(self) -> str:
+        return f"Deleted channels/roles: {self.deleted:,} cleaned in {self.transactions:,} transactions"
@@ -8,6 +8,7 @@ from discord.ext import commands
 from rapidfuzz import process
 from unidecode import unidecode
 
+from rings.utils.scam import ScamRule
 from rings.utils.utils import time_converter
 
 if TYPE_CHECKING:
@@ -234,6 +235,29 @@ class WritableChannelConverter(commands.TextChannelConverter):
         return result
 
 
+class ScamRuleFlags(commands.FlagConverter, delimiter="=", case_insensitive=True):
+    keywords: str = ""
+    domains: str = ""
+    link: bool = False
+    everyone: bool = False
+    mentions: commands.Range[int, 0, 100] = 0
+
+    def to_rule(self, name: str) -> ScamRule:
+        rule = ScamRule(
+            name.lower(),
+            keywords=tuple(x.strip().lower() for x in self.keywords.split(",") if x.strip()),
+            domains=tuple(x.strip().lower() for x in self.domains.split(",") if x.strip()),
+            require_link=self.link,
+            require_everyone=self.everyone,
+            min_mentions=self.mentions,
+        )
+
+        if not rule.has_conditions:
+            raise commands.BadArgument("A rule needs at least one condition")
+
+        return rule
+
+
 CharacterType = Literal["character", "weapon", "artefact", "enemy"]
 
 
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+import time
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+import discord
+
+logger = logging.getLogger()
+
+
+class Job:
+    __slots__ = ("destination", "kwargs", "enqueued", "max_age", "attempts", "outcome")
+
+    def __init__(
+        self, destination: discord.abc.Messageable, kwargs: Dict[str, Any], max_age: Optional[float]
+    ):
+        self.destination = destination
+        self.kwargs = kwargs
+        self.enqueued = time.monotonic()
+        self.max_age = max_age
+        self.attempts = 0
+        # resolved with how the job ended: sent, failed, gone, stale, overflow or cancelled
+        self.outcome: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.enqueued
+
+    @property
+    def stale(self) -> bool:
+        return self.max_age is not None and self.age > self.max_age
+
+    def finish(self, outcome: str):
+        if not self.outcome.done():
+            self.outcome.set_result(outcome)
+
+
+class Dispatcher:
+    """Sends messages for background tasks so that they don't wait on Discord themselves. Every destination
+    gets its own queue drained in order by its own worker, with at most `concurrency` sends in flight
+    across all of them, so a rate limited channel only holds up its own messages.
+
+    Server errors are retried with exponential backoff, jobs older than their `max_age` are dropped
+    unsent and once a destination has `max_queue` jobs waiting the oldest is dropped for the newest."""
+
+    def __init__(
+        self,
+        *,
+        concurrency: int = 8,
+        retries: int = 3,
+        max_age: Optional[float] = 900,
+        max_queue: int = 100,
+    ):
+        self.retries = retries
+        self.max_age = max_age
+        self.max_queue = max_queue
+
+        self.concurrency = concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.queues: Dict[int, Deque[Job]] = {}
+        self.workers: Dict[int, asyncio.Task] = {}
+
+        self.stats: Dict[str, float] = {
+            "sent": 0,
+            "failed": 0,
+            "retried": 0,
+            "stale": 0,
+            "overflow": 0,
+            "latency": 0.0,
+            "max_latency": 0.0,
+        }
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # made on first use, the dispatcher is created before the bot's loop runs and on python 3.8 a
+        # Semaphore binds to the loop that is current when it is created
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        return self._semaphore
+
+    def send(
+        self, destination: Optional[discord.abc.Messageable], *, max_age: Optional[float] = ..., **kwargs
+    ) -> Optional[asyncio.Future]:
+        """Queue a message for the destination, takes the same keyword arguments as `Messageable.send`.
+        `max_age` overrides for how many seconds the message is still worth sending, None to always send it.
+        Returns a future resolved with how the message ended up, callers are free to ignore it."""
+        if destination is None:
+            return None
+
+        queue = self.queues.setdefault(destination.id, collections.deque())
+        if len(queue) >= self.max_queue:
+            queue.popleft().finish("overflow")
+            self.stats["overflow"] += 1
+
+        job = Job(destination, kwargs, self.max_age if max_age is ... else max_age)
+        queue.append(job)
+        if destination.id not in self.workers:
+            self.workers[destination.id] = asyncio.create_task(self._worker(destination.id))
+
+        return job.outcome
+
+    async def fan_out(
+        self,
+        destinations: Iterable[Optional[discord.abc.Messageable]],
+        *,
+        max_age: Optional[float] = ...,
+        **kwargs,
+    ) -> Dict[str, List[int]]:
+        """Send the same message to every destination and wait until each of them got it or was given up
+        on. Returns the ids of the destinations by outcome, "gone" for the ones that don't exist anymore or
+        can't be sent to."""
+        pending = {}
+        for destination in destinations:
+            outcome = self.send(destination, max_age=max_age, **kwargs)
+            if outcome is not None:
+                pending[destination.id] = outcome
+
+        outcomes: Dict[str, List[int]] = collections.defaultdict(list)
+        for destination_id, outcome in pending.items():
+            outcomes[await outcome].append(destination_id)
+
+        return outcomes
+
+    async def _worker(self, key: int):
+        queue = self.queues[key]
+        job = None
+        try:
+            while queue:
+                job = queue.popleft()
+                if job.stale:
+                    self.stats["stale"] += 1
+                    job.finish("stale")
+                    continue
+
+                await self._deliver(job)
+        finally:
+            # only left over when the worker was cancelled or crashed
+            if job is not None:
+                job.finish("cancelled")
+            while queue:
+                queue.popleft().finish("cancelled")
+
+            del self.workers[key]
+            if not queue:
+                self.queues.pop(key, None)
+
+    async def _deliver(self, job: Job):
+        while True:
+            job.attempts += 1
+            try:
+                async with self.semaphore:
+                    await job.destination.send(**job.kwargs)
+            except discord.DiscordServerError as e:
+                if job.attempts > self.retries or job.stale:
+                    self.stats["failed"] += 1
+                    logger.warning("Giving up on message to %s: %s", job.destination.id, e)
+                    job.finish("failed")
+                    return
+
+                self.stats["retried"] += 1
+                await asyncio.sleep(2**job.attempts)
+            except (discord.Forbidden, discord.NotFound):
+                self.stats["failed"] += 1
+                job.finish("gone")
+                return
+            except discord.HTTPException as e:
+                self.stats["failed"] += 1
+                logger.warning("Could not send message to %s: %s", job.destination.id, e)
+                job.finish("failed")
+                return
+            else:
+                latency = job.age
+                self.stats["sent"] += 1
+                self.stats["latency"] += latency
+                self.stats["max_latency"] = max(self.stats["max_latency"], latency)
+                job.finish("sent")
+                return
+
+    async def close(self, timeout: float = 10):
+        """Give the queued messages a chance to go out, then cancel whatever is left."""
+        if self.workers:
+            await asyncio.wait(list(self.workers.values()), timeout=timeout)
+
+        for worker in list(self.workers.values()):
+            worker.cancel()
+
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def summary(self) -> str:
+        sent = self.stats["sent"]
+        average = self.stats["latency"] / sent if sent else 0
+        deepest = max(self.queues.items(), key=lambda x: len(x[1]), default=(None, ()))
+        return (
+            f"Sent: {sent:,} (failed {self.stats['failed']:,}, retried {self.stats['retried']:,})\n"
+            f"Dropped: {self.stats['stale']:,} stale, {self.stats['overflow']:,} overflow\n"
+            f"Latency: {average * 1000:.0f}ms average, {self.stats['max_latency'] * 1000:.0f}ms max\n"
+            f"Queued: {self.depth():,} in {len(self.queues):,} queues (deepest {len(deepest[1])})"
+        )
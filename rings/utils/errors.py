@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import hashlib
+import logging
+import time
+import traceback
+from typing import TYPE_CHECKING, List, Optional
+
+import discord
+
+if TYPE_CHECKING:
+    from bot import NecroBot
+
+logger = logging.getLogger()
+
+
+def fingerprint(error: BaseException, frames: int = 3) -> str:
+    """Identify an error by its type and the innermost frames of its traceback, so that the same bug
+    raised with different arguments is still recognised as the same error."""
+    stack = traceback.extract_tb(error.__traceback__)[-frames:]
+    key = "|".join(
+        [type(error).__qualname__, *[f"{frame.filename}:{frame.name}:{frame.lineno}" for frame in stack]]
+    )
+    return hashlib.sha1(key.encode()).hexdigest()[:8]
+
+
+class ErrorRecord:
+    __slots__ = (
+        "fingerprint",
+        "name",
+        "message",
+        "traceback",
+        "first_seen",
+        "last_seen",
+        "count",
+        "reported",
+    )
+
+    def __init__(self, error: BaseException, key: str):
+        self.fingerprint = key
+        self.name = type(error).__name__
+        self.message = str(error)[:200]
+        self.traceback = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+        self.first_seen = self.last_seen = time.time()
+        self.count = 0
+        self.reported = 0
+
+
+class ErrorAggregator:
+    """Deduplicates the error reports sent to the error channel. The first occurrence of an error is
+    posted right away with its full report, repeats are only counted and folded into a single update
+    every `interval` seconds. The last `size` distinct errors are kept in memory for owners to look at."""
+
+    def __init__(self, bot: NecroBot, *, interval: int = 600, size: int = 100):
+        self.bot = bot
+        self.interval = interval
+        self.size = size
+
+        self.records: collections.OrderedDict[str, ErrorRecord] = collections.OrderedDict()
+        self.task: Optional[asyncio.Task] = None
+
+        self.posted = 0
+        self.suppressed = 0
+
+    def report(self, error: BaseException, embed: discord.Embed):
+        key = fingerprint(error)
+        record = self.records.get(key)
+        if record is None:
+            record = self.records[key] = ErrorRecord(error, key)
+            if len(self.records) > self.size:
+                self.records.popitem(last=False)
+
+        self.records.move_to_end(key)
+        record.count += 1
+        record.last_seen = time.time()
+
+        if record.count == 1:
+            logger.error(record.traceback)
+            record.reported = 1
+            self.posted += 1
+            embed.add_field(name="Fingerprint", value=f"`{key}`", inline=False)
+            self.bot.dispatcher.send(self.bot.error_channel, embed=embed, max_age=None)
+        else:
+            self.suppressed += 1
+            if self.task is None:
+                self.task = asyncio.create_task(self._summarise_later())
+
+    async def _summarise_later(self):
+        try:
+            await asyncio.sleep(self.interval)
+        finally:
+            self.task = None
+
+        self.summarise()
+
+    def summarise(self):
+        repeated = [record for record in self.records.values() if record.count > record.reported]
+        if not repeated:
+            return
+
+        embed = discord.Embed(title="Repeated Errors", colour=self.bot.bot_color)
+        for record in repeated[-25:]:
+            embed.add_field(
+                name=f"{record.name} `{record.fingerprint}`",
+                value=f"Seen {record.count - record.reported} more times in the last {self.interval // 60} minutes"
+                f" ({record.count} total)\n{record.message[:900]}",
+                inline=False,
+            )
+            record.reported = record.count
+
+        embed.set_footer(**self.bot.bot_footer)
+        self.posted += 1
+        self.bot.dispatcher.send(self.bot.error_channel, embed=embed, max_age=None)
+
+    def recent(self, amount: int = 10) -> List[ErrorRecord]:
+        return list(reversed(self.records.values()))[:amount]
+
+    def summary(self) -> str:
+        return (
+            f"Distinct errors: {len(self.records):,}\n"
+            f"Reports posted: {self.posted:,} (suppressed repeats {self.suppressed:,})"
+        )
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import html
+import math
+import re
+import time
+import urllib.parse
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, Tag
+from rapidfuzz import fuzz, process, utils
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+# an answer sharing a single word with the question is as likely chance as a match
+MIN_BODY_MATCHES = 2
+# how close a word of the question has to be to a word of a title to count as the same, allowing for typos
+TITLE_WORD_CUTOFF = 80
+
+
+def _tokens(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+def _heading_level(tag: Tag) -> Optional[int]:
+    """The level of a heading, whether it's a bare <hN> or wrapped in the <div class="mw-heading"> newer
+    MediaWiki versions use. None for anything else."""
+    if re.fullmatch(r"h[1-6]", tag.name):
+        return int(tag.name[1])
+
+    if tag.name == "div" and "mw-heading" in tag.get("class", []):
+        heading = tag.find(re.compile(r"^h[1-6]$"))
+        if heading is not None:
+            return int(heading.name[1])
+
+    return None
+
+
+class FAQSection:
+    __slots__ = ("title", "anchor", "body", "title_tokens", "tokens")
+
+    def __init__(self, title: str, anchor: str, body: str):
+        self.title = title
+        self.anchor = anchor
+        self.body = body
+        self.title_tokens = _tokens(title)
+        self.tokens = set(_tokens(f"{title} {body}"))
+
+
+class FAQIndex:
+    """The questions of a mod's FAQ page with their anchors and plain text answers, so that questions can
+    be matched without going to the wiki. Questions are matched on their title with rapidfuzz and on the
+    words of their answer, weighted by how rare each word is across the FAQ."""
+
+    def __init__(self, url: str, sections: List[FAQSection]):
+        self.url = url
+        self.sections = sections
+        self.built = time.monotonic()
+
+        counts: Dict[str, int] = {}
+        for section in sections:
+            for token in section.tokens:
+                counts[token] = counts.get(token, 0) + 1
+
+        # words found in most answers, like "why" or "the", say nothing about which question is meant
+        self.common = {token for token, count in counts.items() if count > len(sections) / 2}
+        self.idf = {
+            token: math.log((len(sections) + 1) / (count + 0.5))
+            for token, count in counts.items()
+            if token not in self.common
+        }
+        # a word the FAQ never uses is as rare as a word can get, and no answer covers it
+        self.max_idf = math.log((len(sections) + 1) / 0.5)
+
+    @classmethod
+    def from_parse(cls, url: str, parsed: dict, toclevel: int = 2) -> FAQIndex:
+        """Build the index from a `parse` API response with the `text` and `sections` props. Each
+        section at `toclevel` is a question, its answer is everything up to the next heading of the same
+        level or above."""
+        soup = BeautifulSoup(parsed["parse"]["text"]["*"], "html.parser")
+        sections = []
+        for section in parsed["parse"]["sections"]:
+            if section["toclevel"] != toclevel:
+                continue
+
+            title = html.unescape(re.sub(r"<.+?>", "", section["line"]))
+            sections.append(FAQSection(title, section["anchor"], cls._section_body(soup, section["anchor"])))
+
+        return cls(url, sections)
+
+    @staticmethod
+    def _section_body(soup: BeautifulSoup, anchor: str) -> str:
+        heading = soup.find(id=anchor)
+        while heading is not None and _heading_level(heading) is None:
+            heading = heading.parent
+
+        if heading is None:
+            return ""
+
+        if heading.parent is not None and _heading_level(heading.parent) is not None:
+            heading = heading.parent
+
+        level = _heading_level(heading)
+        body = []
+        for sibling in heading.find_next_siblings():
+            sibling_level = _heading_level(sibling)
+            if sibling_level is not None and sibling_level <= level:
+                break
+
+            body.append(sibling.get_text(" ", strip=True))
+
+        return " ".join(x for x in body if x)
+
+    def link(self, section: FAQSection) -> str:
+        return f"{self.url}#{urllib.parse.quote(section.anchor, safe='')}"
+
+    def _weights(self, tokens: List[str]) -> List[float]:
+        return [0 if token in self.common else self.idf.get(token, self.max_idf) for token in tokens]
+
+    @staticmethod
+    def _title_coverage(tokens: List[str], weights: List[float], section: FAQSection) -> float:
+        """The share of the weight of the question found among the words of the title."""
+        total = sum(weights)
+        if not total:
+            return 1
+
+        matched = sum(
+            weight
+            for token, weight in zip(tokens, weights)
+            if weight
+            and process.extractOne(
+                token, section.title_tokens, scorer=fuzz.ratio, score_cutoff=TITLE_WORD_CUTOFF
+            )
+        )
+        return matched / total
+
+    @staticmethod
+    def _body_score(tokens: List[str], weights: List[float], section: FAQSection) -> float:
+        total = sum(weights)
+        matched = [weight for token, weight in zip(tokens, weights) if weight and token in section.tokens]
+        if not total or len(matched) < min(MIN_BODY_MATCHES, sum(1 for weight in weights if weight)):
+            return 0
+
+        return sum(matched) / total * 100
+
+    def search(self, question: str, *, limit: int = 5, cutoff: float = 55) -> List[Tuple[FAQSection, float]]:
+        """The sections that best match the question, best first."""
+        titles = process.extract(
+            question,
+            [section.title for section in self.sections],
+            scorer=fuzz.WRatio,
+            processor=utils.default_process,
+            limit=None,
+        )
+        tokens = list(set(_tokens(question)))
+        weights = self._weights(tokens)
+
+        scores = []
+        for _, title_score, index in titles:
+            section = self.sections[index]
+            # a title that only shares the phrasing of the question, like "how do I", isn't the question
+            title_score *= min(1, self._title_coverage(tokens, weights, section) * 2)
+            # the answer mentioning the words only counts for a bit less than the question itself
+            score = max(title_score, self._body_score(tokens, weights, section) * 0.9)
+            if score >= cutoff:
+                scores.append((section, score))
+
+        scores.sort(key=lambda x: x[1], reverse=True)
+        return scores[:limit]
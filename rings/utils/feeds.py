@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import heapq
+import io
+import statistics
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+MEDIA = "{http://search.yahoo.com/mrss/}"
+
+
+class FeedEntry:
+    """The parts of a youtube feed entry that make it into a notification."""
+
+    __slots__ = ("title", "link", "published", "description", "author", "author_url", "thumbnail")
+
+    def __init__(
+        self,
+        title: str,
+        link: str,
+        published: datetime.datetime,
+        description: str,
+        author: str,
+        author_url: str,
+        thumbnail: Optional[str],
+    ):
+        self.title = title
+        self.link = link
+        self.published = published
+        self.description = description
+        self.author = author
+        self.author_url = author_url
+        self.thumbnail = thumbnail
+
+
+def _entry(element: ET.Element) -> FeedEntry:
+    link = element.find(f"{ATOM}link")
+    group = element.find(f"{MEDIA}group")
+    thumbnail = group.find(f"{MEDIA}thumbnail") if group is not None else None
+    description = group.findtext(f"{MEDIA}description", "") if group is not None else ""
+
+    return FeedEntry(
+        element.findtext(f"{ATOM}title", ""),
+        link.get("href", "") if link is not None else "",
+        datetime.datetime.fromisoformat(element.findtext(f"{ATOM}published")),
+        description.split("\n", 1)[0],
+        element.findtext(f"{ATOM}author/{ATOM}name", ""),
+        element.findtext(f"{ATOM}author/{ATOM}uri", ""),
+        thumbnail.get("url") if thumbnail is not None else None,
+    )
+
+
+def parse_youtube_feed(raw: bytes, since: Optional[datetime.datetime] = None) -> List[FeedEntry]:
+    """Parse the entries of a youtube feed, newest first, up to the first one that isn't newer than
+    `since`. The feed lists its newest entries first so the rest of the document is never parsed,
+    that first older entry is still included so callers can tell how recent the feed is."""
+    entries = []
+    for _, element in ET.iterparse(io.BytesIO(raw), events=("end",)):
+        if element.tag != f"{ATOM}entry":
+            continue
+
+        entry = _entry(element)
+        element.clear()
+        entries.append(entry)
+        if since is not None and entry.published <= since:
+            break
+
+    return entries
+
+
+def group_by_filter(subscriptions: Iterable[Tuple[int, Optional[str]]]) -> Dict[str, List[int]]:
+    """The channels subscribed to a feed keyed by their title filter, so that each filter is only tested
+    once per entry however many channels share it."""
+    groups: Dict[str, List[int]] = {}
+    for channel_id, title_filter in subscriptions:
+        groups.setdefault(title_filter or "", []).append(channel_id)
+
+    return groups
+
+
+def matching_channels(groups: Dict[str, List[int]], title: str) -> List[int]:
+    title = title.lower()
+    return [channel_id for text, channels in groups.items() if text in title for channel_id in channels]
+
+
+class FeedState:
+    __slots__ = ("key", "interval", "base", "due", "published", "failures", "checks")
+
+    def __init__(self, key: str, interval: float, due: float):
+        self.key = key
+        self.interval = interval
+        self.base = interval
+        self.due = due
+        self.published: List[float] = []
+        self.failures = 0
+        self.checks = 0
+
+
+class FeedScheduler:
+    """Decides when each feed is checked next. Feeds sit in a heap ordered by when they are due, each
+    with its own interval. The interval follows how often the feed publishes, a fraction of the usual
+    time between two publications within [min_interval, max_interval], and grows by `backoff` every
+    time a check finds nothing new or fails until something new shows up again."""
+
+    def __init__(
+        self,
+        *,
+        min_interval: float = 300,
+        max_interval: float = 21600,
+        default_interval: float = 600,
+        backoff: float = 1.5,
+        cadence_fraction: float = 24,
+        history: int = 15,
+        wakeup: Optional[asyncio.Event] = None,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_interval = default_interval
+        self.backoff = backoff
+        self.cadence_fraction = cadence_fraction
+        self.history = history
+
+        self.feeds: Dict[str, FeedState] = {}
+        self._heap: List[Tuple[float, str]] = []
+        # can be shared between schedulers polled by the same task
+        self.wakeup = asyncio.Event() if wakeup is None else wakeup
+
+    def _clamp(self, interval: float) -> float:
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def _schedule(self, state: FeedState, due: float):
+        state.due = due
+        heapq.heappush(self._heap, (due, state.key))
+
+    def sync(self, keys: Iterable[str], now: Optional[float] = None):
+        """Start scheduling new feeds, due right away, and forget the ones that are gone."""
+        now = time.time() if now is None else now
+        keys = set(keys)
+        for key in keys.difference(self.feeds):
+            state = self.feeds[key] = FeedState(key, self.default_interval, now)
+            self._schedule(state, now)
+
+        for key in set(self.feeds).difference(keys):
+            # the heap entry is left behind and skipped once it comes up
+            del self.feeds[key]
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, key = heapq.heappop(self._heap)
+            state = self.feeds.get(key)
+            if state is None or state.due != when:
+                continue
+
+            due.append(key)
+
+        return due
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """Seconds until the next feed is due."""
+        now = time.time() if now is None else now
+        while self._heap:
+            when, key = self._heap[0]
+            if key in self.feeds and self.feeds[key].due == when:
+                break
+
+            heapq.heappop(self._heap)
+
+        if not self._heap:
+            return self.max_interval
+
+        return max(0, self._heap[0][0] - now)
+
+    def cadence(self, key: str) -> Optional[float]:
+        published = self.feeds[key].published
+        if len(published) < 2:
+            return None
+
+        return statistics.median(b - a for a, b in zip(published, published[1:]))
+
+    def checked(self, key: str, new: bool, published: Iterable[float] = (), now: Optional[float] = None):
+        """Schedule the next check of a feed that was just checked. When something new was found the feed
+        is checked again at the pace it publishes at, otherwise a little later than last time."""
+        state = self.feeds.get(key)
+        if state is None:
+            return
+
+        now = time.time() if now is None else now
+        state.published = sorted(set(state.published).union(published))[-self.history :]
+        cadence = self.cadence(key)
+        if cadence is not None:
+            state.base = self._clamp(cadence / self.cadence_fraction)
+
+        if new:
+            state.interval = state.base
+        else:
+            state.interval = self._clamp(max(state.base, state.interval * self.backoff))
+
+        state.failures = 0
+        state.checks += 1
+        self._schedule(state, now + state.interval)
+
+    def failed(self, key: str, now: Optional[float] = None):
+        state = self.feeds.get(key)
+        if state is None:
+            return
+
+        now = time.time() if now is None else now
+        state.failures += 1
+        state.checks += 1
+        state.interval = self._clamp(state.interval * self.backoff)
+        self._schedule(state, now + state.interval)
+
+    def check_now(self, keys: Optional[Iterable[str]] = None, now: Optional[float] = None):
+        """Make the given feeds, every feed by default, due right away and wake up the poller. Feeds that
+        aren't scheduled yet are picked up on the next sync, where they are due right away anyway."""
+        now = time.time() if now is None else now
+        for key in self.feeds if keys is None else keys:
+            state = self.feeds.get(key)
+            if state is not None:
+                self._schedule(state, now)
+
+        self.wakeup.set()
+
+    def summary(self) -> str:
+        if not self.feeds:
+            return "No feeds"
+
+        intervals = [state.interval for state in self.feeds.values()]
+        return (
+            f"Feeds: {len(self.feeds):,} ({sum(state.checks for state in self.feeds.values()):,} checks)\n"
+            f"Interval: {min(intervals) / 60:.0f}-{max(intervals) / 60:.0f} min "
+            f"(median {statistics.median(intervals) / 60:.0f} min)\n"
+            f"Failing: {sum(1 for state in self.feeds.values() if state.failures):,}"
+        )
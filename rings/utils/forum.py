@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import html.parser
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from yarl import URL
+
+# only present on pages served to a logged in member, and the login form only to guests
+LOGGED_IN_MARKER = "action=logout"
+LOGIN_FORM_MARKER = 'name="frmLogin"'
+# the post form is shown again with an error box when a post is refused, e.g. because of flood control,
+# because the form was already submitted or because someone replied since the form was loaded
+POST_ERROR_MARKER = 'id="errors"'
+
+
+class ForumError(Exception):
+    pass
+
+
+class ForumForm:
+    """The fields of a form, in the order they appear in the page."""
+
+    __slots__ = ("action", "method", "fields", "submits")
+
+    def __init__(self, action: str, method: str):
+        self.action = action
+        self.method = method
+        self.fields: List[Tuple[str, str]] = []
+        self.submits: Dict[str, str] = {}
+
+    def payload(self, submit: Optional[str] = None, **values: str) -> List[Tuple[str, str]]:
+        """What submitting the form sends, with `values` replacing the fields of the same name and only
+        the `submit` button included."""
+        names = {name for name, _ in self.fields}
+        payload = [(name, values.get(name, value)) for name, value in self.fields]
+        payload.extend((name, value) for name, value in values.items() if name not in names)
+        if submit is not None:
+            payload.append((submit, self.submits.get(submit, "")))
+
+        return payload
+
+
+class _FormParser(html.parser.HTMLParser):
+    def __init__(self, base_url: str):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.form: Optional[ForumForm] = None
+        self.textarea: Optional[str] = None
+        self.select: Optional[str] = None
+        self.options: List[Tuple[str, bool]] = []
+        self.text: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        name = attrs.get("name")
+        if tag == "form" and self.form is None:
+            action = str(URL(self.base_url).join(URL(attrs.get("action") or "")))
+            self.form = ForumForm(action, (attrs.get("method") or "get").upper())
+        elif self.form is None:
+            return
+        elif tag == "input" and name and "disabled" not in attrs:
+            kind = attrs.get("type", "text").lower()
+            if kind in ("submit", "image"):
+                self.form.submits[name] = attrs.get("value", "")
+            elif kind in ("checkbox", "radio"):
+                if "checked" in attrs:
+                    self.form.fields.append((name, attrs.get("value", "on")))
+            elif kind not in ("file", "button", "reset"):
+                self.form.fields.append((name, attrs.get("value", "")))
+        elif tag == "textarea" and name:
+            self.textarea, self.text = name, []
+        elif tag == "select" and name:
+            self.select, self.options = name, []
+        elif tag == "option" and self.select is not None:
+            self.options.append((attrs.get("value", ""), "selected" in attrs))
+
+    def handle_data(self, data):
+        if self.textarea is not None:
+            self.text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "textarea" and self.textarea is not None:
+            self.form.fields.append((self.textarea, "".join(self.text)))
+            self.textarea = None
+        elif tag == "select" and self.select is not None:
+            selected = [value for value, chosen in self.options if chosen] or [
+                value for value, _ in self.options[:1]
+            ]
+            self.form.fields.extend((self.select, value) for value in selected)
+            self.select = None
+
+
+def parse_form(page: str, name: str, base_url: str = "") -> Optional[ForumForm]:
+    """Find the form called `name` in the page and read its fields. Only the markup of that form is
+    parsed, the rest of the page is skipped. None if the page has no such form."""
+    position = page.find(f'name="{name}"')
+    if position == -1:
+        return None
+
+    start = page.rfind("<form", 0, position)
+    end = page.find("</form>", position)
+    if start == -1 or end == -1:
+        return None
+
+    parser = _FormParser(base_url)
+    parser.feed(page[start:end])
+    parser.close()
+    return parser.form
+
+
+class ForumClient:
+    """Posts replies on an SMF forum as a member. The client keeps its own session so the forum's
+    cookies stay out of the bot's, and only logs in again when a page comes back without the markers of
+    a logged in member.
+
+    The reply form of each topic is kept for `form_ttl` seconds. The page a reply redirects to carries a
+    fresh form for the same topic, so consecutive replies to a topic cost one request each instead of
+    two. A refused reply drops the cached form and is tried once more with a freshly loaded one."""
+
+    def __init__(self, base_url: str, username: str, password: str, *, form_ttl: float = 300):
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.form_ttl = form_ttl
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.forms: Dict[str, Tuple[float, ForumForm]] = {}
+
+        self.requests = 0
+        self.logins = 0
+        self.form_hits = 0
+        self.form_misses = 0
+        self.posts = 0
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def request(self, method: str, url: str, **kwargs) -> Tuple[str, str]:
+        """The final url and text of the page."""
+        if self.session is None:
+            self.session = aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar())
+
+        self.requests += 1
+        async with self.session.request(method, url, **kwargs) as resp:
+            resp.raise_for_status()
+            return str(resp.url), await resp.text()
+
+    @staticmethod
+    def logged_in(page: str) -> bool:
+        return LOGGED_IN_MARKER in page and LOGIN_FORM_MARKER not in page
+
+    async def login(self):
+        self.logins += 1
+        self.forms.clear()
+
+        url, page = await self.request("GET", f"{self.base_url}?action=login")
+        form = parse_form(page, "frmLogin", url)
+        if form is None:
+            raise ForumError("Could not find the login form")
+
+        payload = form.payload(user=self.username, passwrd=self.password, cookielength="-1")
+        _, page = await self.request(form.method, form.action, data=payload)
+        if not self.logged_in(page):
+            raise ForumError("Could not log in, check the forum credentials")
+
+    def cache_form(self, topic_url: str, page: str, page_url: str):
+        form = parse_form(page, "postmodify", page_url)
+        if form is not None:
+            self.forms[topic_url] = (time.monotonic() + self.form_ttl, form)
+
+    async def get_form(self, topic_url: str) -> ForumForm:
+        """The reply form of a topic, from the cache while it is fresh."""
+        cached = self.forms.get(topic_url)
+        if cached is not None and cached[0] > time.monotonic():
+            self.form_hits += 1
+            return cached[1]
+
+        self.form_misses += 1
+        url, page = await self.request("GET", topic_url)
+        if not self.logged_in(page):
+            await self.login()
+            url, page = await self.request("GET", topic_url)
+
+        self.cache_form(topic_url, page, url)
+        if topic_url not in self.forms:
+            raise ForumError(f"Could not find the reply form of {topic_url}")
+
+        return self.forms[topic_url][1]
+
+    async def post(self, topic_url: str, message: str, *, attempts: int = 2):
+        for attempt in range(attempts):
+            form = await self.get_form(topic_url)
+            # the form is spent either way
+            self.forms.pop(topic_url, None)
+
+            url, page = await self.request(
+                form.method, form.action, data=form.payload("post", message=message)
+            )
+            if not self.logged_in(page):
+                await self.login()
+                continue
+
+            if POST_ERROR_MARKER in page:
+                continue
+
+            self.posts += 1
+            self.cache_form(topic_url, page, url)
+            return
+
+        raise ForumError(f"The forum refused the reply to {topic_url} {attempts} times")
+
+    def summary(self) -> str:
+        lookups = self.form_hits + self.form_misses
+        rate = self.form_hits / lookups * 100 if lookups else 0
+        return (
+            f"Posts: {self.posts:,} in {self.requests:,} requests ({self.logins:,} logins)\n"
+            f"Form cache: {rate:.0f}% hits ({len(self.forms):,} cached)"
+        )
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from rings.utils.utils import Guild
+
+
+class GuildCache(MutableMapping):
+    """The settings of the guilds, loaded from the database the first time they are needed instead of
+    all at once. Up to `maxsize` guilds are kept, the least recently used one is dropped when there is
+    no room left for another. Pinned guilds and guilds with mutes running, which only exist in memory,
+    are never dropped.
+
+    Async code should `await fetch()` a guild before using it, concurrent fetches of a guild share a
+    single query. Plain lookups of a guild that isn't loaded still work but block while it is loaded.
+    `in` only tells whether a guild is loaded, use `fetch()` to know whether it has settings at all."""
+
+    def __init__(
+        self,
+        load_sync: Callable[[List[int]], Dict[int, Guild]],
+        load: Callable[[List[int]], Awaitable[Dict[int, Guild]]] = None,
+        *,
+        maxsize: int = 2000,
+    ):
+        self.load_sync = load_sync
+        self.load = load
+        self.maxsize = maxsize
+
+        self._data: OrderedDict[int, Guild] = OrderedDict()
+        self._loading: Dict[int, asyncio.Future] = {}
+        self.pinned: Set[int] = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.blocking_misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    def __getitem__(self, guild_id: int) -> Guild:
+        if guild_id in self._data:
+            self.hits += 1
+            self._data.move_to_end(guild_id)
+            return self._data[guild_id]
+
+        self.misses += 1
+        self.blocking_misses += 1
+        guild = self.load_sync([guild_id]).get(guild_id)
+        if guild is None:
+            raise KeyError(guild_id)
+
+        self[guild_id] = guild
+        return guild
+
+    def __setitem__(self, guild_id: int, guild: Guild):
+        self._data[guild_id] = guild
+        self._data.move_to_end(guild_id)
+        self._evict()
+
+    def __delitem__(self, guild_id: int):
+        del self._data[guild_id]
+        self.pinned.discard(guild_id)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, guild_id: int) -> bool:
+        # only what is loaded, the fallback of Mapping would load the guild to answer
+        return guild_id in self._data
+
+    def is_loaded(self, guild_id: int) -> bool:
+        return guild_id in self._data
+
+    def forget(self, guild_id: int):
+        self._data.pop(guild_id, None)
+        self.pinned.discard(guild_id)
+
+    def _evict(self):
+        if len(self._data) <= self.maxsize:
+            return
+
+        for guild_id in list(self._data):
+            if guild_id in self.pinned or self._data[guild_id]["mutes"]:
+                continue
+
+            del self._data[guild_id]
+            self.evictions += 1
+            if len(self._data) <= self.maxsize:
+                return
+
+    def pin(self, guild_ids: Iterable[int]):
+        self.pinned.update(guild_ids)
+
+    async def fetch(self, guild_id: int) -> Optional[Guild]:
+        """Make sure the guild is loaded and return it, None if the guild has no settings."""
+        if guild_id in self._data:
+            self.hits += 1
+            self._data.move_to_end(guild_id)
+            return self._data[guild_id]
+
+        self.misses += 1
+        if guild_id not in self._loading:
+            self._loading[guild_id] = asyncio.ensure_future(self._fetch_many([guild_id]))
+
+        await asyncio.shield(self._loading[guild_id])
+        return self._data.get(guild_id)
+
+    async def fetch_many(self, guild_ids: Iterable[int]):
+        """Load every guild that isn't loaded yet in as few queries as possible."""
+        missing = [x for x in set(guild_ids) if x not in self._data and x not in self._loading]
+        if not missing:
+            return
+
+        future = asyncio.ensure_future(self._fetch_many(missing))
+        for guild_id in missing:
+            self._loading[guild_id] = future
+
+        await asyncio.shield(future)
+
+    async def _fetch_many(self, guild_ids: List[int]):
+        try:
+            guilds = await self.load(guild_ids)
+        finally:
+            for guild_id in guild_ids:
+                self._loading.pop(guild_id, None)
+
+        for guild_id, guild in guilds.items():
+            # a blocking lookup might have loaded and changed it in the meantime
+            if guild_id not in self._data:
+                self[guild_id] = guild
+
+    async def refresh(self, guild_ids: List[int], fields: Optional[List[str]] = None):
+        """Reload the given fields, every field by default, of the loaded guilds among guild_ids from
+        the database after they were changed elsewhere. Guilds that are gone are dropped."""
+        guild_ids = [x for x in guild_ids if x in self._data]
+        if not guild_ids:
+            return
+
+        guilds = await self.load(guild_ids)
+        for guild_id in guild_ids:
+            if guild_id not in self._data:
+                continue
+
+            if guild_id not in guilds:
+                self.forget(guild_id)
+                continue
+
+            current, new = self._data[guild_id], guilds[guild_id]
+            for field in new if fields is None else fields:
+                if field in new and field != "mutes":
+                    current[field] = new[field]
+
+            self.refreshes += 1
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 100
+        return (
+            f"Loaded: {len(self._data):,}/{self.maxsize:,} (pinned {len(self.pinned):,})\n"
+            f"Hit rate: {rate:.1f}% ({self.hits:,} hits, {self.misses:,} misses, {self.blocking_misses:,} blocking)\n"
+            f"Evicted: {self.evictions:,}, refreshed from other processes: {self.refreshes:,}"
+        )
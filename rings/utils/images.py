@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import io
+import struct
+import time
+from collections import defaultdict
+from typing import DefaultDict, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+import discord
+from PIL import Image
+
+from rings.utils.utils import BotError
+
+
+def bmp_dimensions(header: bytes) -> Tuple[int, int]:
+    """Read the width and height from the start of a BMP file without decoding any pixel data."""
+    if len(header) < 26 or header[:2] != b"BM":
+        raise BotError("This file is not a valid bitmap")
+
+    (dib_size,) = struct.unpack_from("<I", header, 14)
+    if dib_size == 12:
+        # OS/2 BITMAPCOREHEADER uses 16 bit dimensions
+        width, height = struct.unpack_from("<HH", header, 18)
+    else:
+        width, height = struct.unpack_from("<ii", header, 18)
+
+    # negative heights are top-down bitmaps
+    return abs(width), abs(height)
+
+
+class BMPConverter:
+    """Converts bitmap attachments to png in a worker pool so large files don't block the event loop.
+    Files are rejected on their size and header dimensions before anything is decoded and each guild
+    can only have a limited number of conversions running at once. Given a session, the header is
+    fetched on its own with a ranged request so an oversized bitmap is never downloaded."""
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int = 25 * 1024 * 1024,
+        max_pixels: int = 40_000_000,
+        per_guild: int = 2,
+        workers: int = 2,
+        compress_level: int = 1,
+    ):
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.compress_level = compress_level
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bmp")
+        self.guild_locks: DefaultDict[Optional[int], asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(per_guild)
+        )
+
+        self.stats: Dict[str, float] = {
+            "converted": 0,
+            "rejected": 0,
+            "failed": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "seconds": 0.0,
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def check_attachment(self, attachment: discord.Attachment):
+        if attachment.size > self.max_bytes:
+            self.stats["rejected"] += 1
+            raise BotError(
+                f"**{attachment.filename}** is too big to convert ({attachment.size / 1024 / 1024:.1f} MiB)"
+            )
+
+    def check_dimensions(self, filename: str, data: bytes):
+        width, height = bmp_dimensions(data[:26])
+        if width * height > self.max_pixels:
+            self.stats["rejected"] += 1
+            raise BotError(f"**{filename}** is too big to convert ({width}x{height})")
+
+    def _to_png(self, data: bytes) -> bytes:
+        with Image.open(io.BytesIO(data)) as im:
+            output_buffer = io.BytesIO()
+            im.save(output_buffer, "png", compress_level=self.compress_level)
+
+        return output_buffer.getvalue()
+
+    @staticmethod
+    async def read_header(session: aiohttp.ClientSession, attachment: discord.Attachment) -> Optional[bytes]:
+        """The first 26 bytes of the attachment, None if they couldn't be fetched on their own."""
+        try:
+            async with session.get(attachment.url, headers={"Range": "bytes=0-25"}) as resp:
+                if resp.status not in (200, 206):
+                    return None
+
+                # a server ignoring the range sends the whole file, only the start of it is read
+                return await resp.content.readexactly(26)
+        except asyncio.IncompleteReadError as e:
+            return e.partial
+        except aiohttp.ClientError:
+            return None
+
+    async def _convert(
+        self,
+        guild_id: Optional[int],
+        attachment: discord.Attachment,
+        filename: str,
+        session: Optional[aiohttp.ClientSession],
+    ):
+        async with self.guild_locks[guild_id]:
+            header = await self.read_header(session, attachment) if session is not None else None
+            if header is not None:
+                self.check_dimensions(attachment.filename, header)
+
+            data = await attachment.read()
+            if header is None:
+                self.check_dimensions(attachment.filename, data)
+
+            start = time.perf_counter()
+            try:
+                converted = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self._to_png, data
+                )
+            except Exception as e:
+                self.stats["failed"] += 1
+                raise BotError(f"Could not convert **{attachment.filename}**") from e
+
+            self.stats["seconds"] += time.perf_counter() - start
+            self.stats["converted"] += 1
+            self.stats["bytes_in"] += len(data)
+            self.stats["bytes_out"] += len(converted)
+
+        return discord.File(filename=filename, fp=io.BytesIO(converted))
+
+    async def convert(
+        self,
+        guild_id: Optional[int],
+        attachments: Sequence[discord.Attachment],
+        *,
+        session: Optional[aiohttp.ClientSession] = None,
+    ) -> List[discord.File]:
+        for attachment in attachments:
+            self.check_attachment(attachment)
+
+        return await asyncio.gather(
+            *[
+                self._convert(guild_id, attachment, f"converted{index}.png", session)
+                for index, attachment in enumerate(attachments)
+            ]
+        )
+
+    def summary(self) -> str:
+        converted = self.stats["converted"]
+        average = self.stats["seconds"] / converted if converted else 0
+        return (
+            f"Converted: {converted:,} (rejected {self.stats['rejected']:,}, failed {self.stats['failed']:,})\n"
+            f"Average time: {average * 1000:.0f}ms\n"
+            f"Bytes in/out: {self.stats['bytes_in'] / 1024 / 1024:,.1f} MiB / "
+            f"{self.stats['bytes_out'] / 1024 / 1024:,.1f} MiB"
+        )
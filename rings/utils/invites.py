@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+from typing import Awaitable, Callable, Dict, Iterable, List, Tuple
+
+import discord
+
+InviteFetcher = Callable[[], Awaitable[List[discord.Invite]]]
+
+
+class InviteTracker:
+    """In-memory snapshot of the invite uses of every guild, used to work out which invite a member
+    joined with by diffing a fresh fetch of the guild's invites against it.
+
+    Joins that happen in the same guild while a fetch is already running share a single follow-up
+    fetch instead of each doing their own. Every use found by a fetch is handed to one join, uses that
+    no waiting join claimed are kept for the joins whose events arrive afterwards."""
+
+    def __init__(self):
+        self.snapshots: Dict[int, Dict[str, int]] = {}
+        self._running: Dict[int, asyncio.Future] = {}
+        self._queued: Dict[int, asyncio.Future] = {}
+        self._unclaimed: Dict[int, List[discord.Invite]] = {}
+
+        self.fetches = 0
+        self.coalesced = 0
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self.snapshots
+
+    def load(self, guild_id: int, uses: Iterable[Tuple[str, int]]):
+        self.snapshots[guild_id] = dict(uses)
+        self._unclaimed.pop(guild_id, None)
+
+    def add(self, invite: discord.Invite):
+        self.snapshots.setdefault(invite.guild.id, {})[invite.code] = invite.uses or 0
+
+    def remove(self, invite: discord.Invite):
+        if invite.guild is not None:
+            self.snapshots.get(invite.guild.id, {}).pop(invite.code, None)
+
+    def forget(self, guild_id: int):
+        self.snapshots.pop(guild_id, None)
+        self._unclaimed.pop(guild_id, None)
+
+    def diff(self, guild_id: int, invites: List[discord.Invite]) -> List[Tuple[discord.Invite, int]]:
+        """Replace the snapshot of the guild with the given invites and return the ones whose uses went up
+        along with by how much, oldest invite first."""
+        previous = self.snapshots.get(guild_id, {})
+        self.snapshots[guild_id] = {invite.code: invite.uses for invite in invites}
+
+        changed = []
+        for invite in sorted(invites, key=lambda x: x.created_at):
+            delta = invite.uses - previous.get(invite.code, 0)
+            if delta > 0:
+                changed.append((invite, delta))
+
+        return changed
+
+    async def _fetch(
+        self, guild_id: int, fetch: InviteFetcher, persist: Callable[[List[discord.Invite]], Awaitable]
+    ):
+        self.fetches += 1
+        changed = self.diff(guild_id, await fetch())
+        if changed:
+            await persist([invite for invite, _ in changed])
+
+        # one entry per use so that every join can claim one
+        self._unclaimed.setdefault(guild_id, []).extend(
+            invite for invite, delta in changed for _ in range(delta)
+        )
+
+    async def _fetch_after(self, guild_id: int, previous: asyncio.Future, *args):
+        try:
+            await asyncio.wait([previous])
+        finally:
+            del self._queued[guild_id]
+
+        return await self._start(guild_id, *args)
+
+    def _start(self, guild_id: int, *args) -> asyncio.Future:
+        task = asyncio.ensure_future(self._fetch(guild_id, *args))
+        self._running[guild_id] = task
+        task.add_done_callback(functools.partial(self._finished, guild_id))
+        return task
+
+    def _finished(self, guild_id: int, task: asyncio.Future):
+        if self._running.get(guild_id) is task:
+            del self._running[guild_id]
+
+    def _claim(self, guild_id: int, count: int) -> List[discord.Invite]:
+        uses = self._unclaimed.get(guild_id, [])
+        claimed, self._unclaimed[guild_id] = uses[:count], uses[count:]
+        return claimed
+
+    async def resolve(
+        self,
+        guild_id: int,
+        fetch: InviteFetcher,
+        persist: Callable[[List[discord.Invite]], Awaitable],
+        count: int = 1,
+    ) -> List[discord.Invite]:
+        """Work out which invites were used for the `count` joins that just happened. `fetch` gets the
+        current invites of the guild and `persist` saves the ones that changed. Joins that can't be
+        attributed to an invite are left out of the returned list."""
+        self.coalesced += count - 1
+        if len(self._unclaimed.get(guild_id, [])) >= count:
+            # an earlier fetch already saw these joins
+            self.coalesced += 1
+            return self._claim(guild_id, count)
+
+        if guild_id not in self._running:
+            task = self._start(guild_id, fetch, persist)
+        elif guild_id not in self._queued:
+            # the running fetch may have started before these joins, queue one to run right after it
+            task = asyncio.ensure_future(self._fetch_after(guild_id, self._running[guild_id], fetch, persist))
+            self._queued[guild_id] = task
+        else:
+            self.coalesced += 1
+            task = self._queued[guild_id]
+
+        await asyncio.shield(task)
+        return self._claim(guild_id, count)
+
+    def summary(self) -> str:
+        return (
+            f"Guilds: {len(self.snapshots):,} ({sum(len(x) for x in self.snapshots.values()):,} invites)\n"
+            f"Fetches: {self.fetches:,} (coalesced joins {self.coalesced:,})"
+        )
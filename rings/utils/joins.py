@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Dict, List
+
+import discord
+
+if TYPE_CHECKING:
+    from bot import NecroBot
+
+
+class JoinBatcher:
+    """Collects the members joining a guild over the guild's join window and hands them over together
+    through the `member_join_batch` event, so that a join wave is registered, logged and welcomed a
+    batch at a time instead of one coroutine per member. A window of 0 dispatches every join on its own."""
+
+    def __init__(self, bot: NecroBot, *, max_batch: int = 100):
+        self.bot = bot
+        self.max_batch = max_batch
+
+        self.pending: Dict[int, List[discord.Member]] = {}
+        self.tasks: Dict[int, asyncio.Task] = {}
+
+        self.joins = 0
+        self.batches = 0
+
+    def add(self, member: discord.Member):
+        self.joins += 1
+        guild_id = member.guild.id
+        window = self.bot.guild_data[guild_id]["join-window"]
+        if not window:
+            return self._dispatch(member.guild, [member])
+
+        self.pending.setdefault(guild_id, []).append(member)
+        if len(self.pending[guild_id]) >= self.max_batch:
+            task = self.tasks.pop(guild_id, None)
+            if task is not None:
+                task.cancel()
+
+            return self.flush(member.guild)
+
+        if guild_id not in self.tasks:
+            self.tasks[guild_id] = asyncio.create_task(self._flush_later(member.guild, window))
+
+    async def _flush_later(self, guild: discord.Guild, window: int):
+        await asyncio.sleep(window)
+        del self.tasks[guild.id]
+        self.flush(guild)
+
+    def flush(self, guild: discord.Guild):
+        members = self.pending.pop(guild.id, [])
+        if members:
+            self._dispatch(guild, members)
+
+    def _dispatch(self, guild: discord.Guild, members: List[discord.Member]):
+        self.batches += 1
+        self.bot.dispatch("member_join_batch", guild, members)
+
+    def summary(self) -> str:
+        average = self.joins / self.batches if self.batches else 0
+        return (
+            f"Joins: {self.joins:,} in {self.batches:,} batches ({average:.1f} per batch)\n"
+            f"Waiting: {sum(len(x) for x in self.pending.values()):,}"
+        )
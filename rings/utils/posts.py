@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import time
+from typing import TYPE_CHECKING, List, Optional
+
+import asyncpg
+import discord
+
+if TYPE_CHECKING:
+    from bot import NecroBot
+
+
+class PostQueue:
+    """Bug reports waiting to be posted on the Modding Union forum. Jobs live in the database with the
+    ids of the message they come from rather than the message itself, so a restart picks them up where it
+    left off.
+
+    Posts go out one at a time, at least `interval` seconds apart. The interval shrinks by `speedup` after
+    every post that goes through and doubles after every failure, within [min_interval, max_interval],
+    so the queue drains as fast as the forum lets it. A failed job is retried after `backoff` seconds,
+    doubling every attempt, and given up on after `retries` attempts.
+
+    A job is marked as posting before it is sent. If the bot stops before the outcome is recorded, the
+    job is given up on at the next start instead of being sent again, since it may well be on the forum
+    already."""
+
+    def __init__(
+        self,
+        bot: NecroBot,
+        *,
+        min_interval: float = 15,
+        max_interval: float = 900,
+        speedup: float = 0.75,
+        backoff: float = 60,
+        retries: int = 5,
+    ):
+        self.bot = bot
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.speedup = speedup
+        self.backoff = backoff
+        self.retries = retries
+
+        self.interval = min_interval
+        self.last_post = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.posted = 0
+        self.retried = 0
+        self.failed = 0
+
+    @property
+    def wakeup(self) -> asyncio.Event:
+        # made on first use, the queue is created before the bot's loop runs and on python 3.8 an Event
+        # binds to the loop that is current when it is created
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+
+        return self._wakeup
+
+    async def add(self, message: discord.Message, approver_id: int, url: str, content: str) -> int:
+        job_id = await self.bot.db.query(
+            """INSERT INTO necrobot.BridgePosts(guild_id, channel_id, message_id, author_id, author_name, approver_id, url, content)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8) RETURNING id""",
+            message.guild.id if message.guild is not None else None,
+            message.channel.id,
+            message.id,
+            message.author.id,
+            str(message.author),
+            approver_id,
+            url,
+            content,
+            fetchval=True,
+        )
+        self.wakeup.set()
+        return job_id
+
+    async def next(self) -> asyncpg.Record:
+        """Wait for the next job that is due and that the pacing allows to post."""
+        while True:
+            jobs = await self.bot.db.query(
+                """SELECT * FROM necrobot.BridgePosts WHERE status = 'queued'
+                ORDER BY next_attempt, id LIMIT 1"""
+            )
+
+            delay = None
+            if jobs:
+                job = jobs[0]
+                now = datetime.datetime.now(datetime.timezone.utc)
+                delay = max(
+                    (job["next_attempt"] - now).total_seconds(),
+                    self.last_post + self.interval - time.monotonic(),
+                )
+                if delay <= 0:
+                    return job
+
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+            self.wakeup.clear()
+
+    async def claim(self, job: asyncpg.Record) -> bool:
+        """Mark the job as being posted, returns False if it isn't queued anymore."""
+        job_id = await self.bot.db.query(
+            "UPDATE necrobot.BridgePosts SET status = 'posting' WHERE id = $1 AND status = 'queued' RETURNING id",
+            job["id"],
+            fetchval=True,
+        )
+        return job_id is not None
+
+    async def recover(self):
+        """Give up on the jobs that were being posted when the bot stopped."""
+        await self.bot.db.query(
+            """UPDATE necrobot.BridgePosts SET status = 'failed', attempts = attempts + 1,
+            last_error = 'Interrupted while posting, check the forum before retrying' WHERE status = 'posting'"""
+        )
+
+    async def done(self, job: asyncpg.Record):
+        self.posted += 1
+        self.last_post = time.monotonic()
+        self.interval = max(self.min_interval, self.interval * self.speedup)
+        await self.bot.db.query(
+            """UPDATE necrobot.BridgePosts SET status = 'posted', attempts = attempts + 1, posted_at = NOW(),
+            last_error = NULL WHERE id = $1""",
+            job["id"],
+        )
+
+    async def retry(self, job: asyncpg.Record, error: Exception) -> bool:
+        """Record a failed attempt, returns whether the job will be tried again."""
+        self.last_post = time.monotonic()
+        self.interval = min(self.max_interval, self.interval * 2)
+
+        attempts = job["attempts"] + 1
+        if attempts >= self.retries:
+            self.failed += 1
+            status, delay = "failed", 0
+        else:
+            self.retried += 1
+            status, delay = "queued", self.backoff * 2 ** (attempts - 1)
+
+        await self.bot.db.query(
+            """UPDATE necrobot.BridgePosts SET status = $2, attempts = $3, last_error = $4,
+            next_attempt = NOW() + make_interval(secs => $5) WHERE id = $1""",
+            job["id"],
+            status,
+            attempts,
+            str(error)[:1000],
+            float(delay),
+        )
+        return status == "queued"
+
+    async def requeue(self, job_id: int) -> Optional[int]:
+        """Give a failed job another round of attempts."""
+        job_id = await self.bot.db.query(
+            """UPDATE necrobot.BridgePosts SET status = 'queued', attempts = 0, next_attempt = NOW()
+            WHERE id = $1 AND status = 'failed' RETURNING id""",
+            job_id,
+            fetchval=True,
+        )
+        self.wakeup.set()
+        return job_id
+
+    async def jobs(self) -> List[asyncpg.Record]:
+        """The jobs still waiting and the ones that were given up on, oldest first."""
+        return await self.bot.db.query(
+            "SELECT * FROM necrobot.BridgePosts WHERE status != 'posted' ORDER BY status DESC, next_attempt, id"
+        )
+
+    def summary(self) -> str:
+        return (
+            f"Posted: {self.posted:,} (retried {self.retried:,}, failed {self.failed:,})\n"
+            f"Interval: {self.interval:.0f}s"
+        )
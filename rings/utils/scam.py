@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Pattern, Tuple
+
+URL_PATTERN = r"https?://(?P<domain>[^\s/:?#<>]+)[^\s<>]*"
+EVERYONE_PATTERN = r"@everyone"
+MENTION_PATTERN = r"<@[!&]?\d+>"
+
+
+@dataclass(frozen=True)
+class ScamRule:
+    """A single detection rule. Every condition that is set must be met for the rule to trigger,
+    a rule with no conditions never triggers."""
+
+    name: str
+    keywords: Tuple[str, ...] = ()
+    domains: Tuple[str, ...] = ()
+    require_link: bool = False
+    require_everyone: bool = False
+    min_mentions: int = 0
+
+    @property
+    def has_conditions(self) -> bool:
+        return bool(
+            self.keywords or self.domains or self.require_link or self.require_everyone or self.min_mentions
+        )
+
+    def matches(self, scan: Scan) -> bool:
+        if not self.has_conditions:
+            return False
+
+        if self.keywords and scan.keywords.isdisjoint(self.keywords):
+            return False
+
+        if self.require_link and not scan.domains:
+            return False
+
+        if self.domains and not any(
+            domain == blocked or domain.endswith(f".{blocked}")
+            for domain in scan.domains
+            for blocked in self.domains
+        ):
+            return False
+
+        if self.require_everyone and not scan.everyone:
+            return False
+
+        if self.min_mentions and scan.mentions < self.min_mentions:
+            return False
+
+        return True
+
+    def required_tokens(self) -> Tuple[Tuple[str, ...], ...]:
+        """Substrings that must all be present, one from each group, for the rule to have any chance
+        of triggering. Checking these is much cheaper than walking the message with the full pattern.
+        The groups least likely to be found in an ordinary message come first."""
+        groups = []
+        if self.require_everyone:
+            groups.append(("@everyone",))
+        if self.min_mentions:
+            groups.append(("<@",))
+        if self.domains:
+            groups.append(tuple(domain.lower() for domain in self.domains))
+        if self.keywords:
+            groups.append(tuple(kw.lower() for kw in self.keywords))
+        if self.require_link:
+            groups.append(("http://", "https://"))
+
+        return tuple(groups)
+
+    def describe(self) -> str:
+        conditions = []
+        if self.keywords:
+            conditions.append(f"keywords: `{', '.join(self.keywords)}`")
+        if self.domains:
+            conditions.append(f"domains: `{', '.join(self.domains)}`")
+        if self.require_link:
+            conditions.append("has a link")
+        if self.require_everyone:
+            conditions.append("pings everyone")
+        if self.min_mentions:
+            conditions.append(f"{self.min_mentions}+ mentions")
+
+        return " & ".join(conditions) if conditions else "never triggers"
+
+
+class Scan:
+    """The features of a message extracted in a single pass over its content."""
+
+    __slots__ = ("keywords", "domains", "everyone", "mentions")
+
+    def __init__(self):
+        self.keywords: set = set()
+        self.domains: List[str] = []
+        self.everyone: bool = False
+        self.mentions: int = 0
+
+
+DEFAULT_RULES = (ScamRule("nitro", keywords=("nitro",), require_link=True, require_everyone=True),)
+
+
+class CompiledRuleset:
+    """A set of rules compiled into one alternation so that a message only has to be walked once.
+    Keywords are looked up on their own rather than through the alternation, the matches of an
+    alternation can't overlap so a longer keyword would hide the shorter ones inside it."""
+
+    def __init__(self, rules: Iterable[ScamRule]):
+        self.rules: Tuple[ScamRule, ...] = tuple(rules)
+        self.keywords: Tuple[str, ...] = tuple({kw.lower() for rule in self.rules for kw in rule.keywords})
+
+        groups = [
+            f"(?P<url>{URL_PATTERN})",
+            f"(?P<everyone>{EVERYONE_PATTERN})",
+            f"(?P<mention>{MENTION_PATTERN})",
+        ]
+        self.pattern: Pattern = re.compile("|".join(groups))
+        self.requirements = tuple(rule.required_tokens() for rule in self.rules if rule.has_conditions)
+
+    def scan(self, content: str) -> Scan:
+        """Extract the features of an already lowercased message."""
+        scan = Scan()
+        # this also finds keywords hidden in a link, e.g. discord-nitro.gift
+        scan.keywords.update(kw for kw in self.keywords if kw in content)
+        for match in self.pattern.finditer(content):
+            kind = match.lastgroup
+            if kind == "url":
+                scan.domains.append(match.group("domain"))
+            elif kind == "everyone":
+                scan.everyone = True
+            elif kind == "mention":
+                scan.mentions += 1
+
+        return scan
+
+    def could_match(self, content: str) -> bool:
+        # plain loops rather than any() and generators, this runs for every message the bot sees
+        for groups in self.requirements:
+            for group in groups:
+                for token in group:
+                    if token in content:
+                        break
+                else:
+                    # none of the tokens of this group, the rule can't trigger
+                    break
+            else:
+                return True
+
+        return False
+
+    def evaluate(self, content: str) -> Optional[ScamRule]:
+        """The first rule an already lowercased message triggers."""
+        scan = self.scan(content)
+        return next((rule for rule in self.rules if rule.matches(scan)), None)
+
+    def check(self, content: str) -> Optional[ScamRule]:
+        content = content.lower()
+        if not self.could_match(content):
+            return None
+
+        return self.evaluate(content)
+
+
+class ScamFilter:
+    """Holds the compiled rulesets for every guild and a small LRU of recent decisions so that the
+    same spam message posted across several channels and guilds is only evaluated once. Only messages
+    that get past the cheap token check of the ruleset are cached."""
+
+    def __init__(self, cache_size: int = 1024):
+        self.cache_size = cache_size
+        self.guild_rules: Dict[int, Dict[str, ScamRule]] = {}
+
+        self._compiled: Dict[FrozenSet[ScamRule], CompiledRuleset] = {}
+        self._guild_compiled: Dict[Optional[int], CompiledRuleset] = {}
+        # keyed on the ruleset rather than the guild so guilds using the same rules share decisions
+        self._decisions: OrderedDict[Tuple[CompiledRuleset, str], Optional[ScamRule]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get_rules(self, guild_id: Optional[int]) -> List[ScamRule]:
+        rules = {rule.name: rule for rule in DEFAULT_RULES}
+        rules.update(self.guild_rules.get(guild_id, {}))
+        return list(rules.values())
+
+    def set_rules(self, guild_id: int, rules: Iterable[ScamRule]):
+        self.guild_rules[guild_id] = {rule.name: rule for rule in rules}
+        self._guild_compiled.pop(guild_id, None)
+
+    def add_rule(self, guild_id: int, rule: ScamRule):
+        self.guild_rules.setdefault(guild_id, {})[rule.name] = rule
+        self._guild_compiled.pop(guild_id, None)
+
+    def remove_rule(self, guild_id: int, name: str) -> bool:
+        removed = self.guild_rules.get(guild_id, {}).pop(name, None)
+        self._guild_compiled.pop(guild_id, None)
+        return removed is not None
+
+    def compiled(self, guild_id: Optional[int]) -> CompiledRuleset:
+        try:
+            return self._guild_compiled[guild_id]
+        except KeyError:
+            pass
+
+        rules = self.get_rules(guild_id)
+        key = frozenset(rules)
+        if key not in self._compiled:
+            self._compiled[key] = CompiledRuleset(rules)
+
+        self._guild_compiled[guild_id] = self._compiled[key]
+        return self._compiled[key]
+
+    def check(self, guild_id: Optional[int], content: str) -> Optional[ScamRule]:
+        """Return the first rule triggered by the content or None if it is clean."""
+        if not content:
+            return None
+
+        ruleset = self.compiled(guild_id)
+        # most messages can't match any rule, they are cheaper to rule out again than to cache and would
+        # push the decisions worth keeping out of the cache
+        lowered = content.lower()
+        if not ruleset.could_match(lowered):
+            return None
+
+        key = (ruleset, content)
+        try:
+            decision = self._decisions[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._decisions.move_to_end(key)
+            return decision
+
+        decision = ruleset.evaluate(lowered)
+        self._decisions[key] = decision
+        if len(self._decisions) > self.cache_size:
+            self._decisions.popitem(last=False)
+
+        return decision
+
+    def is_scam(self, guild_id: Optional[int], content: str) -> bool:
+        return self.check(guild_id, content) is not None
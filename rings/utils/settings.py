@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Set
+
+from rings.utils.utils import RankingDict, default_settings
+
+
+class Settings:
+    """The bot wide settings. Each setting is a row of necrobot.Settings that is written as soon as it
+    changes, through the Database setting methods. They replace the local copy with the value the
+    database returns, so writes from several bot processes never overwrite each other, and notify the
+    other processes, which read the setting back."""
+
+    def __init__(self, values: Dict[str, Any]):
+        self.blacklist: Set[int] = set()
+        self.disabled: List[str] = []
+        self.shop: List[str] = []
+        self.messages: RankingDict = {}
+        self.matchup_views: Dict[int, int] = {}
+        self.day: int = 0
+
+        for key, value in {**default_settings(), **values}.items():
+            self.apply(key, value)
+
+    def apply(self, key: str, value: Any):
+        if key == "blacklist":
+            value = set(value)
+        elif key == "matchup_views":
+            # json objects only have string keys
+            value = {int(guild_id): message_id for guild_id, message_id in value.items()}
+        elif key not in default_settings():
+            return
+
+        setattr(self, key, value)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+
+if TYPE_CHECKING:
+    from bot import NecroBot
+    from rings.utils.utils import Guild
+
+logger = logging.getLogger()
+
+MAGIC = b"NBSNAP"
+VERSION = 1
+
+
+class Snapshot:
+    """The caches that are otherwise rebuilt from the database on every start. Written on a clean shutdown
+    as a zlib compressed json document behind a magic and version header, and only used on the next start
+    if the database still produces the checksum it was written with."""
+
+    def __init__(
+        self,
+        checksum: str,
+        guild_data: Dict[int, Guild],
+        registered: Dict[int, Set[int]],
+        polls: List[Dict[str, Any]],
+        starred: Set[int],
+        candidates: List[List[int]],
+        created: Optional[float] = None,
+    ):
+        self.checksum = checksum
+        self.guild_data = guild_data
+        self.registered = registered
+        self.polls = polls
+        self.starred = starred
+        self.candidates = candidates
+        self.created = time.time() if created is None else created
+
+    @classmethod
+    def from_bot(cls, bot: NecroBot, checksum: str, polls: List[Dict[str, Any]]) -> Snapshot:
+        return cls(
+            checksum,
+            bot.guild_data,
+            bot.registered_members,
+            polls,
+            bot.stars.starred,
+            [
+                [candidate.message_id, candidate.channel_id, candidate.author_id, candidate.count]
+                for candidate in bot.stars.candidates.values()
+            ],
+        )
+
+    def encode(self) -> bytes:
+        guilds = []
+        for guild_id, data in self.guild_data.items():
+            data = {**data, "permission-roles": list(data["permission-roles"].items())}
+            guilds.append([guild_id, data])
+
+        document = {
+            "created": self.created,
+            "checksum": self.checksum,
+            "guilds": guilds,
+            "registered": [[guild_id, sorted(members)] for guild_id, members in self.registered.items()],
+            "polls": self.polls,
+            "starred": sorted(self.starred),
+            "candidates": self.candidates,
+        }
+        payload = zlib.compress(json.dumps(document, separators=(",", ":")).encode(), 6)
+        return MAGIC + bytes([VERSION]) + payload
+
+    @classmethod
+    def decode(cls, raw: bytes) -> Optional[Snapshot]:
+        if raw[: len(MAGIC)] != MAGIC or raw[len(MAGIC)] != VERSION:
+            return None
+
+        document = json.loads(zlib.decompress(raw[len(MAGIC) + 1 :]))
+        guild_data = {}
+        for guild_id, data in document["guilds"]:
+            data["permission-roles"] = {role_id: level for role_id, level in data["permission-roles"]}
+            guild_data[guild_id] = data
+
+        return cls(
+            document["checksum"],
+            guild_data,
+            {guild_id: set(members) for guild_id, members in document["registered"]},
+            document["polls"],
+            set(document["starred"]),
+            document["candidates"],
+            document["created"],
+        )
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # write then swap so that a crash half way through can't leave a truncated snapshot behind
+        with open(f"{path}.tmp", "wb") as file:
+            file.write(self.encode())
+
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path: str, checksum: str) -> Optional[Snapshot]:
+        """Load the snapshot at path if there is one, it is readable and it still matches the database.
+        The file is removed either way, it is only ever valid for the start right after it was written."""
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, "rb") as file:
+                snapshot = cls.decode(file.read())
+        except (OSError, ValueError, KeyError, zlib.error) as e:
+            logger.warning("Could not read the snapshot: %s", e)
+            snapshot = None
+        finally:
+            os.remove(path)
+
+        if snapshot is None:
+            return None
+
+        if snapshot.checksum != checksum:
+            logger.info("Snapshot is out of date with the database, doing a full load")
+            return None
+
+        return snapshot
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import datetime
+import heapq
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import discord
+
+CANDIDATE_LIFETIME = datetime.timedelta(days=7)
+
+
+class StarCandidate:
+    """A message that has received stars but has not made it to the starboard yet."""
+
+    __slots__ = ("message_id", "channel_id", "author_id", "count", "expires")
+
+    def __init__(self, message_id: int, channel_id: int, author_id: int):
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.count = 0
+        self.expires = (discord.utils.snowflake_time(message_id) + CANDIDATE_LIFETIME).timestamp()
+
+
+class StarTracker:
+    """Keeps track of the messages that are on their way to the starboard and those already on it.
+
+    Candidates are dropped once they are older than a week, in order of expiry through a heap. Star
+    count changes on messages that are already on the starboard are only kept in memory and coalesced
+    per user until they are flushed to the database in one go."""
+
+    def __init__(self):
+        self.starred: Set[int] = set()
+        self.candidates: Dict[int, StarCandidate] = {}
+        self._expiry: List[Tuple[float, int]] = []
+        self._pending: Dict[Tuple[int, int], int] = {}
+
+    def __contains__(self, message_id: int) -> bool:
+        return message_id in self.candidates
+
+    def is_starred(self, message_id: int) -> bool:
+        return message_id in self.starred
+
+    def mark_starred(self, message_id: int):
+        self.starred.add(message_id)
+        self.discard(message_id)
+
+    def load_starred(self, message_ids: Iterable[int]):
+        self.starred.update(message_ids)
+
+    def get(self, message_id: int) -> Optional[StarCandidate]:
+        return self.candidates.get(message_id)
+
+    def add(self, message: discord.Message) -> StarCandidate:
+        return self._add(message.id, message.channel.id, message.author.id)
+
+    def _add(self, message_id: int, channel_id: int, author_id: int) -> StarCandidate:
+        candidate = StarCandidate(message_id, channel_id, author_id)
+        self.candidates[message_id] = candidate
+        heapq.heappush(self._expiry, (candidate.expires, message_id))
+
+        return candidate
+
+    def restore(self, candidates: Iterable[Tuple[int, int, int, int]]):
+        """Restore the candidates saved in a snapshot, the expired ones are dropped on the next expire."""
+        for message_id, channel_id, author_id, count in candidates:
+            self._add(message_id, channel_id, author_id).count = count
+
+    def discard(self, message_id: int):
+        # the heap entry is left behind and skipped when it expires
+        self.candidates.pop(message_id, None)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+
+        expired = 0
+        while self._expiry and self._expiry[0][0] < now:
+            _, message_id = heapq.heappop(self._expiry)
+            if self.candidates.pop(message_id, None) is not None:
+                expired += 1
+
+        return expired
+
+    def record(self, message_id: int, user_id: int, increment: int):
+        """Record a star change on a message that is already on the starboard."""
+        key = (message_id, user_id)
+        self._pending[key] = self._pending.get(key, 0) + increment
+
+    def pop_pending(self) -> List[Tuple[int, int, int]]:
+        pending = [
+            (message_id, user_id, delta) for (message_id, user_id), delta in self._pending.items() if delta
+        ]
+        self._pending = {}
+
+        return pending
+
+    def restore_pending(self, pending: Iterable[Tuple[int, int, int]]):
+        for message_id, user_id, delta in pending:
+            self.record(message_id, user_id, delta)
+
+    def summary(self) -> str:
+        return (
+            f"Starred: {len(self.starred):,}\n"
+            f"Candidates: {len(self.candidates):,} (expiry heap {len(self._expiry):,})\n"
+            f"Pending changes: {len(self._pending):,}"
+        )
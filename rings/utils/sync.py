@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+import discord
+
+if TYPE_CHECKING:
+    from bot import NecroBot
+
+logger = logging.getLogger()
+
+GLOBAL_SCOPE = "global"
+
+
+class CommandSync:
+    """Only syncs the application command scopes that changed since they were last synced. Every scope, global
+    or a single guild, is serialised to the payload Discord would receive and hashed, the hashes of the last
+    successful syncs are kept on disk so that restarts and reloads skip the scopes that are still current."""
+
+    def __init__(self, bot: NecroBot, path: str = "rings/utils/data/command_hashes.json"):
+        self.bot = bot
+        self.path = path
+        self.hashes: Dict[str, str] = {}
+
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                self.hashes = json.load(file)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as file:
+            json.dump(self.hashes, file, indent=4, sort_keys=True)
+
+    @staticmethod
+    def scope_key(guild: Optional[discord.abc.Snowflake]) -> str:
+        return GLOBAL_SCOPE if guild is None else str(guild.id)
+
+    def payload(self, guild: Optional[discord.abc.Snowflake]) -> List[dict]:
+        commands = [command.to_dict() for command in self.bot.tree.get_commands(guild=guild)]
+        return sorted(commands, key=lambda x: (x["type"], x["name"]))
+
+    def digest(self, guild: Optional[discord.abc.Snowflake]) -> str:
+        canonical = json.dumps(self.payload(guild), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def scopes(self) -> List[Optional[discord.abc.Snowflake]]:
+        """The global scope, every guild with guild commands and every guild that had commands synced to
+        it before, so that removing all the commands of a guild is synced too."""
+        guild_ids = {guild.id for guild in self.bot.guilds if self.bot.tree.get_commands(guild=guild)}
+        guild_ids.update(int(key) for key in self.hashes if key != GLOBAL_SCOPE)
+        return [None, *[discord.Object(id=guild_id) for guild_id in sorted(guild_ids)]]
+
+    async def sync_scope(
+        self, guild: Optional[discord.abc.Snowflake], *, force: bool = False
+    ) -> Optional[float]:
+        """Sync a single scope if it changed, returns how long it took or None if it was skipped."""
+        digest = self.digest(guild)
+        key = self.scope_key(guild)
+        if not force and self.hashes.get(key) == digest:
+            return None
+
+        start = time.perf_counter()
+        await self.bot.tree.sync(guild=guild)
+        elapsed = time.perf_counter() - start
+
+        if guild is not None and not self.bot.tree.get_commands(guild=guild):
+            self.hashes.pop(key, None)
+        else:
+            self.hashes[key] = digest
+
+        self.save()
+        logger.info("Synced application commands for %s in %.2fs", key, elapsed)
+        return elapsed
+
+    async def sync(
+        self, scopes: Optional[List[Optional[discord.abc.Snowflake]]] = None, *, force: bool = False
+    ) -> List[Tuple[str, Union[float, None, discord.HTTPException]]]:
+        """Sync every given scope that changed, all known scopes by default. Returns every scope along with
+        how long its sync took, None if it was up to date or the error if it failed."""
+        results = []
+        for guild in self.scopes() if scopes is None else scopes:
+            try:
+                result = await self.sync_scope(guild, force=force)
+            except discord.HTTPException as e:
+                logger.warning("Could not sync application commands for %s: %s", self.scope_key(guild), e)
+                result = e
+
+            results.append((self.scope_key(guild), result))
+
+        return results
+
+    @staticmethod
+    def report(results: List[Tuple[str, Union[float, None, discord.HTTPException]]]) -> str:
+        lines = []
+        for key, result in results:
+            if result is None:
+                lines.append(f"`{key}`: unchanged")
+            elif isinstance(result, Exception):
+                lines.append(f"`{key}`: failed ({result})")
+            else:
+                lines.append(f"`{key}`: synced in {result * 1000:.0f}ms")
+
+        return "\n".join(lines)
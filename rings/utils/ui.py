@@ -45,15 +45,10 @@ class BaseView(discord.ui.View):
 
         embed = discord.Embed(
             title="View Error",
-            description=f"```py\n{error_traceback}\n```",
+            description=f"```py\n{error_traceback[:4000]}\n```",
             colour=interaction.client.bot_color,
         )
-
-        try:
-            logger.exception(error)
-            await interaction.client.error_channel.send(embed=embed)
-        except discord.HTTPException as e:
-            logger.exception(f"Failed to send error interaction: {e}")
+        interaction.client.error_aggregator.report(error, embed)
 
         msg = f"{NEGATIVE_CHECK} | Error with interaction: {error}"
         try:
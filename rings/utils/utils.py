@@ -25,23 +25,11 @@ class Queue(TypedDict):
     list: List[int]
 
 
-class PotentialStar(TypedDict):
-    message: discord.Message
-    count: int
-
-
 class Event(TypedDict):
     users: List[int]
     amount: int
 
 
-class QueuedPosts(TypedDict):
-    approver: int
-    url: str
-    message: discord.Message
-    content: str
-
-
 class Giveaway(TypedDict):
     limit: datetime.datetime
     winners: int
@@ -69,6 +57,9 @@ Guild = TypedDict(
         "disabled": List[str],
         "self-roles": List[int],
         "mutes": List[int],
+        "permission-roles": Dict[int, int],
+        "join-window": int,
+        "join-collapse": int,
     },
 )
 
@@ -80,15 +71,6 @@ class RankingDict(TypedDict):
     victories: List[int]
 
 
-class BotSettings(TypedDict):
-    blacklist: List[int]
-    disabled: List[str]
-    shop: List[str]
-    messages: RankingDict
-    matchup_views: Dict[int, int]
-    day: int
-
-
 class DatabaseError(Exception):
     def __init__(self, message: str, query: Optional[str] = None, args: List[Any] = None):
         super().__init__(message)
@@ -1606,7 +1606,7 @@ class Flowers(commands.Cog):
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
-        if payload.user_id in self.bot.settings["blacklist"]:
+        if self.bot.blacklist_check(payload.user_id):
             return
 
         if payload.emoji.name == "\N{CHERRY BLOSSOM}" and payload.message_id in self.bot.events:
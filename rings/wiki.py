@@ -3,19 +3,29 @@ from __future__ import annotations
 import asyncio
 import datetime
 import re
-import urllib
-from typing import TYPE_CHECKING
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 import discord
 from bs4 import BeautifulSoup
 from discord.ext import commands
 from fuzzywuzzy import process
 
+from rings.utils.faq import FAQIndex
 from rings.utils.utils import BotError
 
 if TYPE_CHECKING:
     from bot import NecroBot
 
+# search results are kept for an hour, for up to this many different searches
+WIKI_CACHE_TTL = 3600
+WIKI_CACHE_SIZE = 256
+
+# page id of the FAQ of each mod's wiki, the indexes are rebuilt every FAQ_REFRESH seconds
+FAQ_PAGES = {"edain": "3908"}
+FAQ_REFRESH = 6 * 3600
+
 
 def _check_error_response(response: dict, query: str):
     """check for default error messages and throw correct exception"""
@@ -49,6 +59,20 @@ class Wiki(commands.Cog):
         self.USER_AGENT = "necrobot (https://github.com/ClementJ18/necrobot)"
         self.LANG = ""
 
+        self.cache: OrderedDict[Tuple[Optional[str], str], Tuple[float, List[dict]]] = OrderedDict()
+        self.faq_indexes: Dict[str, FAQIndex] = {}
+        self.task = None
+
+    #######################################################################
+    ## Cog Functions
+    #######################################################################
+
+    async def cog_load(self):
+        self.task = self.bot.loop.create_task(self.faq_task())
+
+    async def cog_unload(self):
+        self.task.cancel()
+
     #######################################################################
     ## Functions
     #######################################################################
@@ -89,36 +113,41 @@ class Wiki(commands.Cog):
 
         return r
 
-    async def search(self, query, fandom=None):
+    async def search(self, query, fandom=None) -> List[dict]:
+        """Search the wiki and get the url, intro and thumbnail of every result in the same request. Results
+        are cached per wiki and query for WIKI_CACHE_TTL seconds."""
+        key = (fandom, query.strip().lower())
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self.cache.move_to_end(key)
+            return cached[1]
+
         search_params = {
             "action": "query",
             "generator": "search",
-            "prop": "info",
             "gsrsearch": query,
+            "gsrlimit": 10,
+            "prop": "info|extracts|pageimages",
+            "inprop": "url",
+            "exintro": 1,
+            "explaintext": 1,
+            "exlimit": "max",
+            "piprop": "thumbnail",
+            "pithumbsize": 500,
+            "pilimit": "max",
+            "redirects": 1,
         }
 
         request = await self._wiki_request(search_params, fandom)
         _check_error_response(request, query)
 
-        return list(request["query"]["pages"].values())
+        results = sorted(request.get("query", {}).get("pages", {}).values(), key=lambda x: x.get("index", 0))
+        self.cache[key] = (time.monotonic() + WIKI_CACHE_TTL, results)
+        self.cache.move_to_end(key)
+        while len(self.cache) > WIKI_CACHE_SIZE:
+            self.cache.popitem(last=False)
 
-    async def page(self, page_id, fandom=None):
-        query_params = {
-            "action": "query",
-            "prop": "info",
-            "rvprop": "content",
-            "redirects": "",
-            "inprop": "url",
-            "rvlimit": 1,
-            "rvsection": 0,
-            "pageids": page_id,
-        }
-
-        request = await self._wiki_request(query_params, fandom)
-        _check_error_response(request, page_id)
-        result = request["query"]["pages"][str(page_id)]
-
-        return result
+        return results
 
     async def parse(self, page_id, fandom=None):
         query_params = {
@@ -132,16 +161,44 @@ class Wiki(commands.Cog):
         _check_error_response(request, page_id)
         return request
 
-    async def get_sections(self, page_id, fandom=None):
+    async def parse_intro(self, page_id, fandom=None) -> Tuple[str, Optional[str]]:
+        """The first paragraph and image of the rendered intro of a page."""
+        parsed = await self.parse(page_id, fandom)
+
+        soup = BeautifulSoup(parsed["parse"]["text"]["*"], "html.parser")
+        description = [x for x in soup.find_all("p") if "aside" not in str(x) and x.text.strip()]
+        if not description:
+            description = "No description found"
+        else:
+            description = description[0].text
+
+        thumbnail = soup.find("img")
+        return description, thumbnail["src"] if thumbnail is not None else None
+
+    async def build_faq(self, mod: str) -> FAQIndex:
         query_params = {
             "action": "parse",
-            "pageid": page_id,
-            "prop": "sections",
+            "pageid": FAQ_PAGES[mod],
+            "prop": "text|sections",
         }
 
-        request = await self._wiki_request(query_params, fandom)
-        _check_error_response(request, page_id)
-        return request
+        request = await self._wiki_request(query_params, mod)
+        _check_error_response(request, FAQ_PAGES[mod])
+
+        index = FAQIndex.from_parse(f"https://{mod}.wikia.com/wiki/Frequently_Asked_Questions", request)
+        self.faq_indexes[mod] = index
+        return index
+
+    async def faq_task(self):
+        await self.bot.wait_until_loaded()
+        while True:
+            for mod in FAQ_PAGES:
+                try:
+                    await self.build_faq(mod)
+                except Exception as e:
+                    self.bot.dispatch("error", e)
+
+            await asyncio.sleep(FAQ_REFRESH)
 
     async def mediawiki_handler(self, ctx: commands.Context[NecroBot], article: str, fandom: str = None):
 
@@ -159,30 +216,23 @@ class Wiki(commands.Cog):
         if not results:
             raise BotError("Could not find any article matching the query on that wiki")
 
-        names = []
-        ids = []
-        for x in results:
-            names.append(x["title"])
-            ids.append(x["pageid"])
-
+        names = [x["title"] for x in results]
         e = process.extract(article, names, limit=len(names))
-        page_id = ids.pop(names.index(e.pop(0)[0]))
-
-        page = await self.page(page_id, fandom)
+        page = results[names.index(e.pop(0)[0])]
 
         msg = f"List of results: {', '.join([x[0] for x in e])}"
         url = page["fullurl"]
 
-        parsed = await self.parse(page_id, fandom)
-
-        soup = BeautifulSoup(parsed["parse"]["text"]["*"], "html.parser")
-        description = [x for x in soup.find_all("p") if "aside" not in str(x) and x.text.strip()]
-        if not description:
-            description = "No description found"
-        else:
-            description = description[0].text
+        if "extract" not in page:
+            # wikis without the TextExtracts extension, such as fandom ones, only have the rendered page, what
+            # is found there is cached along with the search results
+            description, thumbnail = await self.parse_intro(page["pageid"], fandom)
+            page["extract"] = description
+            if thumbnail is not None:
+                page["thumbnail"] = {"source": thumbnail}
 
-        thumbnail = soup.find("img")
+        description = next((x for x in page["extract"].split("\n") if x.strip()), "No description found")
+        thumbnail = page.get("thumbnail", {}).get("source")
 
         embed = discord.Embed(
             title=page["title"],
@@ -192,7 +242,6 @@ class Wiki(commands.Cog):
         )
 
         if thumbnail is not None:
-            thumbnail = thumbnail["src"]
             if not thumbnail.startswith("http"):
                 thumbnail = base + thumbnail
 
@@ -237,21 +286,12 @@ class Wiki(commands.Cog):
         if question is None:
             return await ctx.send(base)
 
-        sections = await self.get_sections("3908", mod)
-        questions = [
-            re.sub(r"<.+?>", "", x["line"]) for x in sections["parse"]["sections"] if x["toclevel"] == 2
-        ]
-        matches = process.extract(question, questions, limit=5)
-        message = []
-
-        for section in matches:
-            if section[1] < 55:
-                continue
-
-            section = section[0]
-            url = urllib.parse.quote(section.replace(" ", "_"), safe="/:").replace("%", ".")
-            message.append(f"[{section}]({base}#{url})")
+        # only goes to the wiki when the index couldn't be built yet
+        index = self.faq_indexes.get(mod)
+        if index is None:
+            index = await self.build_faq(mod)
 
+        message = [f"[{section.title}]({index.link(section)})" for section, _ in index.search(question)]
         if not message:
             raise BotError("Sorry, didn't find anything")
 
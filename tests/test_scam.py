@@ -0,0 +1,18 @@
+from rings.utils.scam import ScamFilter, ScamRule
+
+
+def test_overlapping_keywords():
+    scam_filter = ScamFilter()
+    scam_filter.add_rule(1, ScamRule("gift", keywords=("free nitro",), min_mentions=5))
+
+    message = "free nitro https://x.com @everyone"
+    assert scam_filter.check(None, message).name == "nitro"
+    assert scam_filter.check(1, message).name == "nitro"
+    assert scam_filter.check(1, "free nitro <@1> <@2> <@3> <@4> <@5>").name == "gift"
+
+
+def test_keyword_in_link():
+    scam_filter = ScamFilter()
+
+    assert scam_filter.is_scam(None, "@everyone claim it https://discord-nitro.gift/claim")
+    assert not scam_filter.is_scam(None, "claim it https://discord-nitro.gift/claim")